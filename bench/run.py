@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Benchmark the page rewrite transforms over real and synthetic corpora.
+
+Runs rebrand, fix_colors, fix_cta_colors, unplugs_style, bamboy_font and inter_font
+over the site's own pages and over generated corpora of large pages with
+big inline <style> blocks in the old palette. Reports throughput (MB/s,
+pages/s) and peak traced memory per transform, and compares against
+bench/baseline.json so regressions show up in review.
+
+    python bench/run.py                         # real pages + 1k synthetic
+    python bench/run.py --sizes 1000,10000,100000
+    python bench/run.py --update-baseline
+
+Synthetic pages are generated on the fly from a seed, so even the 100k
+corpus never sits in memory at once.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sitebuild import css
+from sitebuild.pipeline import REPO_ROOT, STAGES, VARIANTS, variant_pages
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+TRANSFORMS = ["rebrand", "fix_colors", "fix_cta_colors", "unplugs_style", "bamboy_font", "inter_font"]
+
+# Slower than baseline by more than this fraction is flagged
+TOLERANCE = 0.15
+
+# Pages sampled for the peak-memory measurement
+MEMORY_SAMPLE = 20
+
+# Old-palette rules the transforms are meant to rewrite
+LEGACY_RULES = [
+    ":root {{ --primary: #6366F1; --accent: #22D3EE; --text: #F8FAFC; --card: #1E293B; }}",
+    ".hero-badge {{ display: inline-block; background: rgba(99,102,241,0.2); border: 1px solid rgba(99,102,241,0.4); }}",
+    ".section-badge {{ background: rgba(34,211,238,0.15); padding: 0.25rem {n}px; }}",
+    ".cta-banner {{ background: linear-gradient(135deg, var(--primary) 0%, #4F46E5 100%); border-radius: 12px; }}",
+    ".cta-content h3 {{ color: white; font-size: {n}px; }}",
+    ".cta-content p {{ opacity: 0.9; }}",
+    ".protection-cta h2 {{ font-size: 1.5rem; }}",
+    ".featured-badge {{ background: #6366F1; color: white; }}",
+    ".cta-button {{ padding: 1rem 2rem; border-radius: 8px; background: #6366F1; }}",
+    ".hero h1 {{ font-family: 'Oswald', sans-serif; font-size: {n}px; }}",
+]
+
+FILLER_RULE = ".block-{n} .item-{m}:hover, .grid-{m} > .card-{n} {{ margin: {n}px {m}px; color: #94A3B8; background: #0F172A; transition: all 0.{m}s ease; }}"
+
+LEGACY_BODY = """
+<header><a href="index.html" class="header-logo"><span class="header-logo-icon">🔊</span>
+                Hearing Guide</a></header>
+<h1>Hearing Protection Superguide</h1>
+<p>Unplugs Learn &mdash; <a href="https://unplugshearing.com/products/hifi">Shop</a>
+<a href="https://learn.unplugshearing.com/decibel-guide.html">Decibels</a></p>
+<footer>Built by audiologists, for everyone. © 2026 Unplugs Hearing. All rights reserved.</footer>
+"""
+
+
+def real_pages():
+    """Every page the pipeline targets, across all site variants."""
+    seen = set()
+    for name, variant in VARIANTS.items():
+        for page in variant_pages(name):
+            path = REPO_ROOT / variant["dir"] / page
+            if path.exists() and path not in seen:
+                seen.add(path)
+                yield path.read_text(encoding='utf-8')
+
+
+def synthetic_pages(count, style_kb, seed=0):
+    """Generate `count` legacy-styled pages, each with ~style_kb of inline CSS."""
+    rng = random.Random(seed)
+    templates = list(real_pages())
+    for i in range(count):
+        rules = []
+        size = 0
+        while size < style_kb * 1024:
+            n, m = rng.randrange(1000), rng.randrange(1, 10)
+            template = rng.choice(LEGACY_RULES) if rng.random() < 0.2 else FILLER_RULE
+            rule = template.format(n=n, m=m)
+            rules.append(rule)
+            size += len(rule) + 9
+        style = "<style>\n        " + "\n        ".join(rules) + "\n    </style>"
+        page = rng.choice(templates)
+        page = page.replace("</head>", style + "\n<title>Page %d | Unplugs</title>\n</head>" % i, 1)
+        yield page.replace("</body>", LEGACY_BODY + "</body>", 1)
+
+
+def measure(transform, pages):
+    """(seconds, bytes, pages) for one pass of `transform` over `pages`."""
+    total_bytes = 0
+    count = 0
+    elapsed = 0.0
+    for page in pages:
+        start = perf_counter()
+        transform(page)
+        elapsed += perf_counter() - start
+        total_bytes += len(page.encode('utf-8'))
+        count += 1
+    return elapsed, total_bytes, count
+
+
+def peak_memory(transform, pages):
+    """Largest traced allocation peak while transforming one page, in KiB."""
+    peak = 0
+    tracemalloc.start()
+    try:
+        for page in pages:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            transform(page)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def corpora(sizes, style_kb):
+    yield "real", lambda: real_pages()
+    for size in sizes:
+        yield f"synthetic-{size}", lambda size=size: synthetic_pages(size, style_kb)
+
+
+def run(sizes, style_kb, transforms):
+    results = {}
+    for corpus, pages in corpora(sizes, style_kb):
+        for name in transforms:
+            transform = STAGES[name]
+            # Every transform starts without parsed stylesheets cached
+            css._block_spans.cache_clear()
+            elapsed, total_bytes, count = measure(transform, pages())
+            css._block_spans.cache_clear()
+            sample = (page for _, page in zip(range(MEMORY_SAMPLE), pages()))
+            results[f"{corpus}/{name}"] = {
+                "pages": count,
+                "mb_per_s": round(total_bytes / 1e6 / elapsed, 2) if elapsed else None,
+                "pages_per_s": round(count / elapsed, 1) if elapsed else None,
+                "peak_kib": round(peak_memory(transform, sample), 1),
+            }
+    return results
+
+
+def load_baseline():
+    try:
+        with open(BASELINE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def print_results(results, baseline):
+    base = baseline.get("results", {})
+    regressions = 0
+    print(f"\n{'case':40} {'pages':>7} {'MB/s':>8} {'pages/s':>9} {'peak KiB':>9}  vs baseline")
+    for case, row in results.items():
+        note = ""
+        previous = base.get(case)
+        if previous and previous.get("mb_per_s") and row["mb_per_s"]:
+            change = row["mb_per_s"] / previous["mb_per_s"] - 1
+            note = f"{change:+.0%}"
+            if change < -TOLERANCE:
+                note += "  ⚠️ slower"
+                regressions += 1
+        print(f"{case:40} {row['pages']:7d} {row['mb_per_s'] or 0:8.2f} "
+              f"{row['pages_per_s'] or 0:9.1f} {row['peak_kib']:9.1f}  {note}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the page rewrite transforms.")
+    parser.add_argument("--sizes", default="1000",
+                        help="comma-separated synthetic corpus sizes (default: %(default)s)")
+    parser.add_argument("--style-kb", type=int, default=64,
+                        help="inline CSS per synthetic page in KiB (default: %(default)s)")
+    parser.add_argument("--transforms", default=",".join(TRANSFORMS),
+                        help="comma-separated transforms to run (default: all)")
+    parser.add_argument("--json", help="also write the results to this path")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help=f"overwrite {BASELINE.relative_to(REPO_ROOT)} with these results")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    transforms = [name.strip() for name in args.transforms.split(",") if name.strip()]
+    unknown = [name for name in transforms if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown transform(s): {', '.join(unknown)}")
+
+    results = run(sizes, args.style_kb, transforms)
+    regressions = print_results(results, load_baseline())
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "style_kb": args.style_kb,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.update_baseline:
+        with open(BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\n✅ Baseline updated: {BASELINE.relative_to(REPO_ROOT)}")
+    elif regressions:
+        print(f"\n⚠️  {regressions} case(s) more than {TOLERANCE:.0%} slower than baseline")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
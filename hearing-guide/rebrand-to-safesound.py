@@ -1,47 +1,21 @@
 #!/usr/bin/env python3
-import os
-import re
-import glob
+"""
+Rebrand Hearing Guide logos, titles and footers to Safe Sound Guide.
 
-replacements = [
-    # Header logo
-    (r'<span class="header-logo-icon">🔊</span>\s*\n?\s*Hearing Guide', 
-     '<span class="header-logo-icon">🔊</span>\n                Safe Sound Guide'),
-    # Footer logo
-    (r'<div class="logo-icon">🔊</div>\s*\n?\s*Hearing Guide',
-     '<div class="logo-icon">🔊</div>\n                    Safe Sound Guide'),
-    # Title tags - preserve page name, change suffix
-    (r'\| Hearing Guide</title>', '| Safe Sound Guide</title>'),
-    # og:title tags
-    (r'\| Hearing Guide">', '| Safe Sound Guide">'),
-    # Hero heading (index page)
-    (r'<h1>The <span class="gradient">Hearing Protection</span> Superguide</h1>',
-     '<h1>The <span class="gradient">Safe Sound</span> Guide</h1>'),
-    # Footer copyright
-    (r'© 2026 Hearing Protection Superguide\.',
-     '© 2026 Safe Sound Guide.'),
-    # "Part of the" references
-    (r'Part of the <a href="index.html">Hearing Protection Superguide</a>',
-     'Part of the <a href="index.html">Safe Sound Guide</a>'),
-    # Index title specifically
-    (r'<title>Hearing Protection Superguide \|',
-     '<title>Safe Sound Guide |'),
-]
+Thin wrapper around the `rebrand_guide` stage in sitebuild.transforms. Run
+`python -m sitebuild` to apply every stage with one read/write per page.
+"""
 
-html_files = glob.glob('*.html')
-for filepath in html_files:
-    with open(filepath, 'r') as f:
-        content = f.read()
-    
-    original = content
-    for pattern, replacement in replacements:
-        content = re.sub(pattern, replacement, content, flags=re.MULTILINE)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sitebuild.pipeline import parse_options, run_pages, variant_pages
+
+def main():
+    run_pages(Path(__file__).parent, variant_pages("hearing-guide"), ["rebrand_guide"], parse_options())
     
-    if content != original:
-        with open(filepath, 'w') as f:
-            f.write(content)
-        print(f"✓ Updated: {filepath}")
-    else:
-        print(f"  No changes: {filepath}")
+    print("\nDone!")
 
-print("\nDone!")
+if __name__ == "__main__":
+    main()
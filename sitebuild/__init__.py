@@ -0,0 +1,3 @@
+"""
+Shared build helpers for the Safe Sound Collective page rewrite scripts.
+"""
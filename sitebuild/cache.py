@@ -0,0 +1,119 @@
+"""
+Content-hash manifest for incremental rewrites.
+
+The manifest (.build-cache.json) records, per page, the hash of the source
+that was read, the hash of what was written and the version of every stage
+that ran. A page whose size/mtime or content hash still matches, with the
+same stage versions, is skipped without running any transform.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import re
+import types
+from functools import lru_cache
+
+from sitebuild import css, partials, replace
+from sitebuild.replace import MultiReplace
+
+MANIFEST_NAME = ".build-cache.json"
+MANIFEST_VERSION = 1
+
+# Module-level values a transform reads that count towards its version
+_TABLE_TYPES = (str, bytes, int, float, dict, list, tuple, set, frozenset, MultiReplace, re.Pattern)
+
+
+def content_hash(content):
+    """sha256 hex digest of a page's text."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _referenced_names(func):
+    names = set()
+    stack = [func.__code__]
+    while stack:
+        code = stack.pop()
+        names.update(code.co_names)
+        stack.extend(const for const in code.co_consts if isinstance(const, types.CodeType))
+    return names
+
+
+def stage_version(func, options=None):
+    """
+    Version hash of a transform: its source, the replacement tables and
+    patterns it references, the module helpers it calls, the replacement
+    and partial engines and the CSS rule index themselves, and any
+    per-variant keyword `options` it runs with.
+    """
+    version = _code_version(func)
+    if options:
+        options = json.dumps(options, sort_keys=True)
+        version = hashlib.sha256(f"{version}\0{options}".encode('utf-8')).hexdigest()[:16]
+    return version
+
+
+@lru_cache(maxsize=None)
+def _code_version(func):
+    h = hashlib.sha256()
+    seen = set()
+    stack = [func]
+    while stack:
+        func = inspect.unwrap(stack.pop())
+        if func in seen:
+            continue
+        seen.add(func)
+        h.update(inspect.getsource(func).encode('utf-8'))
+        for name in sorted(_referenced_names(func)):
+            value = func.__globals__.get(name)
+            if isinstance(value, _TABLE_TYPES):
+                h.update(f"\0{name}={value!r}".encode('utf-8'))
+            elif inspect.isfunction(inspect.unwrap(value)) and value.__module__ == func.__module__:
+                # Helpers defined alongside the transform count too
+                stack.append(value)
+    for engine in (replace, partials, css):
+        h.update(inspect.getsource(engine).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def load_manifest(path):
+    """Load a manifest, starting fresh if it is missing, unreadable or stale."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION, "pages": {}}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "pages": {}}
+    return manifest
+
+
+def save_manifest(path, manifest):
+    """Write the manifest atomically."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def stat_signature(filepath):
+    st = os.stat(filepath)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def is_fresh(entry, filepath, versions):
+    """True if the page on disk is exactly what the same stages last produced."""
+    if not entry or entry.get("stages") != versions:
+        return False
+    return entry.get("stat") == stat_signature(filepath)
+
+
+def make_entry(filepath, versions, input_hash, output_hash):
+    return {
+        "stages": versions,
+        "input": input_hash,
+        "output": output_hash,
+        "stat": stat_signature(filepath),
+    }
@@ -0,0 +1,314 @@
+"""
+Critical CSS: inline what the first screen needs, load the rest later.
+
+For a page's first <style> element this module finds the rules that can
+apply above the fold and splits the page into
+
+- an inline <style> holding only those rules (plus every @font-face, so
+  fonts are still discovered early, and the @keyframes they animate with),
+- the whole original stylesheet, in a fingerprinted `<page>.<hash>.css`
+  linked right after it with `media="print"` and switched to `all` once
+  loaded, so it doesn't block rendering (a <noscript> link covers
+  browsers without scripts).
+
+The deferred sheet holds every rule in its original order and sits where
+the <style> element was, so once it has loaded the cascade is exactly the
+unsplit page's. Above the fold is every element opened before the first
+`.hero` closes, or, without one, the block holding the first <h1>, as in
+sitebuild.fonts.
+
+Selectors are matched against those elements right to left, erring
+towards keeping a rule: child and adjacent combinators are treated as
+descendant and sibling ones, attribute values, state and structural
+pseudo-classes and :not() are ignored, and a class missing from the
+markup matches any element if a script mentions it (see
+sitebuild.hoist.PageClasses). Pages where less than MIN_DEFERRED bytes
+would be deferred are left alone.
+"""
+
+import hashlib
+import re
+from html.parser import HTMLParser
+
+from sitebuild import minify
+from sitebuild.css import STYLE_CLOSE, STYLE_OPEN, _blocks, _split, _strip_comments
+from sitebuild.fonts import VOID_TAGS
+from sitebuild.hoist import PageClasses
+
+# Deferring less than this much CSS isn't worth a request
+MIN_DEFERRED = 2048
+
+DEFERRED_LINK = ('<link rel="stylesheet" href="{0}" media="print" onload="this.media=\'all\'">'
+                 '<noscript><link rel="stylesheet" href="{0}"></noscript>')
+
+_COMPOUND_PART = re.compile(
+    r'(\*|[a-zA-Z][-\w]*)|#([-\w]+)|\.([-\w]+)|\[\s*([-\w]+)[^\]]*\]|::?([-\w]+)(\((?:[^()]|\([^()]*\))*\))?')
+_KEYFRAMES = re.compile(r'@(?:-webkit-)?keyframes\s+([-\w]+)')
+_NAMES = re.compile(r'[-\w]+')
+
+
+class Node:
+    """An element: tag, id, classes, attribute names and its place in the tree."""
+
+    def __init__(self, tag, attrs, parent):
+        attrs = dict(attrs)
+        self.tag = tag
+        self.id = attrs.get("id")
+        self.classes = frozenset((attrs.get("class") or "").split())
+        self.attrs = frozenset(attrs)
+        self.parent = parent
+        self.children = []
+        if parent is not None:
+            parent.children.append(self)
+
+    def ancestors(self):
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def preceding(self):
+        """Earlier siblings, nearest first."""
+        if self.parent is None:
+            return
+        siblings = self.parent.children
+        yield from reversed(siblings[:siblings.index(self)])
+
+
+class _TreeBuilder(HTMLParser):
+    """Build the element tree, up to the end of the fold if `stop` is set."""
+
+    def __init__(self, stop=True):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document", (), None)
+        self.stack = [self.root]
+        self.nodes = []
+        self.landmark = None    # element whose end is the fold
+        self.stop = stop
+        self.folded = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.folded:
+            return
+        node = Node(tag, attrs, self.stack[-1])
+        self.nodes.append(node)
+        if self.landmark is None:
+            if "hero" in node.classes:
+                self.landmark = node
+            elif tag == "h1":
+                parent = node.parent
+                self.landmark = node if parent.tag in ("body", "main", "#document") else parent
+        if tag not in VOID_TAGS:
+            self.stack.append(node)
+
+    def handle_endtag(self, tag):
+        if self.folded or tag in VOID_TAGS:
+            return
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                closed = self.stack[i:]
+                del self.stack[i:]
+                if self.landmark in closed and self.stop:
+                    self.folded = True
+                return
+
+
+def fold(content):
+    """Elements opened before the fold ends, or None if the page has no fold landmark."""
+    builder = _TreeBuilder()
+    builder.feed(content)
+    return builder.nodes if builder.landmark is not None else None
+
+
+def tree(content):
+    """Every element in a page, in document order."""
+    builder = _TreeBuilder(stop=False)
+    builder.feed(content)
+    return builder.nodes
+
+
+def _compounds(selector):
+    """
+    A complex selector as [compound, combinator, compound, ...], with the
+    combinators reduced to " " (descendant) and "~" (sibling).
+    """
+    parts = []
+    current = []
+    depth = 0
+    pending = None
+    for char in selector.strip():
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        if depth == 0 and (char.isspace() or char in ">+~"):
+            if current:
+                parts.append("".join(current))
+                current = []
+            if char in "+~":
+                pending = "~"
+            elif pending is None:
+                pending = " "
+            continue
+        if pending is not None and parts:
+            parts.append(pending)
+        pending = None
+        current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+class Selector:
+    """One complex selector, compiled for matching against Nodes."""
+
+    def __init__(self, text, toggled):
+        self.parts = []
+        for i, part in enumerate(_compounds(text)):
+            self.parts.append(part if i % 2 else self._compound(part, toggled))
+
+    @staticmethod
+    def _compound(text, toggled):
+        tag = element_id = None
+        classes = set()
+        attrs = set()
+        for m in _COMPOUND_PART.finditer(text):
+            name, id_, class_, attr, pseudo, _ = m.groups()
+            if name and name != "*":
+                tag = name.lower()
+            elif id_:
+                element_id = id_
+            elif class_:
+                classes.add(class_)
+            elif attr:
+                attrs.add(attr.lower())
+            elif pseudo == "root":
+                tag = "html"
+        # A class only a script adds could be on any element
+        return tag, element_id, frozenset(classes - toggled), frozenset(attrs)
+
+    def matches(self, node, i=None):
+        i = len(self.parts) - 1 if i is None else i
+        tag, element_id, classes, attrs = self.parts[i]
+        if (tag is not None and node.tag != tag) or (element_id is not None and node.id != element_id):
+            return False
+        if not classes <= node.classes or not attrs <= node.attrs:
+            return False
+        if i == 0:
+            return True
+        related = node.ancestors() if self.parts[i - 1] == " " else node.preceding()
+        return any(self.matches(other, i - 2) for other in related)
+
+
+class Extraction:
+    """A page's first <style> split into the critical part and the whole sheet."""
+
+    def __init__(self, start, end, critical, full, rules, critical_rules):
+        self.start = start      # the CSS's bounds inside the page
+        self.end = end
+        self.critical = critical
+        self.full = full
+        self.rules = rules
+        self.critical_rules = critical_rules
+
+
+def _first_style(content):
+    opening = STYLE_OPEN.search(content)
+    if opening is None:
+        return None
+    body = content.find("<body")
+    closing = STYLE_CLOSE.search(content, opening.end())
+    if closing is None or (body >= 0 and opening.start() > body) or "media=" in opening.group():
+        return None
+    return opening.end(), closing.start()
+
+
+def _select(css, applies):
+    """(kept text, rules, kept rules) of a block list, keeping rules `applies` accepts."""
+    kept = []
+    rules = kept_rules = 0
+    pos = 0
+    for prelude, body_start, body_end in _blocks(css):
+        text = css[pos:body_end + 1]
+        pos = body_end + 1
+        body = css[body_start:body_end]
+        if prelude.startswith("@media") or prelude.startswith("@supports"):
+            inner, n, k = _select(body, applies)
+            rules += n
+            kept_rules += k
+            if k:
+                kept.append(text[:text.index("{") + 1] + inner + "\n}")
+        elif prelude.startswith("@"):
+            # @font-face always; @keyframes are settled once the rules are known
+            if prelude.startswith("@font-face"):
+                kept.append(text)
+        else:
+            rules += 1
+            if applies(prelude):
+                kept_rules += 1
+                kept.append(text)
+    return "".join(kept), rules, kept_rules
+
+
+def extract(content):
+    """The Extraction for a page, or None if it has nothing worth deferring."""
+    bounds = _first_style(content)
+    nodes = fold(content)
+    if bounds is None or nodes is None:
+        return None
+    start, end = bounds
+    css = content[start:end]
+    if "@import" in _strip_comments(css):
+        # Imports have to stay first in the sheet; leave such pages alone
+        return None
+
+    classes = PageClasses(content)
+    toggled = frozenset(classes.script_names - classes.known)
+    by_class = {}
+    for node in nodes:
+        for name in node.classes:
+            by_class.setdefault(name, []).append(node)
+
+    def applies(prelude):
+        for text in _split(prelude, ","):
+            selector = Selector(text, toggled)
+            tag, element_id, needed, attrs = selector.parts[-1]
+            candidates = by_class.get(next(iter(needed)), ()) if needed else nodes
+            if any(selector.matches(node) for node in candidates):
+                return True
+        return False
+
+    critical, rules, critical_rules = _select(css, applies)
+    used = set(_NAMES.findall(_strip_comments(critical)))
+    for prelude, body_start, body_end in _blocks(css):
+        m = _KEYFRAMES.match(prelude)
+        if m and m.group(1) in used:
+            critical += css[css.rfind("}", 0, body_start) + 1:body_end + 1]
+    if len(css.encode('utf-8')) - len(critical.encode('utf-8')) < MIN_DEFERRED:
+        return None
+    return Extraction(start, end, critical.rstrip() + "\n", css, rules, critical_rules)
+
+
+def sheet_name(page, css):
+    """Fingerprinted filename for a page's deferred sheet."""
+    stem = page[:-len(".html")] if page.endswith(".html") else page
+    return f"{stem}.{hashlib.sha256(css.encode('utf-8')).hexdigest()[:8]}.css"
+
+
+def deferred_css(extraction):
+    """The deferred sheet: the whole stylesheet less @font-face, which stays inline."""
+    kept = []
+    pos = 0
+    css = extraction.full
+    for prelude, body_start, body_end in _blocks(css):
+        if not prelude.startswith("@font-face"):
+            kept.append(css[pos:body_end + 1])
+        pos = body_end + 1
+    return minify.css("".join(kept))
+
+
+def rewrite_page(content, extraction, sheet):
+    """A page with its first <style> cut to the critical rules and `sheet` deferred."""
+    closing = STYLE_CLOSE.search(content, extraction.end)
+    return (content[:extraction.start] + extraction.critical + content[extraction.end:closing.end()]
+            + DEFERRED_LINK.format(sheet) + content[closing.end():])
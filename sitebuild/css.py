@@ -0,0 +1,402 @@
+"""
+Lightweight CSS rule index for selector-targeted rewrites.
+
+Every <style> block in a page is tokenized once into rules and
+declarations, indexed by selector. Transforms look rules up by selector,
+edit declarations in place and render the page back; untouched text is
+kept byte for byte.
+
+    sheet = StyleSheet(content)
+    sheet.set_property(".cta-content h3", "color", "#222222")
+    content = sheet.render()
+"""
+
+import re
+from bisect import bisect_right
+from functools import lru_cache, wraps
+from time import perf_counter
+
+from sitebuild import instrument
+
+STYLE_OPEN = re.compile(r'<style\b[^>]*>', re.IGNORECASE)
+STYLE_CLOSE = re.compile(r'</style\s*>', re.IGNORECASE)
+
+
+class Declaration:
+    """One `name: value;` entry. Concatenating the parts gives the source text."""
+
+    def __init__(self, lead, name, sep, value, term):
+        self.lead = lead      # whitespace/comments before the name
+        self.name = name
+        self.sep = sep        # the colon and surrounding whitespace
+        self.value = value    # everything up to the terminator
+        self.term = term      # ";" or "" for a final unterminated entry
+
+    def set(self, value):
+        self.sep = ": "
+        self.value = value
+        self.term = ";"
+
+    def __str__(self):
+        return self.lead + self.name + self.sep + self.value + self.term
+
+
+class Rule:
+    """A rule with declarations; `start`/`end` delimit its body in the page."""
+
+    def __init__(self, selector, start, end, body):
+        self.selector = selector
+        self.start = start
+        self.end = end
+        self.source = body
+        self._declarations = None
+        self.dirty = False
+
+    @property
+    def declarations(self):
+        # Parsed on first use; most rules are never touched
+        if self._declarations is None:
+            self._declarations, self.tail = _parse_declarations(self.source)
+        return self._declarations
+
+    def get(self, name, match=None):
+        """First declaration called `name` (whose value matches `match`, if given)."""
+        if self._declarations is None and name not in self.source:
+            return None
+        for decl in self.declarations:
+            if decl.name == name and (match is None or match.match(decl.value)):
+                return decl
+        return None
+
+    def append(self, name, value):
+        """Add `name: value;` at the end of the body."""
+        declarations = self.declarations
+        if declarations and not declarations[-1].term:
+            declarations[-1].term = ";"
+        declarations.append(Declaration(self.tail + " ", name, ": ", value, ";"))
+        self.tail = ""
+        self.dirty = True
+
+    def body(self):
+        return "".join(str(decl) for decl in self.declarations) + self.tail
+
+
+def _instrumented(method):
+    """Record time, rules changed and bytes changed per edit when profiling."""
+    @wraps(method)
+    def wrapper(self, selector, name, *args, **kwargs):
+        if not instrument.ENABLED:
+            return method(self, selector, name, *args, **kwargs)
+        start = perf_counter()
+        before = self._edited_bytes()
+        changed = method(self, selector, name, *args, **kwargs)
+        elapsed = perf_counter() - start
+        if selector is None:
+            target = "*"
+        elif isinstance(selector, str):
+            target = selector
+        else:
+            target = f"[{len(selector)} rules]"
+        instrument.record(f"{method.__name__} {target} {{{name}}}", elapsed, changed,
+                          self._edited_bytes() - before)
+        return changed
+    return wrapper
+
+
+class StyleSheet:
+    """
+    Index of every rule in a page's <style> blocks. The index holds only
+    (selector, start, end) spans; Rule objects are built when looked up.
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.spans = []
+        self.index = {}
+        self._rules = {}
+        self._starts = None
+        for start, end in _style_blocks(content):
+            self.spans.extend((selector, start + a, start + b)
+                              for selector, a, b in _block_spans(content[start:end]))
+        for i, (selector, _, _) in enumerate(self.spans):
+            if "," in selector:
+                for part in _split(selector, ","):
+                    self.index.setdefault(part.strip(), []).append(i)
+            else:
+                self.index.setdefault(selector, []).append(i)
+
+    def rule(self, i):
+        """The Rule for span i, built on first use."""
+        rule = self._rules.get(i)
+        if rule is None:
+            selector, start, end = self.spans[i]
+            rule = self._rules[i] = Rule(selector, start, end, self.content[start:end])
+        return rule
+
+    @property
+    def rules(self):
+        return [self.rule(i) for i in range(len(self.spans))]
+
+    def select(self, selector):
+        """Rules listing `selector` exactly, in document order."""
+        return [self.rule(i) for i in self.index.get(selector, ())]
+
+    def select_where(self, predicate):
+        """Rules whose full selector text satisfies `predicate`."""
+        return [self.rule(i) for i, (selector, _, _) in enumerate(self.spans)
+                if predicate(selector)]
+
+    def _targets(self, selector, name):
+        if selector is None:
+            # Every rule whose body declares the property: one search over
+            # the page, each hit mapped to its rule by body offset
+            if self._starts is None:
+                self._starts = [start for _, start, _ in self.spans]
+            found = []
+            content = self.content
+            for m in _declared(name).finditer(content):
+                if m.start() and (content[m.start() - 1].isalnum() or content[m.start() - 1] in "-_"):
+                    continue
+                i = bisect_right(self._starts, m.start()) - 1
+                if i >= 0 and m.end() <= self.spans[i][2] and (not found or found[-1] != i):
+                    found.append(i)
+            return [self.rule(i) for i in found]
+        if isinstance(selector, str):
+            return self.select(selector)
+        return selector
+
+    @_instrumented
+    def set_property(self, selector, name, value, match=None):
+        """
+        Set the first `name` declaration on every rule for `selector` (a
+        selector string, a list of rules, or None for all rules). With
+        `match`, only a declaration whose value matches is replaced.
+        Returns the number of rules changed.
+        """
+        changed = 0
+        for rule in self._targets(selector, name):
+            decl = rule.get(name, match)
+            if decl is not None:
+                decl.set(value)
+                rule.dirty = True
+                changed += 1
+        return changed
+
+    @_instrumented
+    def add_property(self, selector, name, value):
+        """Append `name: value;` to every rule for `selector` that lacks it."""
+        changed = 0
+        for rule in self._targets(selector, name):
+            if rule.get(name) is None:
+                rule.append(name, value)
+                changed += 1
+        return changed
+
+    @_instrumented
+    def sub_value(self, selector, name, pattern, repl):
+        """
+        On every rule for `selector`, rewrite the start of the first `name`
+        value that matches `pattern`, keeping the separator and whatever
+        follows the match.
+        """
+        changed = 0
+        for rule in self._targets(selector, name):
+            decl = rule.get(name, pattern)
+            if decl is not None:
+                decl.value = pattern.sub(repl, decl.value, count=1)
+                rule.dirty = True
+                changed += 1
+        return changed
+
+    @_instrumented
+    def replace_declaration(self, selector, name, new_name, value):
+        """Swap the first `name` declaration on each rule for `new_name: value;`."""
+        changed = 0
+        for rule in self._targets(selector, name):
+            decl = rule.get(name)
+            if decl is not None:
+                decl.name = new_name
+                decl.set(value)
+                rule.dirty = True
+                changed += 1
+        return changed
+
+    def _edited_bytes(self):
+        """Size change of all edited rule bodies so far."""
+        return sum(len(rule.body().encode('utf-8')) - len(rule.source.encode('utf-8'))
+                   for rule in self._rules.values() if rule.dirty)
+
+    def render(self):
+        """The page with every edited rule body written back in place."""
+        parts = []
+        pos = 0
+        for rule in sorted(self._rules.values(), key=lambda rule: rule.start):
+            if rule.dirty:
+                parts.append(self.content[pos:rule.start])
+                parts.append(rule.body())
+                pos = rule.end
+        if not parts:
+            return self.content
+        parts.append(self.content[pos:])
+        return "".join(parts)
+
+
+def top_level_blocks(content):
+    """
+    Yield (start, end, prelude, body) for every top-level rule or at-rule
+    block in a page's <style> elements. `start` is where the previous block
+    (or the element) ended, so content[start:end] includes any whitespace
+    and comments leading up to the block and ends with its closing brace.
+    """
+    for css_start, css_end in _style_blocks(content):
+        css = content[css_start:css_end]
+        pos = 0
+        for prelude, body_start, body_end in _blocks(css):
+            if body_end >= len(css):
+                # Unterminated block: leave the rest of this element alone
+                break
+            yield css_start + pos, css_start + body_end + 1, prelude, css[body_start:body_end]
+            pos = body_end + 1
+
+
+# Comments and strings are skipped whole so braces inside them don't count
+_SKIP = r'/\*.*?(?:\*/|\Z)|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+_BLOCK_TOKENS = re.compile(_SKIP + r'|[{}]', re.DOTALL)
+_SPLIT_TOKENS = {
+    sep: re.compile(_SKIP + r'|[()\[\]]|' + re.escape(sep), re.DOTALL)
+    for sep in ",;"
+}
+_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+_SKIP_TOKENS = re.compile(_SKIP, re.DOTALL)
+_INNER_RULE = re.compile(r'([^{}]*)\{([^{}]*)\}')
+
+
+@lru_cache(maxsize=256)
+def _block_spans(css):
+    """
+    (selector, body_start, body_end) of every rule in one <style> element,
+    relative to its text. Cached by that text: stages run one after another
+    over a page, and variants generated from the same page, mostly see the
+    same CSS.
+    """
+    spans = []
+    _parse_block(css, 0, len(css), spans)
+    return tuple(spans)
+
+
+def _parse_block(content, start, end, spans):
+    css = content[start:end]
+    if not _braces_in_comments_or_strings(css):
+        # Fast path: one regex pass picks out every innermost rule
+        for m in _INNER_RULE.finditer(content, start, end):
+            spans.append((_prelude(m.group(1)), m.start(2), m.end(2)))
+        return
+    for selector, body_start, body_end in _blocks(css):
+        body = css[body_start:body_end]
+        if selector.startswith("@") and "{" in _strip_comments(body):
+            # Conditional group (@media, @supports, @keyframes): recurse
+            _parse_block(content, start + body_start, start + body_end, spans)
+        else:
+            spans.append((selector, start + body_start, start + body_end))
+
+
+def _braces_in_comments_or_strings(css):
+    return any("{" in m.group() or "}" in m.group() for m in _SKIP_TOKENS.finditer(css))
+
+
+@lru_cache(maxsize=None)
+def _declared(name):
+    """Pattern finding a declaration of `name` in a rule body."""
+    return re.compile(re.escape(name) + r'\s*:')
+
+
+def _style_blocks(content):
+    """Yield (start, end) of the CSS inside each <style> element."""
+    pos = 0
+    while True:
+        opening = STYLE_OPEN.search(content, pos)
+        if opening is None:
+            return
+        closing = STYLE_CLOSE.search(content, opening.end())
+        if closing is None:
+            return
+        yield opening.end(), closing.start()
+        pos = closing.end()
+
+
+def _blocks(css):
+    """Yield (prelude, body_start, body_end) for each top-level {...} block."""
+    depth = 0
+    prelude_start = 0
+    open_at = 0
+    for m in _BLOCK_TOKENS.finditer(css):
+        token = m.group()
+        if token == "{":
+            if depth == 0:
+                open_at = m.start()
+            depth += 1
+        elif token == "}":
+            if depth == 0:
+                # Stray closing brace
+                prelude_start = m.end()
+                continue
+            depth -= 1
+            if depth == 0:
+                yield _prelude(css[prelude_start:open_at]), open_at + 1, m.start()
+                prelude_start = m.end()
+    if depth:
+        yield _prelude(css[prelude_start:open_at]), open_at + 1, len(css)
+
+
+def _prelude(text):
+    """Selector or at-rule text before a block, whitespace-normalized."""
+    text = _strip_comments(text)
+    if ";" in text:
+        # Drop preceding statement at-rules such as @import
+        text = text.rpartition(";")[2]
+    return " ".join(text.split())
+
+
+def _strip_comments(css):
+    return _COMMENT.sub('', css) if "/*" in css else css
+
+
+def _split(text, sep):
+    """Split on `sep` outside parentheses, brackets, comments and strings."""
+    if sep not in text:
+        return [text]
+    parts = []
+    depth = 0
+    start = 0
+    for m in _SPLIT_TOKENS[sep].finditer(text):
+        token = m.group()
+        if token in "([":
+            depth += 1
+        elif token in ")]":
+            depth -= 1
+        elif token == sep and depth == 0:
+            parts.append(text[start:m.start()])
+            start = m.end()
+    parts.append(text[start:])
+    return parts
+
+
+_DECLARATION = re.compile(r'(\s*(?:/\*.*?\*/\s*)*)([-\w]+)(\s*:\s*)(.*)', re.DOTALL)
+
+
+def _parse_declarations(body):
+    """Split a rule body into Declarations plus trailing whitespace."""
+    chunks = _split(body, ";")
+    declarations = []
+    for i, chunk in enumerate(chunks):
+        last = i == len(chunks) - 1
+        m = _DECLARATION.fullmatch(chunk)
+        if m is None:
+            if last:
+                return declarations, chunk
+            # Not a declaration (stray text); keep it verbatim
+            declarations.append(Declaration(chunk, "", "", "", ";"))
+            continue
+        lead, name, sep, value = m.groups()
+        declarations.append(Declaration(lead, name, sep, value, "" if last else ";"))
+    return declarations, ""
@@ -0,0 +1,174 @@
+"""
+Noise dose: the exposure maths behind the calculators, in one place.
+
+A standard allows `criterion_minutes` at its criterion level and halves the
+allowance for every `exchange_rate` dB above it:
+
+    safe minutes = criterion_minutes / 2 ** ((level - criterion_level) / exchange_rate)
+
+Dose is exposure time over safe time, in percent, summed over a day (or,
+for WHO, a week). NIOSH uses 85 dB and 3 dB (equal energy), OSHA 90 dB and
+5 dB, and WHO's safe-listening guidance 80 dB for 40 hours a week. Levels
+below a standard's `threshold` add no dose.
+
+Every function takes levels and durations as anything NumPy can
+broadcast and works on whole arrays at once, so a season of venue
+schedules (millions of level/duration rows) is one call. `groups` labels
+rows (a night, a venue, a stage) and sums them per label with one
+np.bincount.
+
+The browser pages don't do this maths themselves. Each marks a block in
+its script:
+
+    // dose:tables
+    const DOSE = {...};
+    // /dose:tables
+
+and `python -m sitebuild --dose-tables` fills it with lookup tables
+(safe minutes per whole dB, the protection offset) rendered from this
+module, so the pages and any backend report agree to the rounding.
+"""
+
+import json
+import re
+
+import numpy as np
+
+
+class Standard:
+    """An exposure criterion: level, exchange rate and allowed time."""
+
+    def __init__(self, name, criterion_level, exchange_rate, criterion_minutes, threshold=None):
+        self.name = name
+        self.criterion_level = criterion_level
+        self.exchange_rate = exchange_rate
+        self.criterion_minutes = criterion_minutes
+        self.threshold = threshold    # levels below add no dose; None: every level counts
+
+
+STANDARDS = {
+    # The calculators have always ignored anything under 85 dB
+    "niosh": Standard("NIOSH REL", 85.0, 3.0, 8 * 60, threshold=85.0),
+    "osha": Standard("OSHA PEL", 90.0, 5.0, 8 * 60, threshold=80.0),
+    # WHO/ITU H.870 safe listening: 80 dB(A) for 40 hours a week
+    "who": Standard("WHO weekly", 80.0, 3.0, 40 * 60),
+}
+DEFAULT = "niosh"
+
+# Earplugs as the calculators model them: a flat attenuation, but nothing
+# gets quieter than PROTECTED_FLOOR
+ATTENUATION = 25.0
+PROTECTED_FLOOR = 60.0
+
+# Whole-dB levels in the page lookup tables (values kept to 6 significant digits)
+TABLE_LEVELS = (60, 140)
+
+TABLES_MARKER = re.compile(r'(?P<open>//[ \t]*dose:tables[^\n]*\n)(?P<body>.*?)(?P<indent>[ \t]*)'
+                           r'(?P<close>//[ \t]*/dose:tables)', re.DOTALL)
+
+
+def _standard(name_or_standard):
+    """The Standard for a name in STANDARDS, or the argument if it already is one."""
+    if isinstance(name_or_standard, Standard):
+        return name_or_standard
+    try:
+        return STANDARDS[name_or_standard]
+    except KeyError:
+        raise ValueError(f"unknown standard {name_or_standard!r} (expected one of {', '.join(STANDARDS)})")
+
+
+def safe_minutes(level, standard=DEFAULT):
+    """Minutes a level can be heard before the dose reaches 100% (inf below the threshold)."""
+    std = _standard(standard)
+    level = np.asarray(level, dtype=np.float64)
+    minutes = std.criterion_minutes * np.exp2((std.criterion_level - level) / std.exchange_rate)
+    if std.threshold is not None:
+        minutes = np.where(level < std.threshold, np.inf, minutes)
+    return minutes
+
+
+def percent_dose(level, minutes, standard=DEFAULT):
+    """Dose in percent of `minutes` at `level`, row by row."""
+    return 100.0 * np.asarray(minutes, dtype=np.float64) / safe_minutes(level, standard)
+
+
+def protected_level(level, attenuation=ATTENUATION, floor=PROTECTED_FLOOR):
+    """The level reaching the ear through protection of `attenuation` dB."""
+    return np.maximum(floor, np.asarray(level, dtype=np.float64) - attenuation)
+
+
+def protected_dose(level, minutes, attenuation=ATTENUATION, standard=DEFAULT):
+    """percent_dose() with hearing protection worn."""
+    return percent_dose(protected_level(level, attenuation), minutes, standard)
+
+
+def _grouped(values, groups):
+    """(labels, per-label sums) of `values`, or their total without `groups`."""
+    if groups is None:
+        return values.sum()
+    labels, inverse = np.unique(np.asarray(groups), return_inverse=True)
+    return labels, np.bincount(inverse.ravel(), weights=values.ravel(), minlength=len(labels))
+
+
+def total_dose(level, minutes, groups=None, standard=DEFAULT):
+    """
+    Dose in percent summed over rows: one float, or (labels, doses) when
+    `groups` labels each row.
+    """
+    level, minutes = np.broadcast_arrays(np.asarray(level, dtype=np.float64),
+                                         np.asarray(minutes, dtype=np.float64))
+    return _grouped(percent_dose(level, minutes, standard), groups)
+
+
+def equivalent_level(dose, standard=DEFAULT):
+    """
+    The constant level that gives `dose` percent over the standard's whole
+    period: LEX,8h for NIOSH, OSHA's TWA, LEX,w for WHO. -inf for no dose.
+    """
+    std = _standard(standard)
+    dose = np.asarray(dose, dtype=np.float64)
+    with np.errstate(divide="ignore"):
+        return std.criterion_level + std.exchange_rate * np.log2(dose / 100.0)
+
+
+def lex(level, minutes, groups=None, standard=DEFAULT):
+    """
+    Normalized exposure level over the standard's period (LEX,8h for NIOSH
+    and OSHA, LEX,w for WHO): the equal-energy average of every row,
+    threshold or not. One float, or (labels, levels) with `groups`.
+    """
+    std = _standard(standard)
+    level, minutes = np.broadcast_arrays(np.asarray(level, dtype=np.float64),
+                                         np.asarray(minutes, dtype=np.float64))
+    energy = minutes * np.power(10.0, level / 10.0)
+    summed = _grouped(energy, groups)
+    with np.errstate(divide="ignore"):
+        if groups is None:
+            return 10.0 * np.log10(summed / std.criterion_minutes)
+        labels, sums = summed
+        return labels, 10.0 * np.log10(sums / std.criterion_minutes)
+
+
+def table(standard=DEFAULT, levels=TABLE_LEVELS):
+    """The lookup tables the browser pages use, as a JSON-ready dict."""
+    std = _standard(standard)
+    low, high = levels
+    minutes = safe_minutes(np.arange(low, high + 1), std)
+    return {
+        "standard": std.name,
+        "minLevel": low,
+        # null: no dose at that level
+        "safeMinutes": [None if np.isinf(m) else float(f"{m:.6g}") for m in minutes],
+        "attenuation": ATTENUATION,
+        "protectedFloor": PROTECTED_FLOOR,
+    }
+
+
+def render_tables(content, standard=DEFAULT):
+    """A page with every dose:tables block refilled from table()."""
+    data = json.dumps(table(standard), separators=(",", ":"))
+
+    def fill(m):
+        return f"{m.group('open')}{m.group('indent')}const DOSE = {data};\n{m.group('indent')}{m.group('close')}"
+
+    return TABLES_MARKER.sub(fill, content)
@@ -0,0 +1,681 @@
+"""
+Noise dosimetry for venue certification.
+
+    python -m sitebuild.dosimetry night.wav --calibration 118.5 --venue "The Loft"
+    python -m sitebuild.dosimetry spl-log.csv --venue "The Loft" --out reports/
+    python -m sitebuild.dosimetry stage-*.wav --calibration 118.5 --weighting C
+
+Takes a recording of a night (a WAV from a measurement microphone) or the
+log of a sound level meter (CSV, one LAeq per row) and reports, per
+minute, LAeq, LCpeak and the NIOSH dose, plus a certification summary for
+the night: LAeq, LEX,8h, the loudest LAeq over any 15 minutes, the
+highest LCpeak, NIOSH/OSHA/WHO doses (see sitebuild.dose) and whether the
+night stayed within LIMITS. The limits follow WHO's safe listening venues
+standard: 100 dB LAeq over any 15 minutes, 140 dB LCpeak.
+
+Memory use doesn't grow with the recording. A WAV is memory-mapped and
+read BLOCK_SECONDS at a time, its pages dropped once a block is done;
+the A and C weighting filters (IEC 61672 poles, bilinear transform, needs
+scipy) carry their state from block to block. A CSV log is read row by
+row. Only one row per minute is kept.
+
+WAV samples are relative to digital full scale, so a recording needs
+`--calibration`: the level in dB SPL of a signal whose RMS is full scale.
+Record a 94 dB calibrator tone and pass `94 - 20*log10(rms)`.
+"""
+
+import argparse
+import csv
+import io
+import json
+import math
+import mmap
+import os
+import re
+import signal
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+from sitebuild import dose
+
+BLOCK_SECONDS = 10    # divides a minute, so blocks never straddle one
+WINDOW_MINUTES = 15
+LIMITS = {"laeq_15min": 100.0, "lcpeak": 140.0}
+
+# IEC 61672-1 weighting pole frequencies (Hz)
+F1, F2, F3, F4 = 20.598997, 107.65265, 737.86223, 12194.217
+WEIGHTING_POLES = {"A": (F1, F1, F2, F3, F4, F4), "C": (F1, F1, F4, F4)}
+WEIGHTING_ZEROS = {"A": 4, "C": 2}
+
+MINUTE_FIELDS = ["minute", "seconds", "laeq", "lcpeak", "dose", "total_dose", "running_laeq"]
+
+_WAVE_PCM, _WAVE_FLOAT, _WAVE_EXTENSIBLE = 1, 3, 0xFFFE
+# Level column names, most specific first, compared without punctuation or case
+LEVEL_NAMES = ("laeq", "leq", "level", "spl", "dba", "db", "las", "laf")
+_PEAK_COLUMN = re.compile(r'peak', re.IGNORECASE)
+_TIME_COLUMN = re.compile(r'time|date', re.IGNORECASE)
+
+
+def _energy(level):
+    return 10.0 ** (level / 10.0)
+
+
+def _level(energy):
+    return 10.0 * math.log10(energy) if energy > 0 else -math.inf
+
+
+class Wav:
+    """A WAV file's format and where its samples are, without reading them."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+            if riff != b"RIFF" or wave != b"WAVE":
+                raise ValueError(f"{self.path.name} isn't a RIFF/WAVE file")
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError(f"{self.path.name} has no data chunk")
+                chunk, size = struct.unpack("<4sI", header)
+                if chunk == b"fmt ":
+                    fmt = f.read(size + size % 2)
+                elif chunk == b"data":
+                    self.offset = f.tell()
+                    # Streamed WAVs may leave the size unset
+                    file_size = self.path.stat().st_size
+                    self.size = min(size, file_size - self.offset) if size else file_size - self.offset
+                    break
+                else:
+                    f.seek(size + size % 2, 1)
+        if fmt is None:
+            raise ValueError(f"{self.path.name} has no fmt chunk")
+        tag, self.channels, self.rate, _, self.align, self.bits = struct.unpack("<HHIIHH", fmt[:16])
+        if tag == _WAVE_EXTENSIBLE and len(fmt) >= 26:
+            tag = struct.unpack("<H", fmt[24:26])[0]
+        if (tag, self.bits) not in ((_WAVE_PCM, 8), (_WAVE_PCM, 16), (_WAVE_PCM, 24), (_WAVE_PCM, 32),
+                                    (_WAVE_FLOAT, 32), (_WAVE_FLOAT, 64)):
+            raise ValueError(f"{self.path.name}: unsupported WAV format {tag} with {self.bits}-bit samples")
+        self.float = tag == _WAVE_FLOAT
+        self.frames = self.size // self.align
+
+    def _decode(self, raw, channel):
+        """Samples of one channel from raw frames, as float64 in [-1, 1]."""
+        width = self.bits // 8
+        frames = np.frombuffer(raw, dtype=np.uint8).reshape(-1, self.channels, width)[:, channel]
+        if self.float:
+            return frames.copy().view(f"<f{width}").ravel().astype(np.float64)
+        if width == 1:
+            return (frames.ravel().astype(np.float64) - 128.0) / 128.0
+        if width == 3:
+            padded = np.zeros((len(frames), 4), dtype=np.uint8)
+            padded[:, 1:] = frames
+            return padded.view("<i4").ravel().astype(np.float64) / 2.0 ** 31
+        return frames.copy().view(f"<i{width}").ravel().astype(np.float64) / 2.0 ** (self.bits - 1)
+
+    def blocks(self, frames, channel=0):
+        """Yield one channel `frames` samples at a time, reading the file through mmap."""
+        if not 0 <= channel < self.channels:
+            raise ValueError(f"{self.path.name} has {self.channels} channel(s); no channel {channel}")
+        if self.frames == 0:
+            return
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            for first in range(0, self.frames, frames):
+                start = self.offset + first * self.align
+                end = start + min(frames, self.frames - first) * self.align
+                yield self._decode(mapped[start:end], channel)
+                # Drop every page read so far (readahead leaves some behind
+                # the block too), so they don't pile up in the process
+                if hasattr(mapped, "madvise"):
+                    mapped.madvise(mmap.MADV_DONTNEED, 0, end - end % mmap.PAGESIZE)
+
+
+def weighting_filter(weighting, rate):
+    """
+    Second-order sections of the A or C weighting filter for `rate`,
+    normalized to 0 dB at 1 kHz. Raises ImportError without scipy.
+    """
+    from scipy import signal
+
+    poles = -2 * np.pi * np.array(WEIGHTING_POLES[weighting])
+    z, p, k = signal.bilinear_zpk(np.zeros(WEIGHTING_ZEROS[weighting]), poles, 1.0, rate)
+    _, response = signal.freqz_zpk(z, p, k, worN=[1000.0], fs=rate)
+    return signal.zpk2sos(z, p, k / abs(response[0]))
+
+
+class Filter:
+    """A weighting filter that keeps its state across blocks."""
+
+    def __init__(self, weighting, rate):
+        from scipy import signal
+
+        self._sosfilt = signal.sosfilt
+        self.sos = weighting_filter(weighting, rate)
+        self.state = np.zeros((len(self.sos), 2))
+
+    def __call__(self, samples):
+        out, self.state = self._sosfilt(self.sos, samples, zi=self.state)
+        return out
+
+
+def wav_blocks(path, calibration, weighting="A", channel=0):
+    """
+    Yield (start seconds, seconds, energy, peak level) per block of a WAV:
+    energy is the `weighting`-weighted sum of 10^(L/10) over the block's
+    seconds, peak the C-weighted peak in dB.
+    """
+    wav = Wav(path)
+    frames = wav.rate * BLOCK_SECONDS
+    level = Filter(weighting, wav.rate) if weighting != "Z" else None
+    peak = Filter("C", wav.rate)
+    scale = _energy(calibration) / wav.rate
+    for i, samples in enumerate(wav.blocks(frames, channel)):
+        weighted = level(samples) if level else samples
+        c_weighted = peak(samples)
+        top = float(np.max(np.abs(c_weighted)))
+        yield (i * BLOCK_SECONDS, len(samples) / wav.rate, float(np.dot(weighted, weighted)) * scale,
+               calibration + 20.0 * math.log10(top) if top > 0 else None)
+
+
+def _columns(header, level_column=None, peak_column=None):
+    """Indexes of the (time, level, peak) columns of an SPL log; time and peak may be None."""
+    names = [name.strip() for name in header]
+
+    def find(wanted, pattern, exclude=()):
+        if wanted is not None:
+            if wanted not in names:
+                raise ValueError(f"no column {wanted!r} (columns: {', '.join(names)})")
+            return names.index(wanted)
+        if pattern is not None:
+            return next((i for i, name in enumerate(names) if pattern.search(name) and i not in exclude), None)
+        plain = [re.sub(r'[^a-z0-9]', '', name.lower()) for name in names]
+        return next((i for prefix in LEVEL_NAMES for i, name in enumerate(plain)
+                     if name.startswith(prefix) and i not in exclude), None)
+
+    peak = find(peak_column, _PEAK_COLUMN)
+    time = find(None, _TIME_COLUMN, {peak})
+    level = find(level_column, None, {peak, time})
+    if level is None:
+        raise ValueError(f"no level column found (columns: {', '.join(names)}); pass --level-column")
+    return time, level, peak
+
+
+def _timestamp(value):
+    """Seconds for a log's time column: a number, or an ISO date and time."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def csv_blocks(path, interval=None, level_column=None, peak_column=None):
+    """
+    Yield (start seconds, seconds, energy, peak level) per row of an SPL
+    log. A row lasts `interval` seconds, or until the next row's time (the
+    last as long as the one before), or 1 s without either.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        try:
+            dialect = csv.Sniffer().sniff(f.read(4096), ",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        f.seek(0)
+        reader = csv.reader(f, dialect)
+        time, level, peak = _columns(next(reader), level_column, peak_column)
+        rows = ((_timestamp(row[time]) if time is not None else None, float(row[level]),
+                 float(row[peak]) if peak is not None and row[peak].strip() else None)
+                for row in reader if len(row) > level and row[level].strip())
+        first = previous = None
+        elapsed = 0.0
+        duration = interval or 1.0
+        for current in rows:
+            if previous is None:
+                first = current[0]
+            else:
+                if interval is None and current[0] is not None:
+                    duration = current[0] - previous[0]
+                if duration > 0:
+                    start = previous[0] - first if previous[0] is not None else elapsed
+                    yield start, duration, _energy(previous[1]) * duration, previous[2]
+                    elapsed = start + duration
+            previous = current
+        if previous is not None and duration > 0:
+            start = previous[0] - first if previous[0] is not None else elapsed
+            yield start, duration, _energy(previous[1]) * duration, previous[2]
+
+
+class Meter:
+    """Per-minute LAeq and peak from a stream of blocks."""
+
+    def __init__(self):
+        self.minutes = []     # (minute, seconds, energy, peak level or None)
+        self._current = None
+
+    def add(self, start, seconds, energy, peak):
+        minute = int(start // 60)
+        if self._current is not None and self._current[0] != minute:
+            self.minutes.append(tuple(self._current))
+            self._current = None
+        if self._current is None:
+            self._current = [minute, 0.0, 0.0, None]
+        current = self._current
+        current[1] += seconds
+        current[2] += energy
+        if peak is not None and (current[3] is None or peak > current[3]):
+            current[3] = peak
+
+    def finish(self):
+        if self._current is not None:
+            self.minutes.append(tuple(self._current))
+            self._current = None
+        return self
+
+
+def measure(path, calibration=None, weighting="A", channel=0, interval=None, level_column=None, peak_column=None):
+    """A finished Meter for a WAV recording or CSV SPL log."""
+    path = Path(path)
+    if path.suffix.lower() in (".wav", ".wave"):
+        if calibration is None:
+            raise ValueError("a WAV needs --calibration (dB SPL at full-scale RMS)")
+        blocks = wav_blocks(path, calibration, weighting, channel)
+    else:
+        blocks = csv_blocks(path, interval, level_column, peak_column)
+    meter = Meter()
+    for block in blocks:
+        meter.add(*block)
+    return meter.finish()
+
+
+def minute_rows(meter):
+    """One dict per minute: LAeq, LCpeak, NIOSH dose, running totals."""
+    if not meter.minutes:
+        return []
+    index, seconds, energy, peaks = zip(*meter.minutes)
+    seconds = np.array(seconds)
+    energy = np.array(energy)
+    laeq = 10.0 * np.log10(energy / seconds)
+    doses = dose.percent_dose(laeq, seconds / 60.0)
+    running = 10.0 * np.log10(np.cumsum(energy) / np.cumsum(seconds))
+    return [{"minute": m, "seconds": round(s, 3), "laeq": round(l, 1),
+             "lcpeak": None if p is None else round(p, 1), "dose": round(d, 3), "total_dose": round(t, 3),
+             "running_laeq": round(r, 1)}
+            for m, s, l, p, d, t, r in zip(index, seconds.tolist(), laeq.tolist(), peaks, doses.tolist(),
+                                           np.cumsum(doses).tolist(), running.tolist())]
+
+
+def _windows(meter):
+    """
+    LAeq over each WINDOW_MINUTES ending at each minute. Windows reaching
+    back before the recording started count the missing time as quiet, so
+    early on they are a lower bound and a single loud minute doesn't pass
+    for a loud quarter hour.
+    """
+    index = np.array([m[0] for m in meter.minutes])
+    seconds = np.zeros(index[-1] + 1)
+    energy = np.zeros(index[-1] + 1)
+    seconds[index] = [m[1] for m in meter.minutes]
+    energy[index] = [m[2] for m in meter.minutes]
+    kernel = np.ones(WINDOW_MINUTES)
+    window_seconds = np.convolve(seconds, kernel)[:len(seconds)]
+    window_seconds[:WINDOW_MINUTES - 1] = WINDOW_MINUTES * 60
+    window_energy = np.convolve(energy, kernel)[:len(energy)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 10.0 * np.log10(window_energy / window_seconds)[index]
+
+
+def report(meter, venue=None, night=None, source=None, weighting="A"):
+    """The certification summary of a measured night, as a JSON-ready dict."""
+    result = {"venue": venue, "night": night, "source": source, "weighting": weighting,
+              "minutes": len(meter.minutes), "limits": LIMITS}
+    if not meter.minutes:
+        return dict(result, certified=None)
+    seconds = np.array([m[1] for m in meter.minutes])
+    energy = np.array([m[2] for m in meter.minutes])
+    laeq = 10.0 * np.log10(energy / seconds)
+    windows = _windows(meter)
+    peaks = [m[3] for m in meter.minutes if m[3] is not None]
+    over = int(np.sum(windows > LIMITS["laeq_15min"]))
+    peak = max(peaks) if peaks else None
+    return dict(
+        result,
+        duration_seconds=round(float(seconds.sum()), 1),
+        laeq=round(_level(energy.sum() / seconds.sum()), 1),
+        lex_8h=round(float(dose.lex(laeq, seconds / 60.0)), 1),
+        laeq_15min_max=round(float(windows.max()), 1),
+        lcpeak_max=None if peak is None else round(peak, 1),
+        dose={name: round(float(dose.total_dose(laeq, seconds / 60.0, standard=name)), 1)
+              for name in dose.STANDARDS},
+        minutes_over_limit=over,
+        certified=over == 0 and (peak is None or peak <= LIMITS["lcpeak"]),
+    )
+
+
+def _duration(seconds):
+    minutes = round(seconds / 60)
+    return f"{minutes // 60}h {minutes % 60:02d}m" if minutes >= 60 else f"{minutes}m"
+
+
+def print_report(summary):
+    """The compact text form of a report()."""
+    title = " · ".join(str(part) for part in (summary["venue"], summary["night"], summary["source"]) if part)
+    if not summary["minutes"]:
+        print(f"⚠️  {title}: no measurements")
+        return
+    peak = f" · LCpeak {summary['lcpeak_max']} dB" if summary["lcpeak_max"] is not None else ""
+    leq = f"L{summary['weighting']}eq" if summary["weighting"] in ("C", "Z") else "LAeq"
+    print(f"🎚️  {title} · {_duration(summary['duration_seconds'])}")
+    print(f"   {leq} {summary['laeq']} dB · LEX,8h {summary['lex_8h']} dB · "
+          f"loudest {WINDOW_MINUTES} min {summary['laeq_15min_max']} dB{peak}")
+    print("   dose: " + " · ".join(f"{dose.STANDARDS[name].name} {value:,.0f}%"
+                                  for name, value in summary["dose"].items()))
+    if summary["certified"]:
+        print("   ✅ within the Safe Sound limits")
+        return
+    if summary["minutes_over_limit"]:
+        print(f"   ❌ over {LIMITS['laeq_15min']:g} dB LAeq,{WINDOW_MINUTES}min for "
+              f"{summary['minutes_over_limit']} minutes")
+    if summary["lcpeak_max"] is not None and summary["lcpeak_max"] > LIMITS["lcpeak"]:
+        print(f"   ❌ peaks above {LIMITS['lcpeak']:g} dB LCpeak")
+
+
+def night_of(path):
+    """The date a recording was made, from its modification time."""
+    return date.fromtimestamp(Path(path).stat().st_mtime).isoformat()
+
+
+class Recording:
+    """One input and what it measures: venue, stage, night and calibration."""
+
+    def __init__(self, path, venue=None, stage=None, night=None, calibration=None):
+        self.path = Path(path)
+        self.venue = venue
+        self.stage = stage
+        self.night = night
+        self.calibration = calibration
+
+    def signature(self, options):
+        """What a report depends on; a stored report with another signature is stale."""
+        stat = self.path.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "calibration": self.calibration,
+                "weighting": options.weighting, "channel": options.channel, "interval": options.interval,
+                "level_column": options.level_column, "peak_column": options.peak_column}
+
+
+def read_manifest(path, venue=None, night=None, calibration=None):
+    """
+    Recordings listed in a CSV with a `path` column (relative to the
+    manifest) and optional `venue`, `stage`, `night` and `calibration`
+    columns; empty cells fall back to the arguments.
+    """
+    path = Path(path)
+    recordings = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+            if not row.get("path"):
+                continue
+            recordings.append(Recording(
+                path.parent / row["path"],
+                row.get("venue") or venue,
+                row.get("stage") or None,
+                row.get("night") or night,
+                float(row["calibration"]) if row.get("calibration") else calibration,
+            ))
+    return recordings
+
+
+def _write_atomic(path, text):
+    """Write via a temporary file, so an interrupted run never leaves half a file."""
+    partial = path.with_name(path.name + ".partial")
+    partial.write_text(text, encoding='utf-8')
+    os.replace(partial, path)
+
+
+def process(recording, options, target=None):
+    """
+    Measure one Recording and return (report, seconds taken). With
+    `target` (an output path without suffix), write its minutes CSV and
+    then its report, which marks it done.
+    """
+    started = perf_counter()
+    meter = measure(recording.path, recording.calibration, options.weighting, options.channel,
+                    options.interval, options.level_column, options.peak_column)
+    wav = recording.path.suffix.lower() in (".wav", ".wave")
+    summary = report(meter, recording.venue, recording.night or night_of(recording.path), recording.path.name,
+                     options.weighting if wav else "as logged")
+    summary["stage"] = recording.stage
+    summary["input"] = recording.signature(options)
+    if target is not None:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, MINUTE_FIELDS)
+        writer.writeheader()
+        writer.writerows(minute_rows(meter))
+        _write_atomic(target.with_name(target.name + ".minutes.csv"), buffer.getvalue())
+        _write_atomic(target.with_name(target.name + ".report.json"), json.dumps(summary, indent=2) + "\n")
+    return summary, perf_counter() - started
+
+
+def _quiet_worker():
+    # Ctrl-C reaches the whole process group; finished reports are already
+    # on disk, so a worker just stops
+    signal.signal(signal.SIGINT, lambda *_: os._exit(1))
+
+
+def _process(recording, options, target):
+    """process() for a pool worker: errors come back as text rather than raised."""
+    try:
+        return process(recording, options, target)
+    except ImportError:
+        return "A/C weighting needs scipy (pip install scipy)", 0.0
+    except (OSError, ValueError) as e:
+        return str(e), 0.0
+
+
+def _targets(recordings, out):
+    """Output path (without suffix) per recording, mirroring the inputs' layout under `out`."""
+    if out is None:
+        return [None] * len(recordings)
+    parents = [str(recording.path.resolve().parent) for recording in recordings]
+    common = Path(os.path.commonpath(parents))
+    return [Path(out) / recording.path.resolve().relative_to(common).with_suffix("") for recording in recordings]
+
+
+def _stored(target, signature):
+    """The report already in `target` for these inputs, or None."""
+    try:
+        summary = json.loads(target.with_name(target.name + ".report.json").read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    return summary if summary.get("input") == signature else None
+
+
+def run(recordings, options, jobs=1, out=None, force=False):
+    """
+    Measure every Recording, in a pool of `jobs` processes (0: one per
+    CPU), printing a line per recording as it finishes. With `out`,
+    recordings whose report there is current are skipped, so an
+    interrupted run resumes where it stopped. Returns {index: report}
+    for those measured or resumed, and prints errors for the rest.
+    """
+    targets = _targets(recordings, out)
+    results = {}
+    pending = []
+    for i, (recording, target) in enumerate(zip(recordings, targets)):
+        stored = None
+        if target is not None and not force:
+            try:
+                stored = _stored(target, recording.signature(options))
+            except OSError:
+                pass
+        if stored is not None:
+            results[i] = stored
+        else:
+            pending.append(i)
+    total = len(recordings)
+    if results:
+        print(f"⏭️  {len(results)} of {total} recordings already measured in {out}")
+
+    done = len(results)
+
+    def finished(i, outcome, seconds):
+        nonlocal done
+        done += 1
+        recording = recordings[i]
+        name = " / ".join(part for part in (recording.stage, recording.path.name) if part)
+        if isinstance(outcome, str):
+            print(f"❌ [{done}/{total}] {name}: {outcome}")
+            return
+        results[i] = outcome
+        length = outcome.get("duration_seconds") or 0
+        speed = f", {length / seconds:,.0f}× real time" if seconds else ""
+        verdict = {True: "✅", False: "🔴", None: "⚠️ "}[outcome["certified"]]
+        laeq = f"LAeq {outcome['laeq']} dB, " if outcome["minutes"] else ""
+        print(f"{verdict} [{done}/{total}] {name}: {laeq}{_duration(length)} in {seconds:.1f}s{speed}")
+
+    jobs = jobs or os.cpu_count()
+    if jobs <= 1 or len(pending) <= 1:
+        for i in pending:
+            finished(i, *_process(recordings[i], options, targets[i]))
+        return results
+    pool = ProcessPoolExecutor(max_workers=min(jobs, len(pending)), initializer=_quiet_worker)
+    try:
+        futures = {pool.submit(_process, recordings[i], options, targets[i]): i for i in pending}
+        for future in as_completed(futures):
+            finished(futures[future], *future.result())
+    except KeyboardInterrupt:
+        pool.shutdown(wait=False, cancel_futures=True)
+        print(f"\n⏸️  interrupted after {done} of {total}" + ("; rerun to resume" if out else ""))
+        raise
+    pool.shutdown()
+    return results
+
+
+SUMMARY_FIELDS = ["venue", "stage", "recordings", "nights", "hours", "laeq", "laeq_15min_max", "lcpeak_max",
+                  "niosh_dose_max", "osha_dose_max", "minutes_over_limit", "nights_certified"]
+
+
+def aggregate(reports):
+    """One row per venue and stage: energy-averaged LAeq, worst values and certified nights."""
+    groups = {}
+    for summary in reports:
+        if summary.get("minutes"):
+            groups.setdefault((summary["venue"] or "", summary.get("stage") or ""), []).append(summary)
+    rows = []
+    for (venue, stage), group in sorted(groups.items()):
+        seconds = np.array([s["duration_seconds"] for s in group])
+        laeq = np.array([s["laeq"] for s in group])
+        peaks = [s["lcpeak_max"] for s in group if s["lcpeak_max"] is not None]
+        nights = {}
+        for s in group:
+            nights[s["night"]] = nights.get(s["night"], True) and s["certified"]
+        rows.append({
+            "venue": venue, "stage": stage, "recordings": len(group), "nights": len(nights),
+            "hours": round(float(seconds.sum()) / 3600, 2),
+            "laeq": round(10.0 * math.log10(float(np.sum(seconds * 10.0 ** (laeq / 10.0))) / seconds.sum()), 1),
+            "laeq_15min_max": max(s["laeq_15min_max"] for s in group),
+            "lcpeak_max": max(peaks) if peaks else None,
+            "niosh_dose_max": max(s["dose"]["niosh"] for s in group),
+            "osha_dose_max": max(s["dose"]["osha"] for s in group),
+            "minutes_over_limit": sum(s["minutes_over_limit"] for s in group),
+            "nights_certified": sum(1 for certified in nights.values() if certified),
+        })
+    return rows
+
+
+def write_summary(path, rows):
+    """
+    Write aggregate() rows as Parquet (for a .parquet path; needs pyarrow)
+    or CSV. Returns the path written, which is the .csv sibling if pyarrow
+    is missing.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("⚠️  Parquet needs pyarrow (pip install pyarrow); writing CSV instead")
+            path = path.with_suffix(".csv")
+        else:
+            pq.write_table(pa.Table.from_pylist(rows) if rows else
+                           pa.table({name: [] for name in SUMMARY_FIELDS}), path)
+            return path
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-minute noise dose and a certification report per venue night.")
+    parser.add_argument("inputs", nargs="*", help="WAV recordings or CSV SPL logs, one per night")
+    parser.add_argument("--manifest",
+                        help="CSV listing recordings: path, and optionally venue, stage, night, calibration")
+    parser.add_argument("--calibration", type=float,
+                        help="dB SPL of a full-scale RMS signal in the WAVs (e.g. 94 - 20*log10(rms) "
+                             "of a calibrator recording)")
+    parser.add_argument("--weighting", choices=("A", "C", "Z"), default="A",
+                        help="frequency weighting for Leq and dose from WAVs (default: %(default)s)")
+    parser.add_argument("--channel", type=int, default=0, help="WAV channel the microphone is on (default: 0)")
+    parser.add_argument("--interval", type=float,
+                        help="seconds each CSV row covers (default: from its time column, else 1)")
+    parser.add_argument("--level-column", help="CSV column holding LAeq (default: guessed from the header)")
+    parser.add_argument("--peak-column", help="CSV column holding LCpeak (default: any with 'peak' in its name)")
+    parser.add_argument("--venue", help="venue name for the report")
+    parser.add_argument("--night", help="date of the night (default: the file's modification date)")
+    parser.add_argument("--out", metavar="DIR",
+                        help="write <input>.report.json and <input>.minutes.csv for each input under DIR, "
+                             "and skip inputs already measured there")
+    parser.add_argument("--force", action="store_true", help="with --out, measure inputs again even if done")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="worker processes (0 = one per CPU, default: 1)")
+    parser.add_argument("--summary", metavar="FILE",
+                        help="write one row per venue and stage to FILE (.parquet or .csv)")
+    args = parser.parse_args(argv)
+
+    recordings = [Recording(path, args.venue, None, args.night, args.calibration) for path in args.inputs]
+    if args.manifest:
+        recordings += read_manifest(args.manifest, args.venue, args.night, args.calibration)
+    if not recordings:
+        parser.error("no inputs (list files or pass --manifest)")
+
+    if len(recordings) == 1 and not args.out and not args.summary:
+        recording = recordings[0]
+        try:
+            summary, _ = process(recording, args)
+        except ImportError:
+            sys.exit("❌ A/C weighting needs scipy (pip install scipy)")
+        except (OSError, ValueError) as e:
+            sys.exit(f"❌ {recording.path.name}: {e}")
+        print_report(summary)
+        return
+
+    try:
+        results = run(recordings, args, args.jobs, args.out, args.force)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    if len(recordings) == 1 and results:
+        print_report(results[0])
+    if args.summary:
+        rows = aggregate(results.values())
+        path = write_summary(args.summary, rows)
+        print(f"📊 {len(rows)} venue/stage rows in {path}")
+    if len(results) < len(recordings):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
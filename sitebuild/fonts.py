@@ -0,0 +1,320 @@
+"""
+Bamboy subsetting and preload hints.
+
+Bamboy is only used for display headings, yet every page that declares it
+points at the full font files. For a set of pages this module:
+
+- collects the characters rendered in Bamboy (text of elements whose
+  font-family resolves to Bamboy, in both cases, plus printable ASCII for
+  script-generated text),
+- writes a `<name>.subset.woff2` next to each Bamboy .woff2 those pages use
+  (needs fontTools with brotli),
+- adds a subset @font-face with a unicode-range after each full one, so the
+  subset serves every collected character and the full font only loads for
+  anything else,
+- preloads the subset .woff2 (never the .woff fallback) on pages whose
+  above-the-fold text (the <header>, a .hero section or the first <h1>)
+  renders in Bamboy.
+
+Selector matching only looks at each selector's last compound (tag, id,
+classes), so it errs towards collecting more characters, not fewer.
+"""
+
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+from sitebuild.css import STYLE_OPEN, StyleSheet, top_level_blocks
+
+FAMILY = "Bamboy"
+SUBSET_SUFFIX = ".subset.woff2"
+SUBSET_MARK = "/* Bamboy subset */"
+
+# Always kept: script-generated headings are usually plain ASCII
+BASELINE = "".join(chr(c) for c in range(0x20, 0x7F))
+
+BOLD_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "b", "strong", "th"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+             "meta", "param", "source", "track", "wbr"}
+
+_FAMILY = re.compile(r"""['"]?Bamboy['"]?""")
+_VAR = re.compile(r'var\(\s*(--[-\w]+)')
+_WOFF2_URL = re.compile(r"""url\(\s*['"]?([^'")]+\.woff2)['"]?\s*\)""")
+_WEIGHT = re.compile(r'font-weight\s*:\s*(\d+)')
+_SUBSET_FACE = re.compile(r'\n?[ \t]*' + re.escape(SUBSET_MARK) + r'\s*@font-face\s*\{[^}]*\}')
+_SUBSET_PRELOAD = re.compile(r'[ \t]*<link rel="preload" href="[^"]*' + re.escape(SUBSET_SUFFIX)
+                             + r'" as="font" type="font/woff2" crossorigin>\n')
+_COMPOUND = re.compile(r'([.#]?)([-\w]+)')
+_COMBINATOR = re.compile(r'\s*[\s>+~]\s*')
+
+
+class FontRule:
+    """A CSS rule that sets font-family, reduced to its subject compounds."""
+
+    def __init__(self, selector, bamboy, weight):
+        self.subjects = [_subject(part) for part in selector.split(",")]
+        self.bamboy = bamboy
+        self.weight = weight
+
+    def matches(self, element):
+        tag, element_id, classes = element
+        for subject_tag, subject_id, subject_classes in self.subjects:
+            if subject_tag not in (None, "*", tag):
+                continue
+            if subject_id is not None and subject_id != element_id:
+                continue
+            if subject_classes <= classes:
+                return True
+        return False
+
+
+def _subject(selector):
+    """(tag, id, classes) required by the last compound of a selector."""
+    compound = _COMBINATOR.split(selector.strip())[-1]
+    compound = re.sub(r'::?[-\w]+(\([^)]*\))?|\[[^\]]*\]', '', compound)
+    tag = element_id = None
+    classes = set()
+    for kind, name in _COMPOUND.findall(compound):
+        if kind == ".":
+            classes.add(name)
+        elif kind == "#":
+            element_id = name
+        else:
+            tag = name.lower()
+    if compound.startswith("*"):
+        tag = "*"
+    return tag, element_id, frozenset(classes)
+
+
+def font_rules(content):
+    """FontRules for every rule in the page that sets font-family."""
+    sheet = StyleSheet(content)
+    bamboy_vars = set()
+    for rule in sheet.rules:
+        for decl in rule.declarations:
+            if decl.name.startswith("--") and _FAMILY.search(decl.value):
+                bamboy_vars.add(decl.name)
+    rules = []
+    for rule in sheet.rules:
+        if rule.selector.startswith("@"):
+            continue
+        decl = rule.get("font-family")
+        if decl is None:
+            continue
+        value = decl.value
+        bamboy = bool(_FAMILY.match(value.strip())) or any(
+            name in bamboy_vars for name in _VAR.findall(value.split(",")[0]))
+        weight = rule.get("font-weight")
+        weight = int(weight.value) if weight is not None and weight.value.strip().isdigit() else None
+        rules.append(FontRule(rule.selector, bamboy, weight))
+    return rules
+
+
+class _TextWalker(HTMLParser):
+    """Collect (text, element stack, above the fold) for each text run in <body>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.fold = []    # parallel to stack: is this element above the fold
+        self.runs = []
+        self.in_body = False
+        self.skip = 0
+        self.seen_h1 = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "body":
+            self.in_body = True
+        if tag in ("script", "style", "template"):
+            self.skip += 1
+        if tag in VOID_TAGS:
+            return
+        element = (tag, attrs.get("id"), frozenset((attrs.get("class") or "").split()))
+        self.stack.append(element)
+        self.fold.append(tag == "header" or "hero" in element[2] or (tag == "h1" and not self.seen_h1))
+        if tag == "h1":
+            self.seen_h1 = True
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "template"):
+            self.skip = max(0, self.skip - 1)
+        if tag in VOID_TAGS:
+            return
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                del self.stack[i:]
+                del self.fold[i:]
+                break
+
+    def handle_data(self, data):
+        if self.in_body and not self.skip and data.strip():
+            self.runs.append((data, tuple(self.stack), any(self.fold)))
+
+
+def bamboy_text(content, rules=None):
+    """
+    (characters rendered in Bamboy, weights used above the fold) for one page.
+    """
+    rules = font_rules(content) if rules is None else rules
+    if not any(rule.bamboy for rule in rules):
+        return set(), set()
+    walker = _TextWalker()
+    walker.feed(content)
+    chars = set()
+    weights = set()
+    for text, stack, above in walker.runs:
+        matched = []
+        for depth in range(len(stack) - 1, -1, -1):
+            matched = [rule for rule in rules if rule.matches(stack[depth])]
+            if matched:
+                break
+        if not any(rule.bamboy for rule in matched):
+            continue
+        chars.update(text)
+        if above:
+            weight = next((rule.weight for rule in matched if rule.weight), None)
+            if weight is None:
+                weight = 700 if any(tag in BOLD_TAGS for tag, _, _ in stack) else 400
+            weights.add(weight)
+    return chars, weights
+
+
+def bamboy_faces(content):
+    """(start, end, woff2 url, weight) of each Bamboy @font-face in a page."""
+    faces = []
+    for start, end, prelude, body in top_level_blocks(content):
+        if prelude != "@font-face" or not _FAMILY.search(body) or SUBSET_MARK in content[start:end]:
+            continue
+        url = _WOFF2_URL.search(body)
+        if url is None:
+            continue
+        weight = _WEIGHT.search(body)
+        faces.append((start, end, url.group(1), int(weight.group(1)) if weight else 400))
+    return faces
+
+
+def subset_url(url):
+    return url[:-len(".woff2")] + SUBSET_SUFFIX
+
+
+def unicode_range(chars):
+    """CSS unicode-range covering `chars`, as compact U+a-b runs."""
+    codes = sorted({ord(c) for c in chars})
+    runs = []
+    for code in codes:
+        if runs and runs[-1][1] == code - 1:
+            runs[-1][1] = code
+        else:
+            runs.append([code, code])
+    return ", ".join(f"U+{a:X}" if a == b else f"U+{a:X}-{b:X}" for a, b in runs)
+
+
+def closest(weight, available):
+    """The weight in `available` nearest `weight`, the heavier one on a tie."""
+    return min(available, key=lambda w: (abs(w - weight), -w))
+
+
+def rewrite_page(content, chars, weights, subsetted=lambda url: True):
+    """
+    A page with a subset @font-face after each Bamboy face whose url passes
+    `subsetted`, and a preload for the subset files its above-the-fold text
+    needs. Earlier subset faces and preloads are replaced.
+    """
+    content = _SUBSET_PRELOAD.sub("", _SUBSET_FACE.sub("", content))
+    faces = [face for face in bamboy_faces(content) if subsetted(face[2])]
+    if not faces:
+        return content
+    ranges = unicode_range(chars)
+    parts = []
+    pos = 0
+    for start, end, url, weight in faces:
+        at = content.index("@font-face", start)
+        indent = content[content.rfind("\n", 0, at) + 1:at]
+        parts.append(content[pos:end])
+        parts.append(
+            f"\n{indent}{SUBSET_MARK}\n"
+            f"{indent}@font-face {{\n"
+            f"{indent}    font-family: '{FAMILY}';\n"
+            f"{indent}    src: url('{subset_url(url)}') format('woff2');\n"
+            f"{indent}    font-weight: {weight};\n"
+            f"{indent}    font-style: normal;\n"
+            f"{indent}    font-display: swap;\n"
+            f"{indent}    unicode-range: {ranges};\n"
+            f"{indent}}}"
+        )
+        pos = end
+    parts.append(content[pos:])
+    content = "".join(parts)
+
+    by_weight = {weight: url for _, _, url, weight in faces}
+    preload = sorted({by_weight[closest(weight, by_weight)] for weight in weights})
+    if preload:
+        opening = STYLE_OPEN.search(content)
+        line_start = content.rfind("\n", 0, opening.start()) + 1
+        indent = content[line_start:opening.start()]
+        links = "".join(f'{indent}<link rel="preload" href="{subset_url(url)}" as="font" '
+                        f'type="font/woff2" crossorigin>\n' for url in preload)
+        content = content[:line_start] + links + content[line_start:]
+    return content
+
+
+def subset_font(source, target, chars):
+    """Write a WOFF2 of `source` holding only `chars`. Needs fontTools and brotli."""
+    from fontTools import subset
+
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["*"]
+    font = subset.load_font(str(source), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text="".join(sorted(chars)))
+    subsetter.subset(font)
+    subset.save_font(font, str(target), options)
+
+
+def optimize(directory, pages, dry_run=False):
+    """
+    Subset the Bamboy fonts used by `pages` under `directory` and rewrite the
+    pages to use them. Returns ({subset path: characters}, {filepath:
+    new_content}) for the subsets written and pages changed (or that would
+    be, with `dry_run`). Raises ImportError if fontTools is missing.
+    """
+    directory = Path(directory)
+    found = {}
+    chars = set(BASELINE)
+    for page in pages:
+        filepath = directory / page
+        if not filepath.exists():
+            continue
+        content = filepath.read_text(encoding='utf-8')
+        page_chars, weights = bamboy_text(content)
+        if page_chars:
+            found[filepath] = (content, weights)
+            for c in page_chars:
+                # text-transform may change the case of anything we saw
+                chars.update({c, c.upper(), c.lower()})
+    if not found:
+        return {}, {}
+    chars = {c for c in chars if len(c) == 1 and c.isprintable()}
+
+    subsets = {}
+    for filepath, (content, _) in found.items():
+        for _, _, url, _ in bamboy_faces(content):
+            source = (filepath.parent / url).resolve()
+            if source.exists():
+                subsets[Path(subset_url(str(source)))] = source
+
+    changed = {}
+    for filepath, (content, weights) in found.items():
+        new = rewrite_page(content, chars, weights,
+                           lambda url: (filepath.parent / url).resolve() in subsets.values())
+        if new != content:
+            changed[filepath] = new
+
+    if not dry_run:
+        for target, source in subsets.items():
+            subset_font(source, target, chars)
+        for filepath, content in changed.items():
+            filepath.write_text(content, encoding='utf-8')
+    return {target: chars for target in subsets}, changed
@@ -0,0 +1,186 @@
+"""
+Cache-Control and preload headers for a variant's vercel.json.
+
+Vercel serves every file with `max-age=0, must-revalidate` unless
+vercel.json says otherwise. From the built pages and the files next to
+them this module derives a `headers` list:
+
+- fingerprinted files (`site.<hash>.css` from sitebuild.hoist, or any
+  name with an 8+ digit hex hash) never change under their name, so they
+  are `immutable` for a year,
+- other fonts keep their name across rebuilds; they are cached for
+  ASSET_MAX_AGE and then revalidated,
+- pages revalidate on every request (their ETag makes that a 304), so a
+  deploy shows up at once and never links a fingerprinted file that is
+  gone,
+- each page gets a `Link: rel=preload` header for what it needs before
+  first paint: the local stylesheets it links (not deferred ones, see
+  sitebuild.critical), the fonts it already preloads, and the Bamboy
+  face its above-the-fold text renders in (see sitebuild.fonts). Only
+  files that exist are listed. The header lets the browser, or the CDN's
+  Early Hints, start on them before the HTML is parsed.
+
+Paths that a vercel.json redirect catches are never served, so they get
+no entries. The generated list replaces the file's `headers`; every
+other key is kept as written.
+"""
+
+import json
+import re
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from sitebuild import fonts
+from sitebuild.vercel import Config
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+PAGE_CACHE = "public, max-age=0, must-revalidate"
+# Unfingerprinted fonts: a week, then revalidate
+ASSET_MAX_AGE = 7 * 24 * 3600
+
+FONT_SUFFIXES = {".woff2", ".woff"}
+FINGERPRINT = re.compile(r'\.[0-9a-f]{8,}\.[a-z0-9]+$')
+
+_STYLESHEET = re.compile(r'<link rel="stylesheet" href="([^"]+)"([^>]*)>')
+# Deferred sheets (see sitebuild.critical) aren't needed for first paint
+_NOSCRIPT = re.compile(r'<noscript>.*?</noscript>', re.DOTALL)
+_PRELOAD = re.compile(r'<link rel="preload" href="([^"]+)" as="(\w+)"(?: type="([^"]+)")?( crossorigin)?[^>]*>')
+
+FONT_TYPES = {".woff2": "font/woff2", ".woff": "font/woff"}
+
+
+class Preload:
+    """One resource a page needs early, as a Link header value."""
+
+    def __init__(self, url, kind, type=None, crossorigin=False):
+        self.url = url
+        self.kind = kind
+        self.type = type
+        self.crossorigin = crossorigin
+
+    def __str__(self):
+        value = f"<{self.url}>; rel=preload; as={self.kind}"
+        if self.type:
+            value += f'; type="{self.type}"'
+        if self.crossorigin:
+            value += "; crossorigin"
+        return value
+
+
+def page_url(page, clean_urls):
+    """The path a page is served at."""
+    if page == "index.html":
+        return "/"
+    if clean_urls and page.endswith(".html"):
+        return "/" + page[:-len(".html")]
+    return "/" + page
+
+
+def _local(directory, page, href):
+    """Root-relative path of a same-site file `href` in `page`, or None."""
+    if urlsplit(href).scheme or href.startswith("//") or href.startswith("data:"):
+        return None
+    url = urljoin("/" + page, href)
+    return url if (Path(directory) / url.lstrip("/")).is_file() else None
+
+
+def critical(directory, page, content):
+    """Preloads for the stylesheets and fonts `page` needs before first paint."""
+    found = {}
+
+    def add(href, kind, type=None, crossorigin=False):
+        url = _local(directory, page, href)
+        if url is not None and url not in found:
+            found[url] = Preload(url, kind, type, crossorigin)
+
+    for href, attrs in _STYLESHEET.findall(_NOSCRIPT.sub("", content)):
+        if 'media="print"' not in attrs:
+            add(href, "style")
+    preloaded = set()
+    for href, kind, type, crossorigin in _PRELOAD.findall(content):
+        add(href, kind, type or None, bool(crossorigin))
+        preloaded.add(href)
+
+    _, weights = fonts.bamboy_text(content)
+    faces = {weight: url for _, _, url, weight in fonts.bamboy_faces(content)}
+    if weights and faces:
+        for url in sorted({faces[fonts.closest(weight, faces)] for weight in weights}):
+            if fonts.subset_url(url) in preloaded:
+                continue
+            add(url, "font", FONT_TYPES.get(Path(url).suffix), True)
+    return list(found.values())
+
+
+def _assets(directory):
+    """Root-relative paths of the fingerprinted files and fonts in a variant."""
+    directory = Path(directory)
+    fingerprinted = []
+    fonts_found = []
+    for path in sorted(p for p in directory.rglob("*") if p.is_file()):
+        relative = path.relative_to(directory)
+        if any(part.startswith(".") or part == "__pycache__" for part in relative.parts):
+            continue
+        url = "/" + relative.as_posix()
+        if FINGERPRINT.search(path.name):
+            fingerprinted.append(url)
+        elif path.suffix in FONT_SUFFIXES:
+            fonts_found.append(url)
+    return fingerprinted, fonts_found
+
+
+def _source(url):
+    """A vercel.json source matching exactly `url`."""
+    return re.sub(r'([()*+?:])', r'\\\1', url)
+
+
+def build(directory, pages):
+    """
+    (headers list for the variant in `directory`, {page: [Preload]}),
+    leaving out anything a redirect in its vercel.json catches.
+    """
+    directory = Path(directory)
+    config = Config.load(directory)
+
+    def served(url):
+        return not any(rule.match(url) for rule, _, _ in config.redirects)
+
+    fingerprinted, font_files = _assets(directory)
+    entries = []
+    font_dirs = sorted({url.rsplit("/", 1)[0] for url in font_files
+                        if served(url) and url.count("/") > 1})
+    for font_dir in font_dirs:
+        entries.append({"source": f"{_source(font_dir)}/(.*)",
+                        "headers": [{"key": "Cache-Control", "value": f"public, max-age={ASSET_MAX_AGE}"}]})
+    for url in font_files:
+        if served(url) and url.count("/") == 1:
+            entries.append({"source": _source(url),
+                            "headers": [{"key": "Cache-Control", "value": f"public, max-age={ASSET_MAX_AGE}"}]})
+    # After the font directories, so a fingerprinted font there is immutable
+    for url in fingerprinted:
+        if served(url):
+            entries.append({"source": _source(url), "headers": [{"key": "Cache-Control", "value": IMMUTABLE}]})
+
+    preloads = {}
+    for page in pages:
+        filepath = directory / page
+        url = page_url(page, config.clean_urls)
+        if not filepath.exists() or not served(url):
+            continue
+        preloads[page] = critical(directory, page, filepath.read_text(encoding='utf-8'))
+        headers = [{"key": "Cache-Control", "value": PAGE_CACHE}]
+        if preloads[page]:
+            headers.append({"key": "Link", "value": ", ".join(str(p) for p in preloads[page])})
+        sources = [url] if config.clean_urls or page != "index.html" else ["/", "/index.html"]
+        for source in sources:
+            entries.append({"source": _source(source), "headers": headers})
+    return entries, preloads
+
+
+def render(text, entries):
+    """vercel.json text with `headers` set to `entries` (dropped if empty)."""
+    data = json.loads(text) if text.strip() else {}
+    if entries:
+        data["headers"] = entries
+    else:
+        data.pop("headers", None)
+    return json.dumps(data, indent=2, ensure_ascii=False) + "\n"
@@ -0,0 +1,252 @@
+"""
+Hoist CSS shared by every page of a variant into one fingerprinted sheet.
+
+A top-level rule (or at-rule block) is hoisted when it appears, with the
+same selector and declarations, exactly once in the inline <style> of
+every participating page. Pages participate if they carry most of the
+rules that a majority of pages share, so a one-off page with its own
+design doesn't shrink the shared set. The hoisted rules are written to
+`site.<hash>.css` and linked from each participating page in place of
+its first <style> element; only page-specific rules stay inline.
+
+Hoisted rules end up ahead of every rule left inline, so a rule is only
+hoisted if no page has an earlier inline rule it competes with: one of
+equal specificity, setting a same property, whose subject could be the
+same element. Two class selectors can only hit the same element if some
+element in the page carries all their classes. A class missing from the
+markup may be added by a script, but only to an element the script can
+find by one of its classes or its id; a class no script mentions marks a
+dead rule.
+Within those limits the cascade is unchanged.
+
+Page stages only see inline CSS, so hoisting runs on the deployable copy
+(see sitebuild.output) and the sources keep their full inline CSS.
+"""
+
+import hashlib
+import re
+import textwrap
+
+from sitebuild.css import STYLE_OPEN, _blocks, _split, _strip_comments, top_level_blocks
+
+SHEET_LINK = '<link rel="stylesheet" href="{}">'
+
+# Don't bother hoisting less than this much CSS
+MIN_BYTES = 1024
+
+_PROPERTY = re.compile(r'([-\w]+)\s*:')
+_IDS = re.compile(r'#[-\w]+')
+_CLASSES = re.compile(r'\.[-\w]+|\[[^\]]*\]|(?<!:):(?!:)[-\w]+')
+_TYPES = re.compile(r'(?:^|(?<=[\s>+~(]))[a-zA-Z][-\w]*|::[-\w]+')
+_START_TAG = re.compile(r'<[a-zA-Z][^>]*>')
+_CLASS_ATTR = re.compile(r'\bclass="([^"]*)"')
+_ID_ATTR = re.compile(r'\bid="([^"]*)"')
+_NAME = re.compile(r'[-\w]+')
+_COMBINATOR = re.compile(r'\s*[\s>+~]\s*')
+_SCRIPT_ELEMENT = re.compile(r'<script\b[^>]*>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+_EMPTY_STYLE = re.compile(r'\n?[ \t]*<style\b[^>]*>\s*</style\s*>', re.IGNORECASE)
+
+
+class Block:
+    """A top-level CSS block in a page; `key` is its normalized text."""
+
+    def __init__(self, start, end, key, props, selectors, text, movable):
+        self.start = start
+        self.end = end
+        self.key = key
+        self.props = props
+        self.selectors = selectors    # {(specificity, subject classes or None)}
+        self.text = text
+        self.movable = movable
+
+
+def specificity(selector):
+    """(ids, classes, types) of one complex selector, roughly per CSS3."""
+    selector = re.sub(r'"[^"]*"|\'[^\']*\'', '', selector)
+    return (len(_IDS.findall(selector)), len(_CLASSES.findall(selector)),
+            len(_TYPES.findall(selector)))
+
+
+def _subject_classes(selector):
+    """Classes the subject (last compound) of a selector requires, or None."""
+    subject = _COMBINATOR.split(selector.strip())[-1]
+    classes = frozenset(re.findall(r'\.([-\w]+)', subject))
+    return classes or None
+
+
+def _selectors(prelude, body):
+    """
+    (specificity, subject classes) for each selector a block's declarations
+    apply through. Conditional groups use their inner rules; other at-rules
+    (@font-face, @keyframes) only compete with blocks of the same kind.
+    """
+    if not prelude.startswith("@"):
+        return frozenset((specificity(part), _subject_classes(part))
+                         for part in _split(prelude, ","))
+    if "{" not in body:
+        return frozenset([(prelude.split()[0], None)])
+    found = set()
+    for inner, inner_start, inner_end in _blocks(body):
+        found |= _selectors(inner, body[inner_start:inner_end])
+    return frozenset(found)
+
+
+class PageClasses:
+    """Which classes a page's elements carry, for telling if two rules can meet."""
+
+    def __init__(self, content):
+        scripts = " ".join(m.group(1) for m in _SCRIPT_ELEMENT.finditer(content))
+        self.script_names = frozenset(_NAME.findall(scripts))
+        self.elements = []    # (classes, reachable from a script)
+        for m in _START_TAG.finditer(content):
+            classes = _CLASS_ATTR.search(m.group())
+            classes = frozenset(classes.group(1).split()) if classes else frozenset()
+            element_id = _ID_ATTR.search(m.group())
+            names = classes | {element_id.group(1)} if element_id else classes
+            if names:
+                self.elements.append((classes, not names.isdisjoint(self.script_names)))
+        self.known = frozenset().union(*(classes for classes, _ in self.elements))
+
+    def same_element(self, a, b):
+        """Could subjects needing classes `a` and `b` be one element?"""
+        if a is None or b is None:
+            return True
+        names = a | b
+        toggled = names - self.known
+        if not toggled <= self.script_names:
+            # A class neither in the markup nor in any script: dead rule
+            return False
+        needed = names & self.known
+        if not needed:
+            return True
+        # Scripts only add classes to elements they can find by class or id
+        return any(needed <= classes and (reachable or not toggled)
+                   for classes, reachable in self.elements)
+
+
+def _competes(block, earlier, classes):
+    if not block.props & earlier.props:
+        return False
+    return any(spec == other_spec and classes.same_element(subject, other_subject)
+               for spec, subject in block.selectors
+               for other_spec, other_subject in earlier.selectors)
+
+
+def page_blocks(content):
+    """Every top-level block in a page's <style> elements, in document order."""
+    blocks = []
+    for start, end, prelude, body in top_level_blocks(content):
+        text = content[start:end]
+        body = _strip_comments(body)
+        # Statement at-rules (@import, @charset) before the block must stay
+        # put, and @font-face stays inline so fonts are discovered early
+        movable = (";" not in _strip_comments(text[:text.index("{")])
+                   and not prelude.startswith("@font-face"))
+        key = prelude + "{" + " ".join(body.split()) + "}"
+        props = frozenset(_PROPERTY.findall(body))
+        blocks.append(Block(start, end, key, props, _selectors(prelude, body), text, movable))
+    return blocks
+
+
+def shared_keys(pages, classes):
+    """
+    Keys of the blocks to hoist, in cascade order, given each page's blocks
+    and PageClasses.
+    """
+    counts = []
+    for blocks in pages:
+        page_counts = {}
+        for block in blocks:
+            if block.movable:
+                page_counts[block.key] = page_counts.get(block.key, 0) + 1
+        counts.append(page_counts)
+    candidates = {key for key, n in counts[0].items()
+                  if n == 1 and all(page_counts.get(key) == 1 for page_counts in counts[1:])}
+
+    # Keep only keys every page has in the same relative order
+    positions = [{block.key: i for i, block in enumerate(blocks)} for blocks in pages]
+    ordered = []
+    for block in pages[0]:
+        if block.key not in candidates:
+            continue
+        if ordered and any(pos[block.key] < pos[ordered[-1]] for pos in positions):
+            continue
+        ordered.append(block.key)
+    candidates = set(ordered)
+
+    # Drop keys that would jump ahead of an inline rule they compete with
+    changed = True
+    while changed:
+        changed = False
+        for blocks, page_classes in zip(pages, classes):
+            inline = []
+            for block in blocks:
+                if block.key in candidates:
+                    if not any(_competes(block, earlier, page_classes) for earlier in inline):
+                        continue
+                    candidates.discard(block.key)
+                    changed = True
+                inline.append(block)
+    return [key for key in ordered if key in candidates]
+
+
+def _participants(pages):
+    """
+    The pages (a {filepath: blocks} dict) that share the design system:
+    those carrying at least half of the rules most pages have in common.
+    """
+    counts = {}
+    for blocks in pages.values():
+        for key in {block.key for block in blocks}:
+            counts[key] = counts.get(key, 0) + 1
+    common = {key for key, n in counts.items() if 2 * n > len(pages)}
+    return {filepath: blocks for filepath, blocks in pages.items()
+            if 2 * len(common.intersection(block.key for block in blocks)) >= len(common)}
+
+
+def _sheet_text(block):
+    lines = block.text.split("\n")
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    return textwrap.dedent("\n".join(lines)).rstrip() + "\n"
+
+
+def rewrite_page(content, blocks, keys, sheet):
+    """A page with the hoisted blocks removed and `sheet` linked."""
+    opening = STYLE_OPEN.search(content)
+    line_start = content.rfind("\n", 0, opening.start()) + 1
+    indent = content[line_start:opening.start()]
+    parts = [content[:opening.start()] + SHEET_LINK.format(sheet) + "\n" + indent]
+    pos = opening.start()
+    for block in blocks:
+        if block.key in keys:
+            parts.append(content[pos:block.start])
+            pos = block.end
+    parts.append(content[pos:])
+    return _EMPTY_STYLE.sub("", "".join(parts))
+
+
+def hoist(contents):
+    """
+    Hoist the CSS shared by the pages in `contents` ({page: content}).
+    Returns (sheet, text, hoisted, changed): the sheet filename and CSS
+    (both None if nothing was hoisted), the number of rules moved and
+    {page: new_content} for every page rewritten.
+    """
+    contents = {page: content for page, content in contents.items() if STYLE_OPEN.search(content)}
+    blocks = _participants({page: page_blocks(content) for page, content in contents.items()})
+    contents = {page: contents[page] for page in blocks}
+    if len(contents) < 2:
+        return None, None, 0, {}
+
+    keys = shared_keys(list(blocks.values()), [PageClasses(content) for content in contents.values()])
+    first = next(iter(blocks.values()))
+    hoisted = [_sheet_text(block) for block in first if block.key in keys]
+    if sum(len(text.encode('utf-8')) for text in hoisted) < MIN_BYTES:
+        return None, None, 0, {}
+
+    text = "\n".join(hoisted)
+    sheet = f"site.{hashlib.sha256(text.encode('utf-8')).hexdigest()[:8]}.css"
+    keys = set(keys)
+    changed = {page: rewrite_page(content, blocks[page], keys, sheet) for page, content in contents.items()}
+    return sheet, text, len(hoisted), changed
@@ -0,0 +1,346 @@
+"""
+Vendored, responsive copies of the images pages hotlink from Unplugs.
+
+Some pages load the Unplugs logo and product shots straight from the
+Shopify CDN: cross-origin, full size, unsized and eager. For a set of
+pages this module:
+
+- downloads each image from IMAGE_HOSTS once into `images/`, under a
+  fingerprinted name, and records it in `images/images.json`,
+- works out the size each <img> renders at from the page's top-level
+  rules that match it (see sitebuild.critical) and set a px `width` or
+  `height`, and encodes AVIF and WebP copies at 1x and 2x that width, or
+  at the LADDER widths where the layout decides the size (needs Pillow;
+  AVIF needs a Pillow built with it, or pillow-avif-plugin),
+- rewrites each <img> as a <picture> with one <source> per format. The
+  <img> keeps its other attributes and gets the vendored original as
+  `src`, the rendered (or intrinsic) `width` and `height`, so the layout
+  doesn't shift when it loads, `decoding="async"` and, below the fold,
+  `loading="lazy"`. Images above the fold stay eager; deferring them
+  would only delay the first paint.
+
+The <picture> is `display: contents`, so it adds no box and selectors
+such as `.logo img` still match. A page whose CSS puts a child
+combinator right before `img` gets the WebP copies in the <img>'s own
+`srcset` instead. Rewritten tags are recognised on the next run and
+regenerated, so the widths follow the CSS, and copies no page uses any
+more are removed. Every generated name carries a hash of its bytes,
+which sitebuild.headers serves as immutable.
+"""
+
+import hashlib
+import io
+import json
+import math
+import re
+from pathlib import Path, PurePosixPath
+from urllib.parse import urlsplit
+
+from sitebuild import critical, webfonts
+from sitebuild.css import _split, _strip_comments, top_level_blocks
+from sitebuild.hoist import specificity
+
+IMAGE_HOSTS = ("unplugshearing.com", "www.unplugshearing.com")
+IMAGES_DIR = "images"
+MANIFEST_NAME = "images.json"
+
+# Preferred first
+FORMATS = ("avif", "webp")
+QUALITY = {"avif": 50, "webp": 80}
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+# Widths for images the layout sizes
+LADDER = (320, 640, 960, 1280, 1920)
+DENSITIES = (1, 2)
+
+PICTURE = '<picture style="display:contents">{sources}{img}</picture>'
+SOURCE = '<source type="{type}" srcset="{srcset}" sizes="{sizes}">'
+
+_TAG = r'<img\b(?:[^>"\']|"[^"]*"|\'[^\']*\')*>'
+_IMAGE = re.compile(r'<picture style="display:contents">(?:<source\b[^>]*>)*(' + _TAG + r')</picture>'
+                    r'|(' + _TAG + r')', re.IGNORECASE)
+_ATTR = re.compile(r'\s+([-\w:]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>"\']+))?')
+_SIZE = re.compile(r'(?:^|;)\s*(width|height)\s*:\s*([^;]+)')
+_PX = re.compile(r'(\d+(?:\.\d+)?)px(?:\s*!important)?$')
+_CHILD_IMG = re.compile(r'>\s*img\b')
+
+# Attributes the rewrite sets
+MANAGED = {"src", "srcset", "sizes", "width", "height", "loading", "decoding"}
+
+
+class Image:
+    """One <img> in a page: its span, with any <picture> around it, and attributes."""
+
+    def __init__(self, start, end, attrs):
+        self.start = start
+        self.end = end
+        self.attrs = attrs    # [(name, raw value or None)], in order
+
+    @property
+    def src(self):
+        for name, raw in self.attrs:
+            if name == "src" and raw:
+                return raw[1:-1] if raw[0] in "'\"" else raw
+        return None
+
+
+def page_images(content):
+    """Every <img> in a page, in document order."""
+    images = []
+    for m in _IMAGE.finditer(content):
+        tag = m.group(1) or m.group(2)
+        attrs = _ATTR.findall(tag[len("<img"):-1].rstrip("/"))
+        images.append(Image(m.start(), m.end(), [(name.lower(), raw or None) for name, raw in attrs]))
+    return images
+
+
+def is_remote(src):
+    """Whether `src` is an image this module vendors."""
+    parts = urlsplit(src or "")
+    return parts.scheme in ("http", "https") and parts.hostname in IMAGE_HOSTS
+
+
+def load_manifest(directory):
+    """{source url: entry} of the images vendored under `directory`."""
+    try:
+        return json.loads((Path(directory) / IMAGES_DIR / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def _length(value):
+    m = _PX.match(value.strip())
+    return float(m.group(1)) if m else value.strip()
+
+
+def rendered_sizes(content):
+    """
+    (width, height) the CSS gives each <img> in the page, in document
+    order: px values as floats, anything else as the CSS text, None where
+    no rule sets it. Rules inside @media and other at-rules are ignored.
+    """
+    rules = []
+    for order, (_, _, prelude, body) in enumerate(top_level_blocks(content)):
+        if prelude.startswith("@") or "img" not in prelude:
+            continue
+        found = dict(_SIZE.findall(_strip_comments(body)))
+        for text in _split(prelude, ","):
+            if found:
+                rules.append((specificity(text), order, critical.Selector(text, frozenset()), found))
+    rules.sort(key=lambda rule: rule[:2])
+    sizes = []
+    for node in critical.tree(content):
+        if node.tag != "img":
+            continue
+        size = {"width": None, "height": None}
+        for _, _, selector, found in rules:
+            if selector.matches(node):
+                size.update((name, _length(value)) for name, value in found.items())
+        sizes.append((size["width"], size["height"]))
+    return sizes
+
+
+def display_size(css, intrinsic):
+    """(width, height) in px an image renders at, or None if the layout decides."""
+    width, height = css
+    w, h = intrinsic
+    if isinstance(width, float) and isinstance(height, float):
+        return round(width), round(height)
+    if isinstance(width, float) and height in (None, "auto"):
+        return round(width), round(width * h / w)
+    if isinstance(height, float) and width in (None, "auto"):
+        return round(height * w / h), round(height)
+    return None
+
+
+def widths_for(displays, intrinsic_width):
+    """Widths to encode for an image shown at each of `displays` (None: layout-sized)."""
+    widths = set()
+    for display in displays:
+        if display is None:
+            widths.update(w for w in LADDER if w < intrinsic_width)
+            widths.add(intrinsic_width)
+        else:
+            widths.update(min(intrinsic_width, math.ceil(display[0] * d)) for d in DENSITIES)
+    return sorted(widths)
+
+
+def _stem(url):
+    name = PurePosixPath(urlsplit(url).path).stem
+    return re.sub(r'[^-\w]+', '-', name).strip("-_") or "image"
+
+
+def _fingerprinted(stem, data, suffix):
+    return f"{IMAGES_DIR}/{stem}.{hashlib.sha256(data).hexdigest()[:8]}{suffix}"
+
+
+def _pillow():
+    """PIL.Image and the FORMATS it can encode. Raises ImportError without Pillow."""
+    from PIL import Image as PILImage, features
+
+    formats = [fmt for fmt in FORMATS if features.check(fmt)]
+    if "avif" not in formats:
+        try:
+            import pillow_avif    # noqa: F401 (registers AVIF with Pillow)
+            formats.insert(0, "avif")
+        except ImportError:
+            pass
+    return PILImage, formats
+
+
+def encode(source, width, fmt):
+    """`source` (a PIL image) scaled down to `width` and encoded as `fmt`."""
+    from PIL import Image as PILImage
+
+    image = source
+    if width < source.width:
+        image = source.resize((width, round(source.height * width / source.width)), PILImage.LANCZOS)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.mode in ("LA", "PA") or "transparency" in image.info else "RGB")
+    out = io.BytesIO()
+    image.save(out, fmt.upper(), quality=QUALITY[fmt])
+    return out.getvalue()
+
+
+def _files(entry):
+    """Every file an entry vendors."""
+    return [entry["file"]] + [path for files in entry.get("variants", {}).values() for path in files.values()]
+
+
+def _tag(image, entry, display, lazy, picture):
+    """The rewritten markup for one Image."""
+    width, height = display or (entry["width"], entry["height"])
+    sizes = f"{width}px" if display else f"(max-width: {width}px) 100vw, {width}px"
+    variants = entry.get("variants", {})
+    formats = [fmt for fmt in FORMATS if variants.get(fmt)]
+
+    def srcset(fmt):
+        return ", ".join(f"{variants[fmt][w]} {w}w" for w in sorted(variants[fmt], key=int))
+
+    attrs = [("src", f'"{entry["file"]}"')]
+    if not picture and "webp" in formats:
+        attrs += [("srcset", f'"{srcset("webp")}"'), ("sizes", f'"{sizes}"')]
+    attrs += [("width", f'"{width}"'), ("height", f'"{height}"')]
+    attrs += [(name, raw) for name, raw in image.attrs if name not in MANAGED]
+    if lazy:
+        attrs.append(("loading", '"lazy"'))
+    attrs.append(("decoding", '"async"'))
+    img = "<img" + "".join(f" {name}" if raw is None else f" {name}={raw}" for name, raw in attrs) + ">"
+    if not picture or not formats:
+        return img
+    sources = "".join(SOURCE.format(type=MIME_TYPES[fmt], srcset=srcset(fmt), sizes=sizes) for fmt in formats)
+    return PICTURE.format(sources=sources, img=img)
+
+
+def rewrite_page(content, manifest, displays):
+    """
+    A page with the tag of every image in `manifest` rewritten.
+    `displays` maps each such <img>'s index in the page to its display
+    size, or None if the layout decides it.
+    """
+    by_file = {entry["file"]: url for url, entry in manifest.items()}
+    nodes = critical.fold(content)
+    above = sum(1 for node in nodes if node.tag == "img") if nodes is not None else 0
+    picture = not any(_CHILD_IMG.search(prelude) for _, _, prelude, _ in top_level_blocks(content))
+    parts = []
+    pos = 0
+    for i, image in enumerate(page_images(content)):
+        url = image.src if image.src in manifest else by_file.get(image.src)
+        if url is None:
+            continue
+        parts.append(content[pos:image.start])
+        parts.append(_tag(image, manifest[url], displays.get(i), i >= above, picture))
+        pos = image.end
+    parts.append(content[pos:])
+    return "".join(parts)
+
+
+def optimize(directory, pages, dry_run=False):
+    """
+    Vendor the IMAGE_HOSTS images `pages` under `directory` use, encode
+    their responsive copies and rewrite the pages. Returns (manifest of
+    the images used, {filepath: new_content}, [files written]); nothing is
+    written with `dry_run`. Raises ImportError if an image needs Pillow
+    and it is missing, and OSError if one can't be fetched.
+    """
+    directory = Path(directory)
+    manifest = load_manifest(directory)
+    by_file = {entry["file"]: url for url, entry in manifest.items()}
+
+    found = {}      # filepath -> (content, {image index: url}, css sizes)
+    for page in pages:
+        filepath = directory / page
+        if not filepath.exists():
+            continue
+        content = filepath.read_text(encoding='utf-8')
+        images = page_images(content)
+        urls = {i: image.src if is_remote(image.src) else by_file[image.src]
+                for i, image in enumerate(images) if is_remote(image.src) or image.src in by_file}
+        if urls:
+            sizes = rendered_sizes(content)
+            if len(sizes) != len(images):
+                # An <img> inside a script or comment; don't guess which is which
+                sizes = [(None, None)] * len(images)
+            found[filepath] = (content, urls, sizes)
+    if not found:
+        return {}, {}, []
+
+    pil = formats = None
+    used = {}
+    written = []    # (path, bytes)
+    for url in sorted({url for _, urls, _ in found.values() for url in urls.values()}):
+        entry = json.loads(json.dumps(manifest.get(url, {"variants": {}})))
+        data = None
+        if "file" not in entry or not (directory / entry["file"]).exists():
+            data = webfonts._get(url)
+            entry["file"] = _fingerprinted(_stem(url), data, PurePosixPath(urlsplit(url).path).suffix.lower())
+            entry.pop("width", None)
+            written.append((directory / entry["file"], data))
+        if "width" not in entry:
+            if pil is None:
+                pil, formats = _pillow()
+            with pil.open(io.BytesIO(data) if data else directory / entry["file"]) as source:
+                entry["width"], entry["height"] = source.size
+        intrinsic = (entry["width"], entry["height"])
+        displays = [display_size(sizes[i], intrinsic)
+                    for _, urls, sizes in found.values() for i, u in urls.items() if u == url]
+        wanted = [str(w) for w in widths_for(displays, entry["width"])]
+        have = entry["variants"]
+        missing = [(fmt, w) for fmt in FORMATS for w in wanted
+                   if not (w in have.get(fmt, {}) and (directory / have[fmt][w]).exists())]
+        if missing:
+            if pil is None:
+                pil, formats = _pillow()
+            with pil.open(io.BytesIO(data) if data else directory / entry["file"]) as source:
+                source.load()
+                for fmt, w in missing:
+                    if fmt in formats:
+                        encoded = encode(source, int(w), fmt)
+                        have.setdefault(fmt, {})[w] = _fingerprinted(f"{_stem(url)}-{w}", encoded, f".{fmt}")
+                        written.append((directory / have[fmt][w], encoded))
+        entry["variants"] = {fmt: {w: have[fmt][w] for w in wanted if w in have.get(fmt, {})}
+                             for fmt in FORMATS if any(w in have.get(fmt, {}) for w in wanted)}
+        used[url] = entry
+
+    changed = {}
+    for filepath, (content, urls, sizes) in found.items():
+        displays = {i: display_size(sizes[i], (used[url]["width"], used[url]["height"]))
+                    for i, url in urls.items()}
+        new = rewrite_page(content, used, displays)
+        if new != content:
+            changed[filepath] = new
+
+    if not dry_run:
+        (directory / IMAGES_DIR).mkdir(parents=True, exist_ok=True)
+        for path, data in written:
+            path.write_bytes(data)
+        for url, entry in used.items():
+            if url in manifest:
+                for path in set(_files(manifest[url])) - set(_files(entry)):
+                    (directory / path).unlink(missing_ok=True)
+        manifest.update(used)
+        path = directory / IMAGES_DIR / MANIFEST_NAME
+        path.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding='utf-8')
+        for filepath, content in changed.items():
+            filepath.write_text(content, encoding='utf-8')
+    return used, changed, [path for path, _ in written]
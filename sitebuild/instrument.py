@@ -0,0 +1,152 @@
+"""
+Opt-in per-rule profiling for the page transforms.
+
+Enable with `python -m sitebuild --profile report.json` or by setting
+SITEBUILD_PROFILE=report.json. For every page, stage and rule it records
+calls, wall time, substitutions made and bytes changed, then writes a
+JSON report and prints a summary table sorted by time.
+
+Rules inside a MultiReplace table share one scan, so their time is
+reported on the table row and per-pair rows carry only counts and bytes.
+"""
+
+import json
+import os
+import re
+from contextlib import contextmanager
+from time import perf_counter
+
+ENV_VAR = "SITEBUILD_PROFILE"
+
+ENABLED = bool(os.environ.get(ENV_VAR))
+
+# (page, stage, rule) -> [calls, seconds, substitutions, bytes]
+_records = {}
+_scope = [None, None]
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def _bytes(text):
+    return len(text.encode('utf-8'))
+
+
+def record(rule, seconds=0.0, substitutions=0, delta=0):
+    """Add one measurement for `rule` in the current page/stage scope."""
+    key = (_scope[0], _scope[1], rule)
+    row = _records.get(key)
+    if row is None:
+        row = _records[key] = [0, 0.0, 0, 0]
+    row[0] += 1
+    row[1] += seconds
+    row[2] += substitutions
+    row[3] += delta
+
+
+@contextmanager
+def scope(page=None, stage=None):
+    """Attribute records made inside the block to `page` and/or `stage`."""
+    previous = list(_scope)
+    _scope[:] = [page or previous[0], stage or previous[1]]
+    try:
+        yield
+    finally:
+        _scope[:] = previous
+
+
+def sub(pattern, repl, content, count=0, flags=0):
+    """re.sub that records time, substitutions and byte change when profiling."""
+    if not ENABLED:
+        return re.sub(pattern, repl, content, count=count, flags=flags)
+    start = perf_counter()
+    new, n = re.subn(pattern, repl, content, count=count, flags=flags)
+    elapsed = perf_counter() - start
+    rule = pattern.pattern if isinstance(pattern, re.Pattern) else pattern
+    record(rule, elapsed, n, _bytes(new) - _bytes(content) if n else 0)
+    return new
+
+
+def replace(content, old, new, count=-1):
+    """str.replace that records time, substitutions and byte change when profiling."""
+    if not ENABLED:
+        return content.replace(old, new, count)
+    start = perf_counter()
+    n = content.count(old)
+    if count >= 0:
+        n = min(n, count)
+    result = content.replace(old, new, count)
+    record(f"replace {old!r}", perf_counter() - start, n, n * (_bytes(new) - _bytes(old)))
+    return result
+
+
+def take():
+    """Return and clear the records gathered in this process."""
+    records = [[page, stage, rule, *row] for (page, stage, rule), row in _records.items()]
+    _records.clear()
+    return records
+
+
+def merge(records):
+    """Fold records returned by a worker process into this process."""
+    for page, stage, rule, calls, seconds, substitutions, delta in records:
+        key = (page, stage, rule)
+        row = _records.get(key)
+        if row is None:
+            row = _records[key] = [0, 0.0, 0, 0]
+        row[0] += calls
+        row[1] += seconds
+        row[2] += substitutions
+        row[3] += delta
+
+
+def summary():
+    """Per-rule totals across pages, slowest first."""
+    totals = {}
+    for (page, stage, rule), (calls, seconds, substitutions, delta) in _records.items():
+        row = totals.setdefault((stage, rule), {
+            "stage": stage, "rule": rule, "pages": 0, "calls": 0,
+            "seconds": 0.0, "substitutions": 0, "bytes": 0,
+        })
+        row["pages"] += 1
+        row["calls"] += calls
+        row["seconds"] += seconds
+        row["substitutions"] += substitutions
+        row["bytes"] += delta
+    return sorted(totals.values(), key=lambda row: row["seconds"], reverse=True)
+
+
+def write_json(path):
+    """Write per-page and per-rule records as JSON."""
+    pages = {}
+    for (page, stage, rule), (calls, seconds, substitutions, delta) in sorted(
+            _records.items(), key=lambda item: tuple(str(part) for part in item[0])):
+        pages.setdefault(page, {}).setdefault(stage, {})[rule] = {
+            "calls": calls,
+            "seconds": round(seconds, 6),
+            "substitutions": substitutions,
+            "bytes": delta,
+        }
+    rules = summary()
+    for row in rules:
+        row["seconds"] = round(row["seconds"], 6)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"rules": rules, "pages": pages}, f, indent=2)
+        f.write("\n")
+
+
+def print_table(limit=40):
+    """Print the slowest rules and flag rules that never matched."""
+    rows = summary()
+    if not rows:
+        return
+    print(f"\n⏱️  {'ms':>9} {'subs':>7} {'bytes':>8}  stage / rule")
+    for row in rows[:limit]:
+        rule = row["rule"] if len(row["rule"]) <= 70 else row["rule"][:67] + "..."
+        dead = "  (no matches)" if not row["substitutions"] and row["rule"] != "(stage)" else ""
+        print(f"   {row['seconds'] * 1000:9.2f} {row['substitutions']:7d} {row['bytes']:+8d}  "
+              f"{row['stage']} / {rule}{dead}")
+    if len(rows) > limit:
+        print(f"   ... {len(rows) - limit} more rules in the JSON report")
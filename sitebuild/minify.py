@@ -0,0 +1,254 @@
+"""
+Conservative HTML, CSS and JS minification for the built pages.
+
+Only changes that can't alter rendering or behaviour are made:
+
+- HTML: comments go (conditional comments stay); whitespace between tags
+  is dropped next to block-level elements and collapsed to one space
+  elsewhere, since a space between inline elements is visible. Tags and
+  attribute values are copied as they are.
+- CSS (<style>): comments go, whitespace collapses and disappears around
+  braces, semicolons, commas and after colons; strings are untouched.
+- JS (<script>): comments and indentation go and blank lines are dropped,
+  but line breaks stay so automatic semicolon insertion is unaffected.
+  Strings, template literals and regex literals are copied verbatim.
+
+<pre>, <textarea> and non-JS scripts (application/ld+json, templates) are
+left exactly as written.
+"""
+
+import re
+
+# Elements whose surrounding whitespace never renders
+BLOCK_TAGS = frozenset("""
+    html head body title meta link style script noscript base
+    address article aside blockquote details dialog dd div dl dt fieldset
+    figcaption figure footer form h1 h2 h3 h4 h5 h6 header hgroup hr li
+    main nav ol p section summary table tbody td tfoot th thead tr ul
+    option select svg path circle rect line g defs canvas
+""".split())
+
+JS_TYPES = frozenset({"", "text/javascript", "application/javascript", "module"})
+
+# A tag's attributes; a ">" inside a quoted value doesn't end the tag
+_ATTRS = r'(?:[^>"\']|"[^"]*"|\'[^\']*\')*'
+_TOKEN = re.compile(
+    r'<!--.*?-->'
+    r'|<(pre|textarea)\b' + _ATTRS + r'>.*?</\1\s*>'
+    r'|<(script|style)\b(' + _ATTRS + r')>(.*?)</\2\s*>'
+    r'|<!?[a-zA-Z/]' + _ATTRS + r'>',
+    re.IGNORECASE | re.DOTALL)
+_TYPE_ATTR = re.compile(r'\btype\s*=\s*["\']?([^"\'\s>]*)', re.IGNORECASE)
+_TAG_NAME = re.compile(r'</?([a-zA-Z][-\w]*)')
+_SPACE = re.compile(r'\s+')
+
+_CSS_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/|[^"\'/]+|/', re.DOTALL)
+_CSS_TIGHT = re.compile(r'\s*([{};,>])\s*|(:)\s+')
+_CSS_TRAILING = re.compile(r';+}')
+
+# After these, a "/" starts a regex literal rather than a division
+_REGEX_PREFIX = set("(,=:[!&|?{};+-*%<>~^") | {""}
+_JS_WORD = re.compile(r'[A-Za-z_$][\w$]*|\d[\w.]*|[ \t\r\f\v]+|.')
+_REGEX_KEYWORDS = {"return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw",
+                   "case", "do", "else"}
+
+
+def _tag_name(tag):
+    m = _TAG_NAME.match(tag)
+    return m.group(1).lower() if m else ""
+
+
+def _tighten(token):
+    token = _CSS_TIGHT.sub(lambda m: m.group(1) or m.group(2), _SPACE.sub(" ", token))
+    return _CSS_TRAILING.sub("}", token)
+
+
+def css(text):
+    """Minified CSS source."""
+    text = "".join(" " if token.startswith("/*") else token for token in _CSS_TOKEN.findall(text))
+    return "".join(token if token[0] in "\"'" else _tighten(token)
+                   for token in _CSS_TOKEN.findall(text)).strip()
+
+
+def _js_tokens(text):
+    """
+    Split JS into (kind, text) tokens: "code", "string" (quotes, template
+    literals, regex literals), "comment" and "newline".
+    """
+    i = 0
+    n = len(text)
+    code = []
+    last = ""    # last significant code token, for regex detection
+
+    def flush():
+        if code:
+            yield "code", "".join(code)
+            code.clear()
+
+    while i < n:
+        c = text[i]
+        if c in "\"'":
+            j = i + 1
+            while j < n and text[j] != c and text[j] != "\n":
+                j += 2 if text[j] == "\\" else 1
+            j = j + 1 if j < n and text[j] == c else j
+            yield from flush()
+            yield "string", text[i:j]
+            i = j
+            last = "x"
+        elif c == "`":
+            j = _template_end(text, i)
+            yield from flush()
+            yield "string", text[i:j]
+            i = j
+            last = "x"
+        elif text.startswith("//", i):
+            j = text.find("\n", i)
+            j = n if j < 0 else j
+            yield from flush()
+            yield "comment", ""
+            i = j
+        elif text.startswith("/*", i):
+            j = text.find("*/", i + 2)
+            j = n if j < 0 else j + 2
+            yield from flush()
+            # A comment spanning lines still ends a statement for ASI
+            yield ("newline", "\n") if "\n" in text[i:j] else ("comment", "")
+            i = j
+        elif c == "/" and (last in _REGEX_PREFIX or last in _REGEX_KEYWORDS):
+            j = i + 1
+            in_class = False
+            while j < n and text[j] != "\n":
+                if text[j] == "\\":
+                    j += 2
+                    continue
+                if text[j] == "[":
+                    in_class = True
+                elif text[j] == "]":
+                    in_class = False
+                elif text[j] == "/" and not in_class:
+                    break
+                j += 1
+            j += 1
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            yield from flush()
+            yield "string", text[i:j]
+            i = j
+            last = "x"
+        elif c == "\n":
+            yield from flush()
+            yield "newline", "\n"
+            i += 1
+        else:
+            m = _JS_WORD.match(text, i)
+            word = m.group()
+            code.append(word)
+            if not word.isspace():
+                last = word
+            i = m.end()
+    yield from flush()
+
+
+def _template_end(text, start):
+    """Index just past the template literal starting at `start`."""
+    i = start + 1
+    depth = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == "\\":
+            i += 2
+            continue
+        if depth == 0:
+            if c == "`":
+                return i + 1
+            if text.startswith("${", i):
+                depth = 1
+                i += 2
+                continue
+        else:
+            if c == "{":
+                depth += 1
+            elif c == "}":
+                depth -= 1
+            elif c in "\"'`":
+                if c == "`":
+                    i = _template_end(text, i)
+                    continue
+                j = i + 1
+                while j < n and text[j] != c:
+                    j += 2 if text[j] == "\\" else 1
+                i = j
+        i += 1
+    return n
+
+
+def js(text):
+    """Minified JS source: no comments, indentation or blank lines."""
+    lines = [[]]
+    for kind, token in _js_tokens(text):
+        if kind == "newline":
+            lines.append([])
+        elif kind == "comment":
+            lines[-1].append(" ")
+        elif kind == "string":
+            lines[-1].append(token)
+        else:
+            lines[-1].append(re.sub(r'[ \t\r\f\v]+', " ", token))
+    out = []
+    for parts in lines:
+        line = "".join(parts).strip()
+        if line:
+            out.append(line)
+    return "\n".join(out)
+
+
+def _script(attrs):
+    kind = _TYPE_ATTR.search(attrs)
+    return (kind.group(1).lower() if kind else "") in JS_TYPES
+
+
+def html(content):
+    """Minified page source."""
+    out = []
+    pos = 0
+    pending = ""       # text since the last tag kept
+    previous = None    # name of that tag
+    for m in _TOKEN.finditer(content):
+        pending += content[pos:m.start()]
+        pos = m.end()
+        token = m.group()
+        if token.startswith("<!--") and not token.startswith("<!--[if"):
+            continue
+        name = "!--" if token.startswith("<!--") else _tag_name(token)
+        out.append(_text(pending, previous, name))
+        pending = ""
+        if m.group(2):
+            tag = m.group(2).lower()
+            body = m.group(4)
+            if tag == "style":
+                body = css(body)
+            elif _script(m.group(3)):
+                body = js(body)
+            token = f"{content[m.start():m.start(4)]}{body}</{tag}>"
+        out.append(token)
+        previous = name
+    out.append(_text(pending + content[pos:], previous, None))
+    return "".join(out)
+
+
+def _text(text, before, after):
+    """Text between two tags, with whitespace collapsed or dropped."""
+    if not text:
+        return ""
+    if text.strip():
+        text = _SPACE.sub(" ", text)
+        if before in BLOCK_TAGS:
+            text = text.lstrip()
+        if after in BLOCK_TAGS:
+            text = text.rstrip()
+        return text
+    if before in BLOCK_TAGS or after in BLOCK_TAGS or before is None or after is None:
+        return ""
+    return " "
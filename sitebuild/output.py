@@ -0,0 +1,124 @@
+"""
+Deployable output: minified pages plus precompressed siblings.
+
+The sources stay hand-formatted; `write` copies a variant into an output
+directory instead. Pages are minified (see sitebuild.minify), the
+variant's static assets are copied, and every compressible file of at
+least MIN_COMPRESS bytes gets `.gz` and `.br` siblings for hosts that
+serve precompressed files. Brotli output needs the `brotli` package;
+without it only `.gz` files are written. With `hoist`, CSS every page
+shares first moves into one site.<hash>.css (see sitebuild.hoist); with
+`critical`, each page's stylesheet is then split into inline critical CSS
+and a deferred sheet (see sitebuild.critical).
+"""
+
+import gzip
+import shutil
+from pathlib import Path
+
+from sitebuild import critical as critical_css, hoist as hoist_css, minify
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Top-level files copied next to the pages
+ASSET_SUFFIXES = {".css", ".js", ".json", ".txt", ".xml", ".svg", ".ico",
+                  ".png", ".jpg", ".jpeg", ".webp", ".avif", ".woff", ".woff2"}
+# Subdirectories copied whole
+ASSET_DIRS = ("fonts", "images")
+
+COMPRESS_SUFFIXES = {".html", ".css", ".js", ".txt", ".xml", ".svg"}
+
+# Smaller files aren't worth a compressed sibling
+MIN_COMPRESS = 1024
+
+
+class PageSize:
+    """Byte sizes of one page before and after minification and compression."""
+
+    def __init__(self, page, source, minified, gz, br, critical=None, stylesheet=None):
+        self.page = page
+        self.source = source
+        self.minified = minified
+        self.gz = gz
+        self.br = br
+        self.critical = critical        # minified inline CSS left after a split
+        self.stylesheet = stylesheet    # minified CSS it was split from
+
+
+def compressed(data):
+    """{suffix: compressed bytes} for the siblings `data` should get."""
+    if len(data) < MIN_COMPRESS:
+        return {}
+    siblings = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        siblings[".br"] = brotli.compress(data, quality=11)
+    return siblings
+
+
+def _write(target, data, dry_run):
+    """Write `data` and its compressed siblings; returns the siblings."""
+    siblings = compressed(data) if target.suffix in COMPRESS_SUFFIXES else {}
+    if not dry_run:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        for suffix, body in siblings.items():
+            target.with_name(target.name + suffix).write_bytes(body)
+    return siblings
+
+
+def _assets(directory):
+    directory = Path(directory)
+    for path in sorted(directory.iterdir()):
+        if path.is_file() and path.suffix in ASSET_SUFFIXES and not path.name.startswith("."):
+            yield path
+    for name in ASSET_DIRS:
+        if (directory / name).is_dir():
+            yield from sorted(p for p in (directory / name).rglob("*") if p.is_file())
+
+
+def write(directory, pages, out, dry_run=False, critical=False, hoist=False):
+    """
+    Copy the variant in `directory` to `out`: minified `pages`, assets and
+    compressed siblings, with shared CSS hoisted and critical CSS split out
+    if asked. Returns (a PageSize per page, (sheet, rules hoisted, pages
+    linking it) or None); nothing is written with `dry_run`.
+    """
+    directory = Path(directory)
+    out = Path(out)
+    sources = {page: (directory / page).read_bytes() for page in pages if (directory / page).exists()}
+    contents = {page: source.decode('utf-8') for page, source in sources.items()}
+    hoisted = None
+    if hoist:
+        sheet, text, rules, changed = hoist_css.hoist(contents)
+        if sheet is not None:
+            _write(out / sheet, text.encode('utf-8'), dry_run)
+            contents.update(changed)
+            hoisted = (sheet, rules, len(changed))
+    sizes = []
+    for page, content in contents.items():
+        split = critical_css.extract(content) if critical else None
+        inline = stylesheet = None
+        if split is not None:
+            sheet = critical_css.deferred_css(split)
+            name = critical_css.sheet_name(page, sheet)
+            content = critical_css.rewrite_page(content, split, name)
+            _write(out / name, sheet.encode('utf-8'), dry_run)
+            inline = len(minify.css(split.critical).encode('utf-8'))
+            stylesheet = len(minify.css(split.full).encode('utf-8'))
+        data = minify.html(content).encode('utf-8')
+        siblings = _write(out / page, data, dry_run)
+        sizes.append(PageSize(page, len(sources[page]), len(data),
+                              len(siblings[".gz"]) if ".gz" in siblings else None,
+                              len(siblings[".br"]) if ".br" in siblings else None,
+                              inline, stylesheet))
+    for path in _assets(directory):
+        target = out / path.relative_to(directory)
+        if target.suffix in COMPRESS_SUFFIXES:
+            _write(target, path.read_bytes(), dry_run)
+        elif not dry_run:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(path, target)
+    return sizes, hoisted
@@ -0,0 +1,144 @@
+"""
+Shared page partials: the header, mobile menu, footer and CTA blocks.
+
+Partials live in partials/<name>.html and are compiled once. A page marks
+where each one goes:
+
+    <!-- partial:footer tagline="Developed by audiologists" -->
+    <footer class="footer">...</footer>
+    <!-- /partial:footer -->
+
+Rendering replaces everything between the markers, so a rebrand is one
+edit to a partial or to a variant's context followed by a re-render.
+Values come from the variant's context, overlaid by the marker's own
+attributes. Templates understand a small Mustache subset:
+
+    {{name}}                      the value, inserted as written
+    {{#name}}...{{/name}}         rendered if the value is truthy
+    {{^name}}...{{/name}}         rendered if it is falsy
+    {{> name key="value"}}        another partial, with extra values
+
+A block region (markers on their own lines) is re-indented to the
+opening marker; an inline region is replaced in place.
+"""
+
+import re
+from functools import lru_cache
+from pathlib import Path
+
+MARKER = re.compile(
+    r'<!-- partial:([-\w]+)((?:\s+[-\w]+(?:="[^"]*")?)*)\s*-->(.*?)<!-- /partial:\1 -->',
+    re.DOTALL)
+_ARG = re.compile(r'([-\w]+)(?:="([^"]*)")?')
+_TAG = re.compile(r'\{\{\s*([#^/>]?)\s*([-\w]+)((?:\s+[-\w]+(?:="[^"]*")?)*)\s*\}\}')
+
+
+class TemplateError(ValueError):
+    """A partial that doesn't parse or render."""
+
+
+def load(directory):
+    """{name: template text} for every partial in `directory`."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return {}
+    return {path.stem: path.read_text(encoding='utf-8').rstrip("\n")
+            for path in sorted(directory.glob("*.html"))}
+
+
+def parse_args(text):
+    """Marker or include attributes as a dict; a bare name is True."""
+    return {m.group(1): True if m.group(2) is None else m.group(2) for m in _ARG.finditer(text or "")}
+
+
+@lru_cache(maxsize=None)
+def compile_template(text):
+    """
+    Parse a template into nodes: str, ("var", name), ("include", name,
+    args) or ("section", name, inverted, children).
+    """
+    root = []
+    stack = [(None, root)]
+    pos = 0
+    for m in _TAG.finditer(text):
+        nodes = stack[-1][1]
+        kind, name, args = m.groups()
+        start, end = m.start(), m.end()
+        if kind in ("#", "^", "/"):
+            # A section tag alone on its line takes the whole line with it
+            line_start = text.rfind("\n", 0, start) + 1
+            line_end = text.find("\n", end)
+            line_end = len(text) if line_end < 0 else line_end + 1
+            if not text[line_start:start].strip() and not text[end:line_end].strip():
+                start, end = line_start, line_end
+        if start > pos:
+            nodes.append(text[pos:start])
+        pos = end
+        if kind in ("#", "^"):
+            children = []
+            nodes.append(("section", name, kind == "^", children))
+            stack.append((name, children))
+        elif kind == "/":
+            if stack[-1][0] != name:
+                raise TemplateError(f"unexpected {{{{/{name}}}}}")
+            stack.pop()
+        elif kind == ">":
+            nodes.append(("include", name, tuple(parse_args(args).items())))
+        else:
+            nodes.append(("var", name))
+    if len(stack) > 1:
+        raise TemplateError(f"unclosed {{{{#{stack[-1][0]}}}}}")
+    if pos < len(text):
+        root.append(text[pos:])
+    return tuple(root)
+
+
+def _render(nodes, partials, context, depth):
+    out = []
+    for node in nodes:
+        if isinstance(node, str):
+            out.append(node)
+        elif node[0] == "var":
+            value = context.get(node[1])
+            out.append("" if value is None or value is False else str(value))
+        elif node[0] == "section":
+            _, name, inverted, children = node
+            if bool(context.get(name)) != inverted:
+                out.append(_render(children, partials, context, depth))
+        else:
+            _, name, args = node
+            out.append(render(name, partials, {**context, **dict(args)}, depth + 1))
+    return "".join(out)
+
+
+def render(name, partials, context, depth=0):
+    """One partial rendered with `context`."""
+    if name not in partials:
+        raise TemplateError(f"no partial named {name!r}")
+    if depth > 8:
+        raise TemplateError(f"partial {name!r} includes itself")
+    return _render(compile_template(partials[name]), partials, context, depth)
+
+
+def _indented(text, indent):
+    return "\n".join(indent + line if line else line for line in text.split("\n"))
+
+
+def render_page(content, partials, context):
+    """A page with every marked region re-rendered."""
+    if "<!-- partial:" not in content:
+        return content
+
+    def region(m):
+        name, args, body = m.groups()
+        text = render(name, partials, {**context, **parse_args(args)})
+        opening = m.group()[:m.start(3) - m.start()]
+        closing = f"<!-- /partial:{name} -->"
+        if not body.startswith("\n"):
+            return f"{opening}{text}{closing}"
+        line_start = content.rfind("\n", 0, m.start()) + 1
+        line = content[line_start:m.start()]
+        indent = line[:len(line) - len(line.lstrip())]
+        return f"{opening}\n{_indented(text, indent)}\n{indent}{closing}"
+
+    return MARKER.sub(region, content)
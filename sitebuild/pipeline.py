@@ -0,0 +1,993 @@
+"""
+Load-once/transform-many build pipeline.
+
+Each page is read once, every configured stage runs over it in order, and
+the page is written back at most once. Stages are configured per site
+variant in VARIANTS and target pages are found by sitebuild.registry. With
+jobs > 1 pages from every variant are spread across a process pool;
+reporting stays in page order.
+Pages already produced by the current stage versions are skipped using the
+content-hash manifest in sitebuild.cache. With --dry-run nothing is written;
+--diff streams unified diffs and --patch-dir saves one patch per page.
+--profile records per-rule timings and match counts (see sitebuild.instrument).
+The inter_font stage points pages at a self-hosted Inter once
+--vendor-fonts has fetched it (see sitebuild.webfonts). After the stages,
+--dose-tables refills the exposure lookup tables in page scripts (see
+sitebuild.dose), --vendor-images serves images hotlinked from Unplugs locally in responsive
+formats (see sitebuild.images), --subset-fonts subsets the Bamboy fonts and preloads them
+(see sitebuild.fonts). --headers
+writes caching and preload headers into each variant's vercel.json (see
+sitebuild.headers). --out writes
+a minified, precompressed copy of each variant for deployment (see
+sitebuild.output); with --hoist-css CSS shared across a variant's pages
+moves into one fingerprinted stylesheet in that copy (see sitebuild.hoist),
+and with --critical-css its pages inline only their above-the-fold CSS and
+load the rest without blocking (see sitebuild.critical). --generate first regenerates the variants that have a
+`source` from it, and --drift reports what only one tree has (see
+sitebuild.variants). --watch keeps re-running whatever a change affects
+(see sitebuild.watch).
+"""
+
+import argparse
+import difflib
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+
+from sitebuild import (cache, critical, fonts, headers, hoist, images, instrument, minify, output, registry,
+                       transforms, variants, webfonts)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Registered transforms, in their default order
+STAGES = {
+    "partials": transforms.render_partials,
+    "rebrand": transforms.rebrand,
+    "utm_links": transforms.utm_links,
+    "rebrand_guide": transforms.rebrand_guide,
+    "fix_colors": transforms.fix_colors,
+    "fix_cta_colors": transforms.fix_cta_colors,
+    "unplugs_style": transforms.unplugs_style,
+    "bamboy_font": transforms.bamboy_font,
+    "inter_font": transforms.inter_font,
+    "replace_strings": transforms.replace_strings,
+    "css_overrides": transforms.css_overrides,
+    "analytics": transforms.analytics,
+}
+
+# Pages a stage must never touch
+STAGE_EXCLUDES = {
+    # index-unplugs is already styled
+    "unplugs_style": {"index-unplugs.html"},
+}
+
+# Values the shared partials (partials/*.html) render with. Variants
+# overlay their own through stage_options["partials"], and a page's
+# partial markers overlay both.
+PARTIAL_CONTEXT = {
+    "home": "index.html",
+    "header_name": "Safe Sound Guide",
+    "guide_name": "Safe Sound Guide",
+    "credit": "A free educational resource",
+    "cta_url": None,    # None renders the disabled-CTA comment
+    "learn": "#",
+    "protect": "#",
+    "guides": "#",
+    "tools": "#",
+}
+UNPLUGS_CREDIT = 'Educational content by <a href="https://unplugshearing.com">Unplugs</a>'
+
+# Styling every guide variant gets. It runs before the variant's own
+# stages so variants generated from the same page share its output.
+GUIDE_STYLE = ["fix_colors", "fix_cta_colors", "unplugs_style", "bamboy_font", "inter_font"]
+
+# Text on the green primary colour is dark on the root site
+ROOT_COLORS = {
+    ".header-cta": {"color": "#222222 !important"},
+    ".featured-cta": {"color": "#222222"},
+    ".tip-number": {"color": "#222222"},
+    ".start-btn": {"color": "#222222"},
+    ".step-num": {"color": "#222222"},
+}
+
+# Pages come from each variant's sitemap.xml plus `include` globs, minus
+# `exclude` globs (see sitebuild.registry). `stage_options` holds keyword
+# arguments passed to a stage for that variant only. A variant with a
+# `source` can be generated from that variant's pages (see
+# sitebuild.variants), so its stage_options are its whole delta.
+VARIANTS = {
+    "root": {
+        "dir": ".",
+        "sitemap": True,
+        "source": "hearing-guide-branded",
+        "stages": GUIDE_STYLE + ["partials", "rebrand", "utm_links", "css_overrides", "analytics"],
+        "stage_options": {
+            "partials": dict(PARTIAL_CONTEXT, home="/", credit=UNPLUGS_CREDIT,
+                             cta_url="https://unplugshearing.com"),
+            "utm_links": {"utm_source": "safesound", "utm_medium": "guide", "utm_campaign": "ssc"},
+            "css_overrides": {"rules": ROOT_COLORS},
+            # Served from GitHub Pages, which has no /_vercel endpoints
+            "analytics": {"tag": None},
+        },
+    },
+    "hearing-guide": {
+        "dir": "hearing-guide",
+        "sitemap": True,
+        "source": "hearing-guide-branded",
+        "stages": GUIDE_STYLE + ["partials", "rebrand_guide", "replace_strings", "analytics"],
+        "stage_options": {
+            "partials": PARTIAL_CONTEXT,
+            "replace_strings": {"pairs": [["https://learn.unplugshearing.com/", "https://safesound.guide/"]]},
+            "analytics": {"tag": transforms.VERCEL_INSIGHTS},
+        },
+    },
+    "hearing-guide-branded": {
+        "dir": "hearing-guide-branded",
+        "sitemap": True,
+        "stages": GUIDE_STYLE + ["partials", "analytics"],
+        "stage_options": {
+            "partials": dict(PARTIAL_CONTEXT, header_name="Hearing Guide",
+                             guide_name="Hearing Protection Superguide", credit=UNPLUGS_CREDIT,
+                             # Disabled for launch; re-enabling sets the learn/header/
+                             # hearing_guide UTM link here
+                             cta_url=None),
+            "analytics": {"tag": transforms.VERCEL_INSIGHTS},
+        },
+    },
+    "collective": {
+        "dir": "collective",
+        "sitemap": False,
+        "include": ["*.html"],
+        # Its own Oswald logo; no script ever put Bamboy on these pages
+        "stages": ["inter_font"],
+    },
+    # Standalone campaign pages next to the root guide; site-wide steps only
+    "landing": {
+        "dir": ".",
+        "sitemap": False,
+        "include": ["7-reasons.html", "artists.html", "collective-index.html", "done-with-hifi-earplugs.html",
+                    "index-unplugs.html", "lunchbox-7-reasons.html", "protect.html", "science.html",
+                    "sound-damage-lab.html", "unplugs-7-reasons.html"],
+        "stages": [],
+    },
+}
+
+
+def variant_options(name):
+    """
+    A variant's stage_options, plus whether its self-hosted Inter exists:
+    inter_font leaves pages alone until it does, and the flag is part of
+    the stage's version, so vendoring the font re-runs it.
+    """
+    variant = VARIANTS[name]
+    options = dict(variant.get("stage_options") or {})
+    options["inter_font"] = {"vendored": (REPO_ROOT / variant["dir"] / transforms.INTER_FILE).exists()}
+    return options
+
+
+def variant_pages(name):
+    """Page filenames a variant targets, discovered through the page registry."""
+    variant = VARIANTS[name]
+    return registry.discover(
+        REPO_ROOT / variant["dir"],
+        sitemap=variant.get("sitemap", True),
+        include=variant.get("include", ()),
+        exclude=variant.get("exclude", ()),
+    )
+
+
+def active_stages(stages, page=None):
+    """The stages that apply to a page, in order."""
+    return [name for name in stages if page not in STAGE_EXCLUDES.get(name, ())]
+
+
+def stage_versions(stages, page=None, stage_options=None):
+    """[name, version] pairs for the stages that apply to a page."""
+    stage_options = stage_options or {}
+    return [[name, cache.stage_version(STAGES[name], stage_options.get(name))]
+            for name in active_stages(stages, page)]
+
+
+def transform(content, stages, page=None, stage_options=None):
+    """Run the named stages over a page source in order."""
+    stage_options = stage_options or {}
+    for name in active_stages(stages, page):
+        kwargs = stage_options.get(name, {})
+        if not instrument.ENABLED:
+            content = STAGES[name](content, **kwargs)
+            continue
+        with instrument.scope(stage=name):
+            start = perf_counter()
+            before = len(content.encode('utf-8'))
+            content = STAGES[name](content, **kwargs)
+            instrument.record("(stage)", perf_counter() - start, 0,
+                              len(content.encode('utf-8')) - before)
+    return content
+
+
+def display_path(filepath):
+    """Path relative to the repo root where possible, for reports and patches."""
+    try:
+        return Path(filepath).resolve().relative_to(REPO_ROOT).as_posix()
+    except ValueError:
+        return str(filepath)
+
+
+def unified_diff(filepath, before, after):
+    """git-style unified diff of a page rewrite."""
+    path = display_path(filepath)
+    return "".join(difflib.unified_diff(
+        before.splitlines(keepends=True),
+        after.splitlines(keepends=True),
+        f"a/{path}",
+        f"b/{path}",
+    ))
+
+
+def process_page(filepath, stages, entry=None, stage_options=None, dry_run=False, diff=False):
+    """
+    Read a page once, run every stage over it and write it back if changed.
+
+    `entry` is the page's manifest record from a previous run, if any;
+    `stage_options` maps stage names to extra keyword arguments.
+    With `dry_run` the page is never written. Returns a tuple
+    (changed, entry, delta, patch, stats): changed is True if the page was
+    (or would be) rewritten, False if not and None if it is missing; entry
+    is the updated manifest record; delta is the size change in bytes;
+    patch is a unified diff when `diff` is set; stats holds the profiling
+    records made for this page, if profiling is on.
+    """
+    changed, entry, delta, patch = _process_page(filepath, stages, entry, stage_options, dry_run, diff)
+    return changed, entry, delta, patch, instrument.take() if instrument.ENABLED else None
+
+
+def _process_page(filepath, stages, entry, stage_options, dry_run, diff):
+    filepath = Path(filepath)
+    if not filepath.exists():
+        return None, None, 0, None
+
+    versions = stage_versions(stages, filepath.name, stage_options)
+    if cache.is_fresh(entry, filepath, versions):
+        return False, entry, 0, None
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    input_hash = cache.content_hash(content)
+    if entry and entry.get("stages") == versions and entry.get("output") == input_hash:
+        if dry_run:
+            return False, entry, 0, None
+        return False, cache.make_entry(filepath, versions, entry["input"], input_hash), 0, None
+
+    original = content
+    with instrument.scope(page=display_path(filepath)):
+        content = transform(content, stages, filepath.name, stage_options)
+
+    changed = content != original
+    if not changed:
+        if dry_run:
+            return False, entry, 0, None
+        return False, cache.make_entry(filepath, versions, input_hash, input_hash), 0, None
+
+    delta = len(content.encode('utf-8')) - len(original.encode('utf-8'))
+    patch = unified_diff(filepath, original, content) if diff else None
+    if dry_run:
+        return True, entry, delta, patch
+
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return True, cache.make_entry(filepath, versions, input_hash, cache.content_hash(content)), delta, patch
+
+
+def process_pages(tasks, jobs=1, dry_run=False, diff=False):
+    """
+    Run process_page over (filepath, stages, entry, stage_options) tasks, in a process pool
+    when jobs > 1. Results come back in task order, and profiling records
+    from workers are merged into this process.
+    """
+    jobs = jobs or os.cpu_count()
+    if jobs <= 1 or len(tasks) <= 1:
+        results = [process_page(*task, dry_run, diff) for task in tasks]
+    else:
+        n = len(tasks)
+        chunksize = max(1, n // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(process_page, *zip(*tasks), [dry_run] * n, [diff] * n,
+                                    chunksize=chunksize))
+
+    for *_, stats in results:
+        if stats:
+            instrument.merge(stats)
+    return results
+
+
+def _patch_name(filepath):
+    return display_path(filepath).replace("/", "__") + ".patch"
+
+
+def report(filepaths, results, options=None):
+    """
+    Print one status line per page, plus its diff or patch file when asked
+    for. Returns (updated, skipped, missing).
+    """
+    dry_run = getattr(options, "dry_run", False)
+    show_diff = getattr(options, "diff", False)
+    patch_dir = getattr(options, "patch_dir", None)
+    updated = skipped = missing = 0
+
+    for filepath, (changed, _, delta, patch, _) in zip(filepaths, results):
+        page = Path(filepath).name
+        if changed is None:
+            print(f"❌ {page} (not found)")
+            missing += 1
+        elif changed:
+            if dry_run:
+                print(f"✅ {page} (would change, {delta:+d} bytes)")
+            else:
+                print(f"✅ {page}")
+            updated += 1
+            if patch and show_diff:
+                print(patch, end="" if patch.endswith("\n") else "\n")
+            if patch and patch_dir:
+                with open(Path(patch_dir) / _patch_name(filepath), 'w', encoding='utf-8') as f:
+                    f.write(patch)
+        else:
+            print(f"⏭️  {page}")
+            skipped += 1
+
+    return updated, skipped, missing
+
+
+def _run_tasks(tasks, options):
+    if getattr(options, "profile", None):
+        instrument.enable()
+        # Worker processes started with spawn read this on import
+        os.environ[instrument.ENV_VAR] = options.profile
+    jobs = getattr(options, "jobs", 1)
+    dry_run = getattr(options, "dry_run", False)
+    want_patch = bool(getattr(options, "diff", False) or getattr(options, "patch_dir", None))
+    if getattr(options, "patch_dir", None):
+        Path(options.patch_dir).mkdir(parents=True, exist_ok=True)
+    return process_pages(tasks, jobs, dry_run, want_patch)
+
+
+def run_pages(directory, pages, stages, options=None, stage_options=None):
+    """
+    Process pages under a directory, printing one status line per page.
+    `options` carries jobs/dry_run/diff/patch_dir as parsed by parse_options.
+    """
+    filepaths = [Path(directory) / page for page in pages]
+    tasks = [(filepath, stages, None, stage_options) for filepath in filepaths]
+    results = _run_tasks(tasks, options)
+    counts = report(filepaths, results, options)
+    finish_profile(options)
+    return counts
+
+
+def finish_profile(options):
+    """Write the JSON profile and print the summary table, if profiling."""
+    path = getattr(options, "profile", None) or os.environ.get(instrument.ENV_VAR)
+    if not instrument.ENABLED or not path:
+        return
+    instrument.write_json(path)
+    instrument.print_table()
+    print(f"\n⏱️  Profile written to {path}")
+
+
+def page_key(filepath):
+    """Manifest key for a page: its path relative to the repo root."""
+    return Path(filepath).resolve().relative_to(REPO_ROOT).as_posix()
+
+
+def variant_tasks(name, stages=None, manifest=None):
+    """(filepath, stages, entry, stage_options) tasks for a variant, optionally overriding its stages."""
+    variant = VARIANTS[name]
+    stages = stages or variant["stages"]
+    directory = REPO_ROOT / variant["dir"]
+    pages = manifest["pages"] if manifest else {}
+    tasks = []
+    for page in variant_pages(name):
+        filepath = directory / page
+        tasks.append((filepath, stages, pages.get(page_key(filepath)), variant_options(name)))
+    return tasks
+
+
+def run_variants(names, stages=None, options=None, manifest=None):
+    """
+    Run several site variants as one batch of pages. Page records in
+    `manifest` are used to skip unchanged pages and updated in place.
+    Returns (updated, skipped, missing) totals.
+    """
+    batches = [(name, variant_tasks(name, stages, manifest)) for name in names]
+    tasks = [task for _, batch in batches for task in batch]
+    results = _run_tasks(tasks, options)
+
+    if manifest is not None:
+        for (filepath, *_), (_, entry, *_) in zip(tasks, results):
+            if entry is None:
+                manifest["pages"].pop(page_key(filepath), None)
+            else:
+                manifest["pages"][page_key(filepath)] = entry
+
+    totals = [0, 0, 0]
+    offset = 0
+    for name, batch in batches:
+        print(f"\n🔧 {name}: {', '.join(stages or VARIANTS[name]['stages'])}")
+        filepaths = [filepath for filepath, *_ in batch]
+        counts = report(filepaths, results[offset:offset + len(batch)], options)
+        offset += len(batch)
+        for i, n in enumerate(counts):
+            totals[i] += n
+    return totals
+
+
+# Recurring drift lines --drift lists per variant
+DRIFT_LINES = 15
+
+
+def derived_variants(names):
+    """{source: [variants in `names` generated from it]}."""
+    groups = {}
+    for name in names:
+        source = VARIANTS[name].get("source")
+        if source:
+            groups.setdefault(source, []).append(name)
+    return groups
+
+
+def _variant_steps(name, page):
+    return [tuple(step) for step in
+            stage_versions(VARIANTS[name]["stages"], page, variant_options(name))]
+
+
+def generated_pages(source, targets, pages=None):
+    """
+    Yield (page, content, {variant: generated page}) for each page of
+    `source` (or only `pages`), generated for itself and every target
+    variant listing it. Each page is read once and shared stage prefixes
+    run once.
+    """
+    directory = REPO_ROOT / VARIANTS[source]["dir"]
+    listed = {name: set(variant_pages(name)) for name in targets}
+    options = {name: variant_options(name) for name in [source] + list(targets)}
+    for page in variant_pages(source):
+        if pages is not None and page not in pages:
+            continue
+        filepath = directory / page
+        if not filepath.exists():
+            continue
+        content = filepath.read_text(encoding='utf-8')
+        names = [source] + [name for name in targets if page in listed[name]]
+        chains = [_variant_steps(name, page) for name in names]
+        kwargs = {step: options[name]
+                  for name, chain in zip(names, chains) for step in chain}
+        with instrument.scope(page=display_path(filepath)):
+            outputs = variants.derive(
+                content, chains, lambda text, step: transform(text, [step[0]], page, kwargs[step]))
+        yield page, content, dict(zip(names, outputs))
+
+
+def generate_variants(names, options=None, manifest=None, pages=None):
+    """
+    Regenerate the variants in `names` that have a `source` from it (all
+    its pages, or only `pages`), in one pass per source; a source in
+    `names` is built in the same pass. Derived pages changed since they
+    were last generated are kept and reported unless --force is given.
+    Returns the paths written.
+    """
+    dry_run = getattr(options, "dry_run", False)
+    force = getattr(options, "force", False)
+    records = manifest.setdefault("generated", {}) if manifest is not None else {}
+    written = []
+    for source, targets in derived_variants(names).items():
+        results = {name: [] for name in targets}
+        for page, content, outputs in generated_pages(source, targets, pages):
+            for name, generated in outputs.items():
+                filepath = REPO_ROOT / VARIANTS[name]["dir"] / page
+                if name == source:
+                    if name in names and generated != content and not dry_run:
+                        _write_generated(filepath, name, generated, content, manifest)
+                        written.append(filepath)
+                    continue
+                current = filepath.read_text(encoding='utf-8') if filepath.exists() else None
+                built = _built(name, page, current) if current not in (None, generated) else None
+                state = variants.status(current, generated, records.get(page_key(filepath)), built)
+                if not dry_run and (state != variants.DRIFTED or force):
+                    if state != variants.UNCHANGED:
+                        _write_generated(filepath, name, generated, current, manifest)
+                        written.append(filepath)
+                    records[page_key(filepath)] = cache.content_hash(generated)
+                results[name].append((page, state, current, generated))
+        for name in targets:
+            _report_generated(name, source, results[name], options)
+    return written
+
+
+def _built(name, page, content):
+    """A variant's page after its own stages, which generated pages have been through."""
+    return transform(content, VARIANTS[name]["stages"], page, variant_options(name))
+
+
+def _write_generated(filepath, name, content, before, manifest):
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    filepath.write_text(content, encoding='utf-8')
+    if manifest is not None:
+        versions = stage_versions(VARIANTS[name]["stages"], filepath.name, variant_options(name))
+        before_hash = cache.content_hash(before) if before is not None else None
+        manifest["pages"][page_key(filepath)] = cache.make_entry(
+            filepath, versions, before_hash, cache.content_hash(content))
+
+
+def _report_generated(name, source, results, options):
+    dry_run = getattr(options, "dry_run", False)
+    force = getattr(options, "force", False)
+    counts = Counter(state for _, state, _, _ in results)
+    print(f"🧬 {name} ← {source}: " + ", ".join(
+        f"{counts[state]} {state}" for state in (variants.CREATED, variants.UPDATED,
+                                                 variants.UNCHANGED, variants.DRIFTED) if counts[state]))
+    for page, state, current, generated in results:
+        if state == variants.UNCHANGED:
+            continue
+        if state == variants.DRIFTED:
+            only_here, _ = variants.drift(_built(name, page, current), generated)
+            if force:
+                print(f"⚠️  {page} ({'would overwrite' if dry_run else 'overwrote'} "
+                      f"{len(only_here)} lines only in {name})")
+            else:
+                print(f"⚠️  {page} (kept: {len(only_here)} lines only in {name}; "
+                      f"see --drift, or --force to overwrite)")
+        else:
+            print(f"✅ {page} ({'would be ' if dry_run else ''}{state})")
+        if getattr(options, "diff", False) and (state != variants.DRIFTED or force):
+            print(unified_diff(REPO_ROOT / VARIANTS[name]["dir"] / page, current or "", generated), end="")
+
+
+def drift_variants(names, options=None):
+    """
+    Report what each variant in `names` that has a source holds that
+    generating it wouldn't produce, and the reverse: pages in one tree
+    only, then differing lines per page and lines drifting on several pages.
+    """
+    groups = derived_variants(names)
+    if not groups:
+        print(f"🔀 none of {', '.join(names)} is generated from another variant")
+    for source, targets in groups.items():
+        drifts = {name: [] for name in targets}
+        for page, _, outputs in generated_pages(source, targets):
+            for name in targets:
+                filepath = REPO_ROOT / VARIANTS[name]["dir"] / page
+                if name in outputs and filepath.exists():
+                    # Compared once built, so stages not yet run don't count
+                    current = _built(name, page, filepath.read_text(encoding='utf-8'))
+                    if current != outputs[name]:
+                        drifts[name].append((filepath, current, outputs[name]))
+        source_pages = set(variant_pages(source))
+        for name in targets:
+            pages = variant_pages(name)
+            print(f"\n🔀 {name} vs {source}: {len(drifts[name])} of "
+                  f"{len(source_pages.intersection(pages))} shared pages differ")
+            for page in pages:
+                if page not in source_pages:
+                    print(f"   {page}: only in {name}")
+            for page in sorted(source_pages.difference(pages)):
+                print(f"   {page}: only in {source}")
+            lines = []
+            for filepath, current, generated in drifts[name]:
+                only_here, only_source = variants.drift(current, generated)
+                lines.append((only_here, only_source))
+                print(f"   {filepath.name}: {len(only_here)} lines only in {name}, "
+                      f"{len(only_source)} only in {source}")
+                if getattr(options, "diff", False):
+                    print(unified_diff(filepath, current, generated), end="")
+            common = variants.recurring(lines)
+            if common:
+                print(f"   Lines differing on several pages (- only in {name}, + only in {source}):")
+                for n, sign, line in common[:DRIFT_LINES]:
+                    print(f"   {n:3d} pages {sign} {line[:100]}")
+
+
+def rerun_pages(targets, options=None, manifest=None):
+    """
+    Re-run the tail of each page's stages. `targets` maps (variant, page)
+    to the first stage that needs to run; the stages before it already
+    hold for the page on disk. Changed pages are written and manifest
+    records refreshed. Returns (paths written, pages unchanged).
+    """
+    dry_run = getattr(options, "dry_run", False)
+    written = []
+    unchanged = 0
+    for (name, page), first in targets.items():
+        variant = VARIANTS[name]
+        filepath = REPO_ROOT / variant["dir"] / page
+        if not filepath.exists():
+            continue
+        stages = variant["stages"][variant["stages"].index(first):]
+        content = filepath.read_text(encoding='utf-8')
+        with instrument.scope(page=display_path(filepath)):
+            result = transform(content, stages, page, variant_options(name))
+        if result == content:
+            unchanged += 1
+        elif dry_run:
+            print(f"✅ {display_path(filepath)} (would change, "
+                  f"{len(result.encode('utf-8')) - len(content.encode('utf-8')):+d} bytes)")
+        else:
+            filepath.write_text(result, encoding='utf-8')
+            written.append(filepath)
+            print(f"✅ {display_path(filepath)} ({', '.join(stages)})")
+            if getattr(options, "diff", False):
+                print(unified_diff(filepath, content, result), end="")
+        if manifest is not None and not dry_run:
+            versions = stage_versions(variant["stages"], page, variant_options(name))
+            manifest["pages"][page_key(filepath)] = cache.make_entry(
+                filepath, versions, cache.content_hash(content), cache.content_hash(result))
+    return written, unchanged
+
+
+def header_variants(names, options=None):
+    """
+    Regenerate the `headers` of each variant's vercel.json from its built
+    pages and assets (see sitebuild.headers), one line per variant.
+    """
+    dry_run = getattr(options, "dry_run", False)
+    for name in names:
+        directory = REPO_ROOT / VARIANTS[name]["dir"]
+        target = directory / "vercel.json"
+        if not target.exists():
+            print(f"🧾 {name}: no vercel.json; skipped")
+            continue
+        entries, preloads = headers.build(directory, variant_pages(name))
+        before = target.read_text(encoding='utf-8')
+        after = headers.render(before, entries)
+        if not entries:
+            print(f"🧾 {name}: every path redirects; no headers")
+        else:
+            links = sum(1 for found in preloads.values() if found)
+            print(f"🧾 {name}: {len(entries)} header rules, preloads on {links} of {len(preloads)} pages")
+        if after == before:
+            continue
+        if getattr(options, "diff", False):
+            print(unified_diff(target, before, after), end="")
+        if not dry_run:
+            target.write_text(after, encoding='utf-8')
+
+
+def write_output(names, out, options=None):
+    """
+    Write each variant's minified, precompressed copy to out/<variant>
+    (see sitebuild.output), reporting the bytes saved per page.
+    """
+    dry_run = getattr(options, "dry_run", False)
+    if output.brotli is None:
+        print("⚠️  brotli isn't installed (pip install brotli); writing .gz siblings only")
+    split = getattr(options, "critical_css", False)
+    shared = getattr(options, "hoist_css", False)
+    for name in names:
+        target = Path(out) / name
+        pages = variant_pages(name)
+        sizes, hoisted = output.write(REPO_ROOT / VARIANTS[name]["dir"], pages, target, dry_run, split, shared)
+        print(f"📦 {name}: {'would write' if dry_run else 'wrote'} {len(sizes)} pages to {display_path(target)}")
+        if hoisted is not None:
+            sheet, rules, linked = hoisted
+            print(f"🎨 {name}: hoisted {rules} rules into {display_path(target / sheet)} ({linked} pages)")
+        elif shared:
+            print(f"🎨 {name}: no shared CSS to hoist")
+        for size in sizes:
+            compressed = "".join(f" · {label} {n:,}" for label, n in (("gz", size.gz), ("br", size.br)) if n)
+            if size.critical is not None:
+                compressed += f" · critical CSS {size.critical:,} of {size.stylesheet:,}"
+            print(f"   {size.page}: {size.source:,} → {size.minified:,} bytes "
+                  f"({_percent(size.minified, size.source)}){compressed}")
+        source = sum(size.source for size in sizes)
+        minified = sum(size.minified for size in sizes)
+        gz = sum(size.gz or size.minified for size in sizes)
+        print(f"   total: {source:,} → {minified:,} bytes ({_percent(minified, source)}), "
+              f"{gz:,} gzipped ({_percent(gz, source)})")
+        # Hoisted and deferred sheets are new fingerprinted files; the copied headers don't know them
+        if (split or shared) and getattr(options, "headers", False) and not dry_run and (target / "vercel.json").exists():
+            entries, _ = headers.build(target, pages)
+            vercel = target / "vercel.json"
+            vercel.write_text(headers.render(vercel.read_text(encoding='utf-8'), entries), encoding='utf-8')
+
+
+def hoist_report(names):
+    """Print what --hoist-css would move into each variant's shared sheet, writing nothing."""
+    for name in names:
+        directory = REPO_ROOT / VARIANTS[name]["dir"]
+        contents = {filepath.name: content
+                    for filepath, content in _read_pages(directory, variant_pages(name)).items()}
+        sheet, text, rules, changed = hoist.hoist(contents)
+        if sheet is None:
+            print(f"🎨 {name}: no shared CSS to hoist")
+            continue
+        saved = sum(len(contents[page].encode('utf-8')) - len(content.encode('utf-8'))
+                    for page, content in changed.items())
+        print(f"🎨 {name}: would hoist {rules} rules ({len(text.encode('utf-8')):,} bytes) into "
+              f"{sheet}, {saved:,} bytes less inline CSS on {len(changed)} pages")
+
+
+def critical_report(names):
+    """Print each page's critical CSS size without writing anything (see sitebuild.critical)."""
+    for name in names:
+        directory = REPO_ROOT / VARIANTS[name]["dir"]
+        pages = _read_pages(directory, variant_pages(name))
+        splits = {filepath: critical.extract(content) for filepath, content in pages.items()}
+        found = {filepath: split for filepath, split in splits.items() if split is not None}
+        print(f"✂️  {name}: {len(found)} of {len(pages)} pages would defer CSS")
+        for filepath, split in found.items():
+            inline = len(minify.css(split.critical).encode('utf-8'))
+            full = len(minify.css(split.full).encode('utf-8'))
+            print(f"   {filepath.name}: critical CSS {inline:,} of {full:,} bytes "
+                  f"({inline / full:.0%}), {split.critical_rules} of {split.rules} rules")
+
+
+def _percent(new, old):
+    return f"{new / old - 1:+.0%}" if old else "+0%"
+
+
+def _read_pages(directory, pages):
+    return {directory / page: (directory / page).read_text(encoding='utf-8')
+            for page in pages if (directory / page).exists()}
+
+
+def _record_rewrites(changed, original, options, manifest):
+    """Print diffs for pages a site-wide step rewrote and refresh their manifest records."""
+    dry_run = getattr(options, "dry_run", False)
+    for filepath, content in changed.items():
+        if getattr(options, "diff", False):
+            print(unified_diff(filepath, original[filepath], content), end="")
+        if not manifest or dry_run:
+            continue
+        entry = manifest["pages"].get(page_key(filepath))
+        if entry:
+            entry["output"] = cache.content_hash(content)
+            entry["stat"] = cache.stat_signature(filepath)
+        # A build step's rewrite of a generated page isn't drift
+        if page_key(filepath) in manifest.get("generated", {}):
+            manifest["generated"][page_key(filepath)] = cache.content_hash(content)
+
+
+def vendor_variant_fonts(names, options=None):
+    """
+    Fetch the self-hosted Inter each variant's pages use (see
+    sitebuild.webfonts), or, without --vendor-fonts, warn if it is missing.
+    Runs before the stages, so inter_font can use a font fetched now.
+    """
+    fetch = getattr(options, "vendor_fonts", False)
+    dry_run = getattr(options, "dry_run", False)
+    for name in names:
+        if "inter_font" not in VARIANTS[name]["stages"]:
+            continue
+        directory = REPO_ROOT / VARIANTS[name]["dir"]
+        pages = variant_pages(name)
+        weights = webfonts.weight_range(directory, pages)
+        target = directory / transforms.INTER_FILE
+        if weights is None or (not fetch and target.exists()):
+            continue
+        if not fetch:
+            print(f"⚠️  {name}: pages keep loading Inter from Google Fonts until "
+                  f"{display_path(target)} is vendored (run with --vendor-fonts)")
+            continue
+        if dry_run:
+            print(f"🔤 {name}: would vendor Inter {weights[0]}–{weights[1]} into {display_path(target)}")
+            continue
+        try:
+            target, unicode_range = webfonts.vendor(directory, weights)
+        except (OSError, ValueError) as e:
+            print(f"❌ {name}: couldn't vendor Inter: {e}")
+            continue
+        print(f"🔤 {name}: vendored Inter {weights[0]}–{weights[1]} into {display_path(target)} "
+              f"({target.stat().st_size} bytes)")
+        spans = webfonts.parse_range(unicode_range)
+        for page, chars in webfonts.uncovered(directory, pages, spans).items():
+            print(f"   {page}: {''.join(sorted(chars))!r} outside the {webfonts.SUBSET} subset")
+
+
+def dose_variants(names, options=None, manifest=None):
+    """
+    Refill the dose:tables blocks in each variant's pages from
+    sitebuild.dose, so the calculators use the same numbers as the backend.
+    """
+    try:
+        from sitebuild import dose
+    except ImportError:
+        print("⚠️  dose tables need NumPy (pip install numpy); skipped")
+        return
+    dry_run = getattr(options, "dry_run", False)
+    for name in names:
+        directory = REPO_ROOT / VARIANTS[name]["dir"]
+        original = _read_pages(directory, variant_pages(name))
+        marked = {filepath: content for filepath, content in original.items() if dose.TABLES_MARKER.search(content)}
+        if not marked:
+            continue
+        changed = {}
+        for filepath, content in marked.items():
+            new = dose.render_tables(content)
+            if new != content:
+                changed[filepath] = new
+                if not dry_run:
+                    filepath.write_text(new, encoding='utf-8')
+        print(f"🧮 {name}: {len(marked)} pages use the dose tables, {len(changed)} "
+              f"{'would change' if dry_run else 'updated'}")
+        _record_rewrites(changed, original, options, manifest)
+
+
+def image_variants(names, options=None, manifest=None):
+    """
+    Vendor the Unplugs images each variant's pages hotlink and serve them
+    as responsive AVIF/WebP (see sitebuild.images).
+    """
+    dry_run = getattr(options, "dry_run", False)
+    for name in names:
+        directory = REPO_ROOT / VARIANTS[name]["dir"]
+        pages = variant_pages(name)
+        original = _read_pages(directory, pages)
+        try:
+            used, changed, written = images.optimize(directory, pages, dry_run)
+        except ImportError:
+            print(f"⚠️  {name}: responsive images need Pillow (pip install pillow); skipped")
+            continue
+        except OSError as e:
+            print(f"❌ {name}: couldn't vendor images: {e}")
+            continue
+        if not used:
+            continue
+        copies = sum(len(files) for entry in used.values() for files in entry["variants"].values())
+        print(f"🖼️  {name}: {len(used)} images, {copies} responsive copies, "
+              f"{len(written)} files {'to write' if dry_run else 'written'}")
+        print(f"🖼️  {name}: {len(changed)} pages {'would change' if dry_run else 'updated'}")
+        _record_rewrites(changed, original, options, manifest)
+
+
+def subset_variant_fonts(names, options=None, manifest=None):
+    """
+    Subset the Bamboy fonts each variant's pages render and add subset
+    @font-face rules and preloads to those pages (see sitebuild.fonts).
+    """
+    dry_run = getattr(options, "dry_run", False)
+    for name in names:
+        directory = REPO_ROOT / VARIANTS[name]["dir"]
+        pages = variant_pages(name)
+        original = _read_pages(directory, pages)
+        try:
+            subsets, changed = fonts.optimize(directory, pages, dry_run)
+        except ImportError:
+            print(f"⚠️  {name}: font subsetting needs fontTools and brotli "
+                  f"(pip install fonttools brotli); skipped")
+            continue
+        if not subsets:
+            print(f"🔤 {name}: no pages render Bamboy")
+            continue
+        for target, chars in subsets.items():
+            size = f", {target.stat().st_size} bytes" if target.exists() else ""
+            print(f"🔤 {name}: {'would write' if dry_run else 'wrote'} {display_path(target)} "
+                  f"({len(chars)} glyphs{size})")
+        print(f"🔤 {name}: {len(changed)} pages {'would change' if dry_run else 'updated'}")
+        _record_rewrites(changed, original, options, manifest)
+
+
+def add_run_arguments(parser):
+    """Options shared by the pipeline and the single-stage wrapper scripts."""
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="worker processes (0 = one per CPU, default: 1)")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="transform in memory only; report byte deltas, write nothing")
+    parser.add_argument("--diff", action="store_true",
+                        help="print a unified diff for every changed page")
+    parser.add_argument("--patch-dir",
+                        help="also write one .patch file per changed page into this directory")
+    parser.add_argument("--profile", default=os.environ.get(instrument.ENV_VAR) or None,
+                        help=f"write per-rule timings and match counts as JSON to this path "
+                             f"(or set {instrument.ENV_VAR})")
+
+
+def parse_options(argv=None):
+    """Parse the shared run options for the single-stage wrapper scripts."""
+    parser = argparse.ArgumentParser()
+    add_run_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rewrite site pages in one pass per file.")
+    parser.add_argument("variants", nargs="*",
+                        help=f"site variants to build: {', '.join(VARIANTS)} (default: all)")
+    parser.add_argument("--stages",
+                        help="comma-separated stage list overriding each variant's own")
+    add_run_arguments(parser)
+    parser.add_argument("--cache", default=str(REPO_ROOT / cache.MANIFEST_NAME),
+                        help="build manifest path (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ignore and do not update the build manifest")
+    parser.add_argument("--vendor-fonts", action="store_true",
+                        help="fetch the Inter font pages load from fonts/ (needs network)")
+    parser.add_argument("--dose-tables", action="store_true",
+                        help="after the stages, refill the exposure lookup tables in page "
+                             "scripts from sitebuild.dose (needs NumPy)")
+    parser.add_argument("--vendor-images", action="store_true",
+                        help="after the stages, serve images hotlinked from Unplugs from images/ "
+                             "as lazy, sized AVIF/WebP srcsets (needs network and Pillow)")
+    parser.add_argument("--subset-fonts", action="store_true",
+                        help="after the stages, subset Bamboy to the glyphs pages render "
+                             "and preload it where headings above the fold use it")
+    parser.add_argument("--out", metavar="DIR",
+                        help="finally write each variant's minified pages and assets, with "
+                             ".gz/.br siblings, to DIR/<variant>")
+    parser.add_argument("--critical-css", action="store_true",
+                        help="with --out, inline only each page's above-the-fold CSS and load "
+                             "the rest without blocking; without it, report the sizes")
+    parser.add_argument("--hoist-css", action="store_true",
+                        help="with --out, move CSS shared by a variant's pages into a "
+                             "fingerprinted site.<hash>.css; without it, report what would move")
+    parser.add_argument("--headers", action="store_true",
+                        help="after the stages, write Cache-Control and per-page preload "
+                             "headers into each variant's vercel.json")
+    parser.add_argument("--generate", action="store_true",
+                        help="first regenerate variants that have a source from it, in one "
+                             "pass; pages edited since they were generated are kept")
+    parser.add_argument("--force", action="store_true",
+                        help="with --generate, overwrite edited (drifted) pages too")
+    parser.add_argument("--drift", action="store_true",
+                        help="only report content that exists in a generated variant's tree "
+                             "or in its source but not both")
+    parser.add_argument("--watch", action="store_true",
+                        help="after the build, re-run the stages a change to a page, partial "
+                             "or transform affects until interrupted (see sitebuild.watch)")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.variants if name not in VARIANTS]
+    if unknown:
+        parser.error(f"unknown variant(s): {', '.join(unknown)}")
+
+    stages = None
+    if args.stages:
+        stages = [name.strip() for name in args.stages.split(",") if name.strip()]
+        unknown = [name for name in stages if name not in STAGES]
+        if unknown:
+            parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    manifest = None if args.no_cache else cache.load_manifest(args.cache)
+    names = args.variants or list(VARIANTS)
+    if args.drift:
+        drift_variants(names, args)
+        return
+    vendor_variant_fonts(names, args)
+    if args.generate:
+        generate_variants(names, args, manifest)
+        print()
+    totals = run_variants(names, stages, args, manifest)
+    if args.dose_tables:
+        print()
+        dose_variants(names, args, manifest)
+    if args.vendor_images:
+        print()
+        image_variants(names, args, manifest)
+    if args.subset_fonts:
+        print()
+        subset_variant_fonts(names, args, manifest)
+    if args.headers:
+        print()
+        header_variants(names, args)
+    if manifest is not None and not args.dry_run:
+        cache.save_manifest(args.cache, manifest)
+    if args.out:
+        print()
+        write_output(names, args.out, args)
+    else:
+        if args.hoist_css:
+            print()
+            hoist_report(names)
+        if args.critical_css:
+            print()
+            critical_report(names)
+    finish_profile(args)
+
+    print(f"\n✅ {'Would update' if args.dry_run else 'Updated'}: {totals[0]}")
+    print(f"⏭️  Skipped: {totals[1]}")
+    if totals[2]:
+        print(f"❌ Missing: {totals[2]}")
+
+    if args.watch:
+        from sitebuild import watch
+        watch.run(names, args, manifest)
@@ -0,0 +1,73 @@
+"""
+Page registry: which pages each site variant's transforms target.
+
+A variant's pages are the entries in its sitemap.xml (in sitemap order)
+plus any files matching its `include` globs, minus its `exclude` globs.
+Each directory is listed once per process and the result reused, so every
+transform sees the same page list and new pages are picked up without
+editing any script.
+"""
+
+import fnmatch
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urlsplit
+
+SITEMAP_NAME = "sitemap.xml"
+_SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+@lru_cache(maxsize=None)
+def scan(directory):
+    """Sorted names of the .html files directly inside `directory`."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return ()
+    return tuple(sorted(p.name for p in directory.iterdir() if p.suffix == ".html" and p.is_file()))
+
+
+def _page_name(loc):
+    """Map a sitemap <loc> to the file serving it ("/" is index.html)."""
+    path = urlsplit(loc.strip()).path.lstrip("/")
+    if not path or path.endswith("/"):
+        return path + "index.html"
+    if "." not in path.rsplit("/", 1)[-1]:
+        # cleanUrls: /decibel-guide is served from decibel-guide.html
+        return path + ".html"
+    return path
+
+
+@lru_cache(maxsize=None)
+def sitemap_pages(directory):
+    """Page files listed in `directory`/sitemap.xml, in order; () if there is none."""
+    path = Path(directory) / SITEMAP_NAME
+    try:
+        tree = ET.parse(path)
+    except (OSError, ET.ParseError):
+        return ()
+    pages = []
+    for loc in tree.iter(f"{_SITEMAP_NS}loc"):
+        page = _page_name(loc.text or "")
+        if page.endswith(".html") and "/" not in page and page not in pages:
+            pages.append(page)
+    return tuple(pages)
+
+
+def _matches(page, patterns):
+    return any(fnmatch.fnmatchcase(page, pattern) for pattern in patterns)
+
+
+def discover(directory, sitemap=True, include=(), exclude=()):
+    """
+    Pages for one directory: sitemap entries first (when `sitemap` is set),
+    then scanned files matching `include`, with `exclude` matches removed.
+    Sitemap pages missing on disk are kept so runs report them.
+    """
+    pages = list(sitemap_pages(directory)) if sitemap else []
+    seen = set(pages)
+    for page in scan(directory):
+        if page not in seen and _matches(page, include):
+            pages.append(page)
+            seen.add(page)
+    return [page for page in pages if not _matches(page, exclude)]
@@ -0,0 +1,538 @@
+"""
+Local preview server that delivers a variant the way Vercel does.
+
+    python -m sitebuild.serve dist/hearing-guide              # http://127.0.0.1:8000
+    python -m sitebuild.serve hearing-guide --port 9000
+    python -m sitebuild.serve dist/hearing-guide --load-test  # requests/s and latency
+    python -m sitebuild.serve --load-test --url http://127.0.0.1:8000
+
+The directory's vercel.json is honoured: `redirects`, `rewrites`,
+`headers`, `cleanUrls` (/page serves page.html, /page.html and /index
+redirect) and `trailingSlash`. Sources use Vercel's path syntax: `:name`,
+`:name*` and regex groups such as `(.*)`, with `$1` or `:name` in
+destinations.
+
+Files are served from a threaded stdlib server with a strong ETag,
+Last-Modified and Cache-Control (Vercel's default, `public, max-age=0,
+must-revalidate`, unless vercel.json sets one), and conditional requests
+get 304. A `.br` or `.gz` sibling written by --out (see sitebuild.output)
+is sent when the client accepts it; text files without one are
+compressed on first request and kept in memory.
+
+--load-test runs the server in a child process (or targets --url) and
+requests every page in the sitemap from CONCURRENCY keep-alive
+connections for DURATION seconds. It reports requests/s, throughput and
+latency percentiles.
+"""
+
+import argparse
+import asyncio
+import email.utils
+import hashlib
+import mimetypes
+import multiprocessing
+import socket
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from time import perf_counter, sleep
+from urllib.parse import unquote, urlsplit
+
+from sitebuild import output
+from sitebuild.vercel import Config, substitute
+
+DEFAULT_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+# Preferred first when the client accepts both
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".json": "application/json",
+    ".xml": "application/xml",
+    ".txt": "text/plain; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".woff2": "font/woff2",
+    ".woff": "font/woff",
+}
+
+CONCURRENCY = 32
+DURATION = 10.0
+
+class Entry:
+    """One file's body in one encoding, with its validators."""
+
+    def __init__(self, body, encoding, mtime):
+        self.body = body
+        self.encoding = encoding
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + (f'-{encoding}"' if encoding else '"')
+        self.last_modified = email.utils.formatdate(mtime, usegmt=True)
+
+
+class Site:
+    """Routing and file lookup for one served directory."""
+
+    def __init__(self, directory):
+        self.root = Path(directory).resolve()
+        self.config = Config.load(self.root)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _file(self, path):
+        """The file a URL path names, or None. Never leaves the root."""
+        target = (self.root / unquote(path).lstrip("/")).resolve()
+        if target != self.root and self.root not in target.parents:
+            return None
+        if target.is_dir():
+            target = target / "index.html"
+        return target if target.is_file() else None
+
+    def route(self, path):
+        """
+        ("redirect", status, location) or ("file", file path or None,
+        status) for a request path, following vercel.json.
+        """
+        for rule, destination, status in self.config.redirects:
+            m = rule.match(path)
+            if m:
+                return "redirect", status, substitute(destination, m)
+        if self.config.clean_urls:
+            if path.endswith(".html"):
+                clean = path[:-len(".html")]
+                clean = clean[:-len("index")] if clean.endswith("/index") else clean
+                return "redirect", 308, self._slashed(clean)
+            if path.endswith("/index"):
+                return "redirect", 308, self._slashed(path[:-len("index")])
+        if path != "/":
+            if self.config.trailing_slash is False and path.endswith("/"):
+                return "redirect", 308, path.rstrip("/") or "/"
+            if self.config.trailing_slash is True and not path.endswith("/") and "." not in path.rsplit("/", 1)[-1]:
+                return "redirect", 308, path + "/"
+        target = self._lookup(path)
+        if target is None:
+            for rule, destination in self.config.rewrites:
+                m = rule.match(path)
+                if m:
+                    target = self._lookup(urlsplit(substitute(destination, m)).path)
+                    break
+        if target is None:
+            return "file", self._file("/404.html"), 404
+        return "file", target, 200
+
+    def _slashed(self, path):
+        if path in ("", "/"):
+            return "/"
+        path = path.rstrip("/")
+        return path + "/" if self.config.trailing_slash else path
+
+    def _lookup(self, path):
+        target = self._file(path)
+        if target is None and self.config.clean_urls and path != "/":
+            target = self._file(path.rstrip("/") + ".html")
+        return target
+
+    def entry(self, target, accepted):
+        """The Entry to send for `target` given the client's accepted encodings."""
+        stat = target.stat()
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            sibling = target.with_name(target.name + suffix)
+            if sibling.is_file() and sibling.stat().st_mtime_ns >= stat.st_mtime_ns:
+                return self._cached(sibling, encoding, stat.st_mtime)
+            if target.suffix in output.COMPRESS_SUFFIXES:
+                compressed = self._compressed(target, suffix, stat)
+                if compressed is not None:
+                    return compressed
+        return self._cached(target, None, stat.st_mtime)
+
+    def _cached(self, path, encoding, mtime):
+        stat = path.stat()
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = Entry(path.read_bytes(), encoding, mtime)
+            with self._lock:
+                self._entries[key] = entry
+        return entry
+
+    def _compressed(self, target, suffix, stat):
+        key = (target, stat.st_mtime_ns, stat.st_size, suffix)
+        if key not in self._entries:
+            body = output.compressed(target.read_bytes()).get(suffix)
+            encoding = dict((s, e) for e, s in ENCODINGS)[suffix]
+            with self._lock:
+                self._entries[key] = Entry(body, encoding, stat.st_mtime) if body is not None else None
+        return self._entries[key]
+
+
+def _accepted(header):
+    """Content codings an Accept-Encoding header allows (any q above 0)."""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if coding and _quality(params) > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def _quality(params):
+    """The q value in a coding's parameters; 1 if absent or malformed."""
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 1.0
+    return 1.0
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serves a Site; set `site` and `quiet` on a subclass."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, each
+    # keep-alive response waits ~40 ms for the client's delayed ACK
+    disable_nagle_algorithm = True
+    server_version = "sitebuild-preview"
+    site = None
+    quiet = False
+
+    def do_GET(self):
+        self._respond(head=False)
+
+    def do_HEAD(self):
+        self._respond(head=True)
+
+    def _respond(self, head):
+        path = urlsplit(self.path).path or "/"
+        extra = self.site.config.headers_for(path)
+        kind, *result = self.site.route(path)
+        if kind == "redirect":
+            status, location = result
+            self.send_response(status)
+            self.send_header("Location", location)
+            self._finish(b"", extra, head)
+            return
+        target, status = result
+        if target is None:
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self._finish(b"Not found\n", extra, head)
+            return
+        entry = self.site.entry(target, _accepted(self.headers.get("Accept-Encoding")))
+        if status == 200 and self._not_modified(entry):
+            self.send_response(304)
+            self.send_header("ETag", entry.etag)
+            self._finish(b"", extra, head=True, length=False)
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", CONTENT_TYPES.get(target.suffix)
+                         or mimetypes.guess_type(target.name)[0] or "application/octet-stream")
+        if entry.encoding:
+            self.send_header("Content-Encoding", entry.encoding)
+        if target.suffix in output.COMPRESS_SUFFIXES:
+            self.send_header("Vary", "Accept-Encoding")
+        self.send_header("ETag", entry.etag)
+        self.send_header("Last-Modified", entry.last_modified)
+        self._finish(entry.body, extra, head)
+
+    def _not_modified(self, entry):
+        tags = self.headers.get("If-None-Match")
+        if tags is not None:
+            return entry.etag in [tag.strip() for tag in tags.split(",")] or tags.strip() == "*"
+        since = self.headers.get("If-Modified-Since")
+        if since is None:
+            return False
+        try:
+            return email.utils.parsedate_to_datetime(since) >= email.utils.parsedate_to_datetime(entry.last_modified)
+        except (TypeError, ValueError):
+            return False
+
+    def _finish(self, body, extra, head, length=True):
+        names = {key.lower() for key, _ in extra}
+        if "cache-control" not in names:
+            self.send_header("Cache-Control", DEFAULT_CACHE_CONTROL)
+        for key, value in extra:
+            self.send_header(key, value)
+        if length:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class _Server(ThreadingHTTPServer):
+    # A load test opens hundreds of connections at once; the default backlog of 5 drops them
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def make_server(directory, host="127.0.0.1", port=8000, quiet=False):
+    """A ThreadingHTTPServer for `directory`, not yet serving."""
+    handler = type("SiteHandler", (Handler,), {"site": Site(directory), "quiet": quiet})
+    return _Server((host, port), handler)
+
+
+def serve(directory, host="127.0.0.1", port=8000, quiet=False):
+    server = make_server(directory, host, port, quiet)
+    with server:
+        server.serve_forever()
+
+
+# ---------------------------------------------------------------------------
+# Load test
+# ---------------------------------------------------------------------------
+
+class LoadResult:
+    """Latencies (seconds), statuses and body bytes from a load test."""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.bytes = 0
+        self.errors = 0
+        self.elapsed = 0.0
+        self.paths = []
+        self.moved = {}    # requested path -> path it redirects to
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def _request(reader, writer, host, path, etag=None):
+    """Send one GET on a keep-alive connection; returns (status, headers, body)."""
+    lines = [f"GET {path} HTTP/1.1", f"Host: {host}", "Accept-Encoding: br, gzip"]
+    if etag:
+        lines.append(f"If-None-Match: {etag}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode('latin-1').split("\r\n")
+    headers = {}
+    for line in header_lines:
+        if ":" in line:
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return int(status_line.split()[1]), headers, body
+
+
+async def _worker(host, port, paths, offset, deadline, result, revalidate):
+    etags = {}
+    reader = writer = None
+    i = offset
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = perf_counter()
+            status, headers, body = await _request(reader, writer, f"{host}:{port}", path,
+                                                   etags.get(path) if revalidate else None)
+            result.latencies.append(perf_counter() - start)
+            result.statuses[status] = result.statuses.get(status, 0) + 1
+            result.bytes += len(body)
+            if "etag" in headers:
+                etags[path] = headers["etag"]
+            if headers.get("connection", "").lower() == "close":
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _resolve(host, port, paths):
+    """
+    `paths` with same-site redirects followed, so the test measures pages
+    rather than redirects (sitemaps list /page.html, which cleanUrls
+    redirects). Returns (paths, {path: final path} for those that moved).
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    resolved = []
+    moved = {}
+    try:
+        for path in paths:
+            final = path
+            for _ in range(5):
+                status, headers, _ = await _request(reader, writer, f"{host}:{port}", final)
+                location = urlsplit(headers.get("location", ""))
+                if status not in (301, 302, 303, 307, 308) or location.netloc not in ("", f"{host}:{port}"):
+                    break
+                final = location.path or "/"
+            if final != path:
+                moved[path] = final
+            resolved.append(final)
+    finally:
+        writer.close()
+    return resolved, moved
+
+
+async def _load(host, port, paths, concurrency, duration, revalidate):
+    result = LoadResult()
+    paths, result.moved = await _resolve(host, port, paths)
+    result.paths = paths
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.gather(*(_worker(host, port, paths, n, start + duration, result, revalidate)
+                           for n in range(concurrency)))
+    result.elapsed = loop.time() - start
+    return result
+
+
+def load_test(host, port, paths, concurrency=CONCURRENCY, duration=DURATION, revalidate=False):
+    """Request `paths` round-robin from `concurrency` connections for `duration` seconds."""
+    return asyncio.run(_load(host, port, paths, concurrency, duration, revalidate))
+
+
+SITEMAP_LOC = "{http://www.sitemaps.org/schemas/sitemap/0.9}loc"
+
+
+def _sitemap_paths(root):
+    return [urlsplit(loc.text.strip()).path or "/" for loc in root.iter(SITEMAP_LOC) if loc.text]
+
+
+def site_paths(directory):
+    """URL paths of the pages in a directory's sitemap.xml, or of its .html files."""
+    directory = Path(directory)
+    config = Config.load(directory)
+    paths = []
+    try:
+        paths = _sitemap_paths(ET.parse(directory / "sitemap.xml").getroot())
+    except (OSError, ET.ParseError):
+        pass
+    if not paths:
+        for page in sorted(directory.glob("*.html")):
+            name = "" if page.stem == "index" else page.stem if config.clean_urls else page.name
+            paths.append("/" + name)
+    return paths or ["/"]
+
+
+def remote_paths(host, port):
+    """Page paths from a running server's /sitemap.xml, or just "/"."""
+    async def fetch():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            lines = ["GET /sitemap.xml HTTP/1.1", f"Host: {host}:{port}", "Connection: close"]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            body = await reader.read()
+            return head.split(b" ", 2)[1] == b"200", body
+        finally:
+            writer.close()
+    try:
+        ok, body = asyncio.run(fetch())
+        if ok:
+            paths = _sitemap_paths(ET.fromstring(body))
+            if paths:
+                return paths
+    except (OSError, ET.ParseError, asyncio.IncompleteReadError, IndexError):
+        pass
+    return ["/"]
+
+
+def _free_port(host):
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(host, port, timeout=10.0):
+    waited = 0.0
+    while waited < timeout:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            sleep(0.05)
+            waited += 0.05
+    return False
+
+
+def print_load(result, concurrency):
+    total = len(result.latencies)
+    rate = total / result.elapsed if result.elapsed else 0
+    statuses = ", ".join(f"{status}: {n}" for status, n in sorted(result.statuses.items()))
+    if result.moved:
+        print(f"🔀 {len(result.moved)} listed paths redirect (e.g. {next(iter(result.moved))} → "
+              f"{next(iter(result.moved.values()))}); measuring where they land")
+    print(f"🚀 {total:,} requests over {len(set(result.paths))} paths from {concurrency} connections "
+          f"in {result.elapsed:.1f} s")
+    print(f"   {rate:,.0f} requests/s, {result.bytes / result.elapsed / 1e6 if result.elapsed else 0:.1f} MB/s")
+    print(f"   latency p50 {result.percentile(50) * 1000:.1f} ms · p90 {result.percentile(90) * 1000:.1f} ms"
+          f" · p99 {result.percentile(99) * 1000:.1f} ms · max {max(result.latencies, default=0) * 1000:.1f} ms")
+    print(f"   status {statuses or 'none'}" + (f" · {result.errors} errors" if result.errors else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preview a site directory with Vercel's routing and headers.")
+    parser.add_argument("directory", nargs="?", help="directory to serve, e.g. dist/hearing-guide")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--quiet", action="store_true", help="don't log requests")
+    parser.add_argument("--load-test", action="store_true",
+                        help="measure requests/s and latency instead of serving")
+    parser.add_argument("--url", help="with --load-test, a running server to measure instead")
+    parser.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY,
+                        help="connections kept open (default: %(default)s)")
+    parser.add_argument("-d", "--duration", type=float, default=DURATION,
+                        help="seconds to run (default: %(default)s)")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="send If-None-Match once a path's ETag is known, like a warm browser cache")
+    args = parser.parse_args(argv)
+
+    if not args.load_test:
+        if not args.directory:
+            parser.error("a directory to serve is required")
+        print(f"🌐 Serving {args.directory} at http://{args.host}:{args.port}/ (Ctrl-C to stop)")
+        try:
+            serve(args.directory, args.host, args.port, args.quiet)
+        except KeyboardInterrupt:
+            print()
+        return
+
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+        paths = site_paths(args.directory) if args.directory else remote_paths(host, port)
+        result = load_test(host, port, paths, args.concurrency, args.duration, args.revalidate)
+    else:
+        if not args.directory:
+            parser.error("--load-test needs a directory or --url")
+        host, port = args.host, _free_port(args.host)
+        process = multiprocessing.Process(target=serve, args=(args.directory, host, port, True), daemon=True)
+        process.start()
+        try:
+            if not _wait_for(host, port):
+                sys.exit("❌ the preview server didn't start")
+            paths = site_paths(args.directory)
+            result = load_test(host, port, paths, args.concurrency, args.duration, args.revalidate)
+        finally:
+            process.terminate()
+            process.join()
+    print_load(result, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,576 @@
+"""
+Page transforms shared by the rewrite scripts and the build pipeline.
+
+Each transform takes the page source and returns the rewritten source.
+"""
+
+import re
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from sitebuild import instrument, partials
+from sitebuild.css import StyleSheet
+from sitebuild.replace import MultiReplace
+
+
+# ---------------------------------------------------------------------------
+# render_partials: shared header, mobile menu, footer and CTA blocks
+# ---------------------------------------------------------------------------
+
+PARTIALS_DIR = Path(__file__).resolve().parent.parent / "partials"
+
+# Loaded once; the templates count towards the stage version
+PARTIALS = partials.load(PARTIALS_DIR)
+
+
+def render_partials(content, **context):
+    """Re-render the page's marked partial regions with the variant's context."""
+    return partials.render_page(content, PARTIALS, context)
+
+
+# ---------------------------------------------------------------------------
+# rebrand: Hearing Guide -> Safe Sound Guide for safesoundcollective.org
+# ---------------------------------------------------------------------------
+
+
+# Title/branding changes
+BRAND_REPLACEMENTS = MultiReplace([
+    ("Hearing Protection Superguide", "Safe Sound Guide"),
+    ("Hearing Guide", "Safe Sound Guide"),
+    ("Unplugs Learn", "Safe Sound Guide"),
+    ("UNPLUGS LEARN", "SAFE SOUND GUIDE"),
+], "BRAND_REPLACEMENTS")
+
+# Update header logo link to SSC root
+HEADER_REPLACEMENTS = MultiReplace([
+    ('href="https://unplugshearing.com" class="header-logo"', 'href="/" class="header-logo"'),
+    ('href="index.html" class="header-logo"', 'href="/" class="header-logo"'),
+], "HEADER_REPLACEMENTS")
+
+# Footer text (utm_links adds the campaign to the Unplugs link)
+FOOTER_REPLACEMENTS = MultiReplace([
+    ('Built by audiologists, for everyone.',
+     'A Safe Sound Collective resource. Powered by <a href="https://unplugshearing.com" style="color: var(--accent);">Unplugs</a>.'),
+    ('© 2026 Unplugs Hearing. All rights reserved.',
+     '© 2026 Safe Sound Collective. Free educational resource.'),
+], "FOOTER_REPLACEMENTS")
+
+def rebrand(content):
+    """Apply all rebranding changes."""
+    
+    # Title/branding changes
+    content = BRAND_REPLACEMENTS(content)
+    
+    # Update page titles
+    content = instrument.sub(
+        r'<title>([^|<]+)\| Unplugs</title>',
+        r'<title>\1| Safe Sound Guide</title>',
+        content
+    )
+    content = instrument.sub(
+        r'<title>Hearing Protection Superguide[^<]*</title>',
+        '<title>Safe Sound Guide | The Complete Hearing Protection Resource</title>',
+        content
+    )
+    
+    # Update header logo link to SSC root
+    content = HEADER_REPLACEMENTS(content)
+    
+    # Update canonical URLs to safesoundcollective.org
+    content = instrument.sub(
+        r'href="https://learn\.unplugshearing\.com/([^"]*)"',
+        r'href="https://safesoundcollective.org/\1"',
+        content
+    )
+    
+    # Update footer text
+    content = FOOTER_REPLACEMENTS(content)
+    
+    return content
+
+
+# ---------------------------------------------------------------------------
+# utm_links: campaign parameters on outbound Unplugs links
+# ---------------------------------------------------------------------------
+
+# Default campaign; variants override it through their stage_options
+CAMPAIGN = {"utm_source": "safesound", "utm_medium": "guide", "utm_campaign": "ssc"}
+
+UTM_HOSTS = frozenset({"unplugshearing.com", "www.unplugshearing.com"})
+UNPLUGS_HREF = re.compile(r'href="(https?://(?:www\.)?unplugshearing\.com\b[^"]*)"')
+
+@lru_cache(maxsize=4096)
+def campaign_url(url, campaign):
+    """
+    `url` with the `campaign` (key, value) pairs added to its query string,
+    before any fragment. A link that already carries a utm_source keeps its
+    own campaign, so rewriting is idempotent. A second "?utm_source=" left
+    by an earlier double rewrite is collapsed to the last one.
+    """
+    base, hash_mark, fragment = url.partition("#")
+    head, mark, query = base.partition("?")
+    if urlsplit(head).netloc.lower() not in UTM_HOSTS:
+        return url
+    if query.startswith("utm_") and "?utm_source=" in query:
+        query = query[query.rindex("?utm_source=") + 1:]
+    keys = {key for key, _ in parse_qsl(query, keep_blank_values=True)}
+    if "utm_source" not in keys:
+        extra = urlencode([(key, value) for key, value in campaign if key not in keys])
+        query = f"{query}&{extra}" if query else extra
+        mark = "?"
+    return head + mark + query + hash_mark + fragment
+
+def utm_links(content, **campaign):
+    """Add campaign parameters (default CAMPAIGN) to every Unplugs link."""
+    if "unplugshearing.com" not in content:
+        return content
+    campaign = tuple((campaign or CAMPAIGN).items())
+    return instrument.sub(
+        UNPLUGS_HREF,
+        lambda m: f'href="{campaign_url(m.group(1), campaign)}"',
+        content
+    )
+
+
+# ---------------------------------------------------------------------------
+# rebrand_guide: logo, title and footer rebrand for the hearing-guide tree
+# ---------------------------------------------------------------------------
+
+GUIDE_REPLACEMENTS = [
+    # Header logo
+    (r'<span class="header-logo-icon">🔊</span>\s*\n?\s*Hearing Guide', 
+     '<span class="header-logo-icon">🔊</span>\n                Safe Sound Guide'),
+    # Footer logo
+    (r'<div class="logo-icon">🔊</div>\s*\n?\s*Hearing Guide',
+     '<div class="logo-icon">🔊</div>\n                    Safe Sound Guide'),
+    # Title tags - preserve page name, change suffix
+    (r'\| Hearing Guide</title>', '| Safe Sound Guide</title>'),
+    # og:title tags
+    (r'\| Hearing Guide">', '| Safe Sound Guide">'),
+    # Hero heading (index page)
+    (r'<h1>The <span class="gradient">Hearing Protection</span> Superguide</h1>',
+     '<h1>The <span class="gradient">Safe Sound</span> Guide</h1>'),
+    # Footer copyright
+    (r'© 2026 Hearing Protection Superguide\.',
+     '© 2026 Safe Sound Guide.'),
+    # "Part of the" references
+    (r'Part of the <a href="index.html">Hearing Protection Superguide</a>',
+     'Part of the <a href="index.html">Safe Sound Guide</a>'),
+    # Index title specifically
+    (r'<title>Hearing Protection Superguide \|',
+     '<title>Safe Sound Guide |'),
+]
+
+GUIDE_PATTERNS = [
+    (re.compile(pattern, re.MULTILINE), replacement)
+    for pattern, replacement in GUIDE_REPLACEMENTS
+]
+
+def rebrand_guide(content):
+    """Rebrand header/footer logos, titles and copyright lines."""
+    for pattern, replacement in GUIDE_PATTERNS:
+        content = instrument.sub(pattern, replacement, content)
+    return content
+
+
+# ---------------------------------------------------------------------------
+# fix_colors: text colors on green backgrounds (fix-all-cta-colors.py)
+# ---------------------------------------------------------------------------
+
+# Value patterns for selector-targeted fixes
+WHITE = re.compile(r'white\Z')
+SHORT_WHITE = re.compile(r'#fff\Z')
+SHORT_DARK = re.compile(r'#222\Z')
+DARK = re.compile(r'#222222')
+DARK_EXACT = re.compile(r'#222222\Z')
+
+def fix_colors(content):
+    """Fix text colors on green backgrounds."""
+    
+    sheet = StyleSheet(content)
+    
+    # Add explicit color rules for protection-cta elements
+    sheet.add_property(".protection-cta h2", "color", "#222222")
+    sheet.set_property(".protection-cta h2", "color", "#222222")
+    
+    # Fix protection-cta p: opacity becomes dark text, add color if missing
+    sheet.replace_declaration(".protection-cta p", "opacity", "color", "#333333")
+    sheet.add_property(".protection-cta p", "color", "#333333")
+    
+    # Fix CTA section h3 (used in some pages)
+    sheet.set_property(".cta-section h3", "color", "#222222")
+    
+    # Fix CTA content h3
+    sheet.set_property(".cta-content h3", "color", "#222222")
+    
+    # Fix CTA content p
+    sheet.set_property(".cta-content p", "color", "#333333")
+    sheet.replace_declaration(".cta-content p", "opacity", "color", "#333333")
+    
+    # Fix .cta-btn on green (should have dark text) - but this one uses white bg so skip
+    # Fix any .btn-primary text color
+    sheet.set_property(".btn-primary", "color", "#222222", match=WHITE)
+    
+    # Fix featured-badge
+    sheet.set_property(".featured-badge", "color", "#222222", match=WHITE)
+    
+    # Fix hero-stat-value if green bg
+    # Actually hero-stat-value is green TEXT on dark bg, that's fine
+    
+    return sheet.render()
+
+
+# ---------------------------------------------------------------------------
+# fix_cta_colors: dark text on green CTA backgrounds (fix-cta-colors.py)
+# ---------------------------------------------------------------------------
+
+def fix_cta_colors(content):
+    """Fix CTA section colors to use dark text on green backgrounds."""
+    
+    sheet = StyleSheet(content)
+    
+    # Fix CTA banner h3 - should be dark on green
+    sheet.set_property(".cta-banner .cta-content h3", "color", "#222222", match=SHORT_DARK)
+    
+    # Fix CTA section h3 and p
+    sheet.set_property(".cta-section h3", "color", "#222222")
+    sheet.set_property(".cta-section p", "color", "#333333")
+    
+    # Fix CTA content h3 and p (in cta-banner)
+    sheet.set_property(".cta-content h3", "color", "#222222")
+    sheet.set_property(".cta-content p", "color", "#333333")
+    
+    # Fix featured-badge text (green bg, should be dark)
+    sheet.set_property(".featured-badge", "color", "#222222", match=WHITE)
+    sheet.set_property(".featured-badge", "color", "#222222", match=SHORT_WHITE)
+    
+    # Restore body text colors that might have been wrongly changed
+    sheet.sub_value(None, "--text-primary", DARK, "#FFFFFF")
+    sheet.sub_value(None, "--text", DARK, "#FFFFFF")
+    
+    # Fix body color if it was changed
+    sheet.set_property("body", "color", "var(--text-primary)", match=DARK_EXACT)
+    
+    return sheet.render()
+
+
+# ---------------------------------------------------------------------------
+# unplugs_style: Unplugs design system (apply-unplugs-style.py)
+# ---------------------------------------------------------------------------
+
+# Old color mappings to new
+COLOR_REPLACEMENTS = {
+    # Backgrounds
+    "#0F172A": "#222222",
+    "#0f172a": "#222222",
+    "#1E293B": "#2A2A2A",
+    "#1e293b": "#2A2A2A",
+    "#334155": "#333333",
+    
+    # Accent colors (purple to green)
+    "#6366F1": "#29EF78",
+    "#6366f1": "#29EF78",
+    "#4F46E5": "#22D969",
+    "#4f46e5": "#22D969",
+    "#7C3AED": "#29EF78",
+    "#7c3aed": "#29EF78",
+    
+    # Cyan accent to green
+    "#22D3EE": "#29EF78",
+    "#22d3ee": "#29EF78",
+    
+    # Text colors
+    "#F8FAFC": "#FFFFFF",
+    "#f8fafc": "#FFFFFF",
+    "#94A3B8": "#909090",
+    "#94a3b8": "#909090",
+    
+    # Border
+    "rgba(255,255,255,0.1)": "rgba(255,255,255,0.08)",
+}
+
+# CSS variable replacements
+CSS_VAR_REPLACEMENTS = {
+    "--primary: #6366F1": "--primary: #29EF78",
+    "--primary-dark: #4F46E5": "--primary-dark: #22D969",
+    "--secondary: #0F172A": "--secondary: #222222",
+    "--accent: #22D3EE": "--accent: #29EF78",
+    "--text: #F8FAFC": "--text: #FFFFFF",
+    "--text-muted: #94A3B8": "--text-muted: #909090",
+    "--card: #1E293B": "--card: #2A2A2A",
+    "--card-hover: #334155": "--card-hover: #333333",
+}
+
+# Font replacement
+FONT_REPLACEMENT = (
+    "https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800;900&display=swap",
+    "https://fonts.googleapis.com/css2?family=Oswald:wght@400;500;600;700&family=Inter:wght@400;500;600;700&display=swap"
+)
+
+# Colors, CSS variables and font import compiled into a single-pass table
+STYLE_REPLACEMENTS = MultiReplace(
+    list(COLOR_REPLACEMENTS.items())
+    + list(CSS_VAR_REPLACEMENTS.items())
+    + [FONT_REPLACEMENT],
+    "STYLE_REPLACEMENTS",
+)
+
+# Button style updates (rounded to pill)
+BUTTON_STYLE_UPDATES = [
+    ("border-radius: 8px", "border-radius: 100px"),
+    ("border-radius: 12px", "border-radius: 100px"),
+]
+
+# Rules whose border-radius becomes a pill
+CTA_BUTTON_CLASSES = (".cta-button", ".featured-cta", ".header-cta")
+PX_RADIUS = re.compile(r'\d+px')
+
+# Old purple/cyan values on badges and CTA banners
+INDIGO_TINT = re.compile(r'rgba\(99,102,241,[^)]+\)')
+INDIGO_BORDER = re.compile(r'1px solid rgba\(99,102,241,[^)]+\)')
+CYAN_TINT = re.compile(r'rgba\(34,211,238,[^)]+\)')
+PRIMARY_GRADIENT = re.compile(r'linear-gradient\(135deg,\s*var\(--primary\)[^)]+\)')
+INDIGO_GRADIENT = re.compile(r'linear-gradient\(135deg,\s*#6366F1[^)]+\)', re.IGNORECASE)
+
+def unplugs_style(content):
+    """Apply Unplugs styling: colors, variables, fonts and CTA shapes."""
+    
+    # Replace colors, CSS variables and font import
+    content = STYLE_REPLACEMENTS(content)
+    
+    sheet = StyleSheet(content)
+    
+    # Update button styles for CTA buttons (be selective)
+    # Only update buttons that are clearly CTAs
+    cta_buttons = sheet.select_where(
+        lambda selector: any(cls in selector for cls in CTA_BUTTON_CLASSES)
+    )
+    sheet.sub_value(cta_buttons, "border-radius", PX_RADIUS, "100px")
+    
+    # Add Oswald font-family to headings if not present
+    if "'Oswald'" not in content and "Oswald" in content:
+        # Font is imported but not used - add to h1, h2
+        sheet.set_property(".hero h1", "font-family", "'Oswald', sans-serif")
+    
+    # Update hero badge style (purple to green background)
+    sheet.sub_value(".hero-badge", "background", INDIGO_TINT, "rgba(41, 239, 120, 0.15)")
+    sheet.sub_value(".hero-badge", "border", INDIGO_BORDER, "1px solid rgba(41, 239, 120, 0.3)")
+    
+    # Update section badge
+    sheet.sub_value(".section-badge", "background", CYAN_TINT, "rgba(41, 239, 120, 0.15)")
+    
+    # Update article tag
+    sheet.sub_value(".article-tag", "background", INDIGO_TINT, "rgba(41, 239, 120, 0.15)")
+    
+    # Update CTA banner gradient
+    sheet.sub_value(".cta-banner", "background", PRIMARY_GRADIENT, "var(--accent)")
+    sheet.sub_value(".cta-banner", "background", INDIGO_GRADIENT, "#29EF78")
+    
+    content = sheet.render()
+    
+    return content
+
+
+# ---------------------------------------------------------------------------
+# bamboy_font: replace Oswald with Bamboy (apply-bamboy-font.py)
+# ---------------------------------------------------------------------------
+
+# @font-face declaration to inject
+FONT_FACE = '''
+        /* Bamboy Font */
+        @font-face {
+            font-family: 'Bamboy';
+            src: url('fonts/Bamboy-Regular.woff2') format('woff2'),
+                 url('fonts/Bamboy-Regular.woff') format('woff');
+            font-weight: 400;
+            font-style: normal;
+            font-display: swap;
+        }
+        @font-face {
+            font-family: 'Bamboy';
+            src: url('fonts/Bamboy-Condensed.woff2') format('woff2'),
+                 url('fonts/Bamboy-Condensed.woff') format('woff');
+            font-weight: 600;
+            font-style: normal;
+            font-display: swap;
+        }
+'''
+
+# Remove Oswald from Google Fonts import
+FONT_IMPORT_REPLACEMENTS = MultiReplace([
+    ("https://fonts.googleapis.com/css2?family=Oswald:wght@400;500;600;700&family=Inter:wght@400;500;600;700&display=swap",
+     "https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap"),
+    ("https://fonts.googleapis.com/css2?family=Oswald:wght@400;500;600;700&family=Inter:wght@400;500;600;700;800;900&display=swap",
+     "https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800;900&display=swap"),
+], "FONT_IMPORT_REPLACEMENTS")
+
+# Replace Oswald references with Bamboy
+OSWALD_REPLACEMENTS = MultiReplace([
+    ("'Oswald'", "'Bamboy'"),
+    ('"Oswald"', "'Bamboy'"),
+    ("--font-display: 'Oswald', sans-serif", "--font-display: 'Bamboy', sans-serif"),
+    ("font-family: Oswald", "font-family: 'Bamboy'"),
+], "OSWALD_REPLACEMENTS")
+
+# A font-family (or the display font variable) that renders in Bamboy
+BAMBOY_USED = re.compile(r"""(?:font-family|--font-display)\s*:\s*['"]?Bamboy""")
+
+# A Bamboy @font-face the page already declares
+BAMBOY_FACE = re.compile(r"""@font-face\s*\{\s*font-family:\s*['"]?Bamboy""")
+
+def bamboy_font(content):
+    """Swap Oswald for Bamboy and inject the Bamboy @font-face rules."""
+    
+    # Remove Oswald from Google Fonts import
+    content = FONT_IMPORT_REPLACEMENTS(content)
+    
+    # Replace Oswald references with Bamboy
+    content = OSWALD_REPLACEMENTS(content)
+    
+    # Inject @font-face after opening <style> tag if the page uses Bamboy
+    # and doesn't declare it yet
+    if not BAMBOY_FACE.search(content) and "<style>" in content and BAMBOY_USED.search(content):
+        content = instrument.replace(content, "<style>", "<style>" + FONT_FACE, 1)
+    
+    return content
+
+
+# ---------------------------------------------------------------------------
+# inter_font: serve Inter from fonts/ instead of Google Fonts
+# ---------------------------------------------------------------------------
+
+# One variable font covers every weight (see sitebuild/webfonts.py)
+INTER_FILE = "fonts/Inter.woff2"
+INTER_MARK = "/* Inter (self-hosted) */"
+
+# Weight used when the import doesn't name any
+INTER_DEFAULT_WEIGHT = 400
+
+GOOGLE_FONTS_LINK = re.compile(
+    r'[ \t]*<link href="(https://fonts\.googleapis\.com/css2\?[^"]*)" rel="stylesheet">\n?')
+GOOGLE_PRECONNECT = re.compile(
+    r'[ \t]*<link rel="preconnect" href="https://fonts\.(?:googleapis|gstatic)\.com"(?: crossorigin)?>\n?')
+INTER_PRELOAD = f'<link rel="preload" href="{INTER_FILE}" as="font" type="font/woff2" crossorigin>'
+
+INTER_FACE = '''
+        {mark}
+        @font-face {{
+            font-family: 'Inter';
+            src: url('{file}') format('woff2');
+            font-weight: {low} {high};
+            font-style: normal;
+            font-display: swap;
+        }}
+'''
+
+
+def _split_families(url):
+    """(Inter weights, Google Fonts URL for the other families or None)."""
+    weights = []
+    others = []
+    for key, value in parse_qsl(urlsplit(url).query):
+        if key != "family":
+            continue
+        family, _, axes = value.partition(":")
+        if family != "Inter":
+            others.append(value)
+        elif axes.startswith("wght@"):
+            weights = [int(w) for w in re.split(r'[;.]+', axes[len("wght@"):]) if w.isdigit()]
+        if family == "Inter" and not weights:
+            weights = [INTER_DEFAULT_WEIGHT]
+    if not others:
+        return weights, None
+    params = "&".join("family=" + family.replace(" ", "+") for family in others)
+    return weights, f"https://fonts.googleapis.com/css2?{params}&display=swap"
+
+
+def _inter_link(content):
+    """The Google Fonts <link> match that imports Inter, or None."""
+    return next((m for m in GOOGLE_FONTS_LINK.finditer(content) if "family=Inter" in m.group(1)), None)
+
+
+def inter_weights(content):
+    """Inter weights a page imports from Google Fonts, or None."""
+    link = _inter_link(content)
+    return _split_families(link.group(1))[0] if link else None
+
+
+def inter_font(content, vendored=False):
+    """
+    Replace the Google Fonts import of Inter with an @font-face for the
+    same weight range served from fonts/, and preload it. Other Google
+    families keep their link; the preconnects go once none remain.
+    Pages are left alone unless `vendored` (the variant has INTER_FILE),
+    so they never point at a font that isn't there.
+    """
+    if not vendored or "fonts.googleapis.com" not in content or "<style>" not in content:
+        return content
+    link = _inter_link(content)
+    if link is None or INTER_MARK in content:
+        return content
+
+    weights, remaining = _split_families(link.group(1))
+    line = link.group()
+    indent = line[:len(line) - len(line.lstrip())]
+    replacement = f"{indent}{INTER_PRELOAD}\n"
+    if remaining:
+        replacement += f'{indent}<link href="{remaining}" rel="stylesheet">\n'
+    content = content[:link.start()] + replacement + content[link.end():]
+    if not remaining:
+        content = GOOGLE_PRECONNECT.sub("", content)
+
+    face = INTER_FACE.format(mark=INTER_MARK, file=INTER_FILE, low=min(weights), high=max(weights))
+    return instrument.replace(content, "<style>", "<style>" + face, 1)
+
+
+# ---------------------------------------------------------------------------
+# replace_strings, css_overrides, analytics: per-variant deltas
+# ---------------------------------------------------------------------------
+
+# Variants generated from another one (see sitebuild.variants) state how
+# they differ through these stages' stage_options.
+
+@lru_cache(maxsize=None)
+def _string_table(pairs):
+    return MultiReplace(pairs, "replace_strings")
+
+def replace_strings(content, pairs=()):
+    """Replace each literal old string with its new one, in order."""
+    if not pairs:
+        return content
+    return _string_table(tuple(tuple(pair) for pair in pairs))(content)
+
+
+def css_overrides(content, rules=None):
+    """
+    Set declarations the page already has: `rules` maps a selector to
+    {property: value}. Missing rules and properties are left alone.
+    """
+    if not rules:
+        return content
+    sheet = StyleSheet(content)
+    for selector, properties in rules.items():
+        for name, value in properties.items():
+            sheet.set_property(selector, name, value)
+    return sheet.render()
+
+
+# Analytics snippets the stage recognises, with the comment some pages put above them
+VERCEL_INSIGHTS = '<script defer src="/_vercel/insights/script.js"></script>'
+ANALYTICS_SNIPPET = re.compile(
+    r'(?:[ \t]*<!-- Vercel Analytics -->\n)?[ \t]*'
+    r'<script defer src="/_vercel/insights/script\.js"></script>\n?')
+
+def analytics(content, tag=None):
+    """
+    Make `tag` the page's analytics snippet, placed before </head>, or
+    remove every known snippet when `tag` is None. A page that already
+    carries `tag` is left as it is.
+    """
+    if tag and tag in content:
+        return content
+    content = instrument.sub(ANALYTICS_SNIPPET, "", content)
+    if tag and "</head>" in content:
+        content = instrument.replace(content, "</head>", f"{tag}\n</head>", 1)
+    return content
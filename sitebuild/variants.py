@@ -0,0 +1,94 @@
+"""
+Single-source variants: derived trees generated from one canonical tree.
+
+A variant with a `source` in VARIANTS is the source variant's pages run
+through its own stages, so everything that sets it apart (brand strings,
+colours, CTA targets, the analytics tag) is its stage_options rather than
+a hand-kept copy of every page.
+
+`derive` runs several variants' stage chains over one source page. The
+guide variants' chains all start with the same styling stages, so that
+prefix runs once per page and its output feeds every variant; stylesheet
+parses of unchanged CSS are shared as well (see sitebuild.css).
+
+A derived page is only overwritten while it still holds what was last
+generated for it, as recorded in the build manifest. Anything else is
+drift: content that exists in that tree only. `drift` lists it line by
+line so it can be moved into the source or into the variant's delta.
+"""
+
+import difflib
+from collections import Counter
+
+from sitebuild import cache
+
+# Statuses `status` reports for a derived page
+CREATED = "created"
+UNCHANGED = "unchanged"
+UPDATED = "updated"
+DRIFTED = "drifted"
+
+
+def derive(content, chains, apply):
+    """
+    Output of each chain of steps over one page. `apply(content, step)` runs
+    a step, and steps compare equal when they do the same thing, so a
+    leading run of steps several chains share is only applied once.
+    """
+    memo = {}
+    outputs = []
+    for chain in chains:
+        current = content
+        for i, step in enumerate(chain):
+            key = tuple(chain[:i + 1])
+            if key not in memo:
+                memo[key] = apply(current, step)
+            current = memo[key]
+        outputs.append(current)
+    return outputs
+
+
+def status(current, generated, recorded=None, built=None):
+    """
+    What generating a page would do: CREATED if there is no page yet,
+    UNCHANGED if it already matches, UPDATED if it still holds the
+    `recorded` hash of its last generated content or only lacks stages
+    (`built` is the page after its own stages), DRIFTED otherwise.
+    """
+    if current is None:
+        return CREATED
+    if current == generated:
+        return UNCHANGED
+    if recorded == cache.content_hash(current) or built == generated:
+        return UPDATED
+    return DRIFTED
+
+
+def drift(current, generated):
+    """
+    (lines only in `current`, lines only in `generated`), in page order.
+    Blank lines and indentation are ignored.
+    """
+    a = [line.strip() for line in current.splitlines() if line.strip()]
+    b = [line.strip() for line in generated.splitlines() if line.strip()]
+    only_current = []
+    only_generated = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag in ("replace", "delete"):
+            only_current.extend(a[i1:i2])
+        if tag in ("replace", "insert"):
+            only_generated.extend(b[j1:j2])
+    return only_current, only_generated
+
+
+def recurring(drifts, minimum=2):
+    """
+    [(pages, sign, line)] for lines drifting the same way on at least
+    `minimum` pages, most common first; `drifts` holds drift() results.
+    A line on many pages usually belongs in the variant's delta.
+    """
+    counts = Counter()
+    for only_current, only_generated in drifts:
+        counts.update(("-", line) for line in set(only_current))
+        counts.update(("+", line) for line in set(only_generated))
+    return [(n, sign, line) for (sign, line), n in counts.most_common() if n >= minimum]
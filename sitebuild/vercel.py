@@ -0,0 +1,84 @@
+"""
+The parts of a variant's vercel.json that decide how a path is served.
+
+Config reads `cleanUrls`, `trailingSlash`, `redirects`, `rewrites` and
+`headers`; Rule compiles a source in Vercel's path syntax (`:name`,
+`:name*` and regex groups such as `(.*)`), and substitute() fills `$1` or
+`:name` into a destination. Both sitebuild.serve and sitebuild.headers
+route with them.
+"""
+
+import json
+import re
+from pathlib import Path
+
+_PARAM = re.compile(r'\\(.)|:(\w+)(\*|\+|\?)?|(\([^)]*\))')
+
+
+class Rule:
+    """A vercel.json source pattern, compiled."""
+
+    def __init__(self, source):
+        parts = []
+        pos = 0
+        for m in _PARAM.finditer(source):
+            parts.append(re.escape(source[pos:m.start()]))
+            escaped, name, modifier, group = m.groups()
+            if escaped:
+                parts.append(re.escape(escaped))
+            elif group:
+                parts.append(group)
+            elif modifier in ("*", "+"):
+                parts.append(f"(?P<{name}>.{modifier})")
+            elif modifier == "?":
+                parts.append(f"(?P<{name}>[^/]*)")
+            else:
+                parts.append(f"(?P<{name}>[^/]+)")
+            pos = m.end()
+        parts.append(re.escape(source[pos:]))
+        self.pattern = re.compile("".join(parts) + r"\Z")
+
+    def match(self, path):
+        return self.pattern.match(path)
+
+
+def substitute(destination, match):
+    """`destination` with $n and :name filled in from a Rule match."""
+    groups = match.groups()
+    named = match.groupdict()
+    text = re.sub(r'\$(\d+)', lambda m: groups[int(m.group(1)) - 1] or ""
+                  if int(m.group(1)) <= len(groups) else "", destination)
+    return re.sub(r':(\w+)\*?', lambda m: named.get(m.group(1)) or ""
+                  if m.group(1) in named else m.group(), text)
+
+
+class Config:
+    """The routing parts of a vercel.json."""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.clean_urls = bool(data.get("cleanUrls"))
+        self.trailing_slash = data.get("trailingSlash")    # None: both forms work
+        self.redirects = [(Rule(r["source"]), r["destination"],
+                           r.get("statusCode") or (308 if r.get("permanent", True) else 307))
+                          for r in data.get("redirects", ())]
+        self.rewrites = [(Rule(r["source"]), r["destination"]) for r in data.get("rewrites", ())]
+        self.headers = [(Rule(h["source"]), [(x["key"], x["value"]) for x in h.get("headers", ())])
+                        for h in data.get("headers", ())]
+
+    @classmethod
+    def load(cls, directory):
+        path = Path(directory) / "vercel.json"
+        if not path.exists():
+            return cls()
+        return cls(json.loads(path.read_text(encoding='utf-8')))
+
+    def headers_for(self, path):
+        """[(key, value)] for a path; a later matching entry overrides a key."""
+        found = {}
+        for rule, headers in self.headers:
+            if rule.match(path):
+                for key, value in headers:
+                    found.pop(key.lower(), None)
+                    found[key.lower()] = (key, value)
+        return list(found.values())
@@ -0,0 +1,298 @@
+"""
+Watch mode: re-run stages as pages, partials and transforms change.
+
+`python -m sitebuild --watch` builds once, then waits for changes (inotify
+on Linux, polling elsewhere) and works out what each batch affects:
+
+- a page: its variant's stages, on that page only; with --generate, the
+  same page of every variant generated from it as well,
+- a partial template or a sitebuild module: the stage code is reloaded
+  and every stage whose version changed (see sitebuild.cache) runs again,
+  with the stages after it, on all pages of the variants using it. An
+  edited COLOR_REPLACEMENTS table re-runs unplugs_style and the stages
+  after it everywhere; the stages before it are skipped,
+- a stylesheet: the pages linking it are listed, since no stage reads it.
+
+Changes arriving within DEBOUNCE seconds of each other form one batch,
+and the watcher's own writes are ignored.
+"""
+
+import ctypes
+import ctypes.util
+import importlib
+import linecache
+import os
+import select
+import struct
+import sys
+from pathlib import Path
+from time import monotonic, perf_counter, sleep
+
+from sitebuild import cache, pipeline, registry
+
+# Quiet time that ends a batch of changes, in seconds
+DEBOUNCE = 0.02
+
+# Seconds between scans when inotify isn't available
+POLL_INTERVAL = 0.25
+
+WATCHED_SUFFIXES = {".html", ".css", ".py"}
+
+# Stage code, reloaded in dependency order when any of it changes
+STAGE_MODULES = ["replace", "css", "partials", "cache", "transforms", "variants", "pipeline"]
+
+SITEBUILD_DIR = Path(__file__).resolve().parent
+
+# inotify(7) event bits: a file written and closed, moved in or created
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+_EVENT = struct.Struct("iIII")
+
+
+class Inotify:
+    """Files changed directly inside a set of directories, via inotify."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+
+    def add(self, directory):
+        wd = self._add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"can't watch {directory}")
+        self.directories[wd] = Path(directory)
+
+    def read(self, timeout=None):
+        """Paths changed, waiting up to `timeout` seconds (None: until one is)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        paths = set()
+        pos = 0
+        while pos < len(data):
+            wd, _, _, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            name = data[pos:pos + length].rstrip(b"\0")
+            pos += length
+            if wd in self.directories and name:
+                paths.add(self.directories[wd] / os.fsdecode(name))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Poller:
+    """The Inotify interface, by comparing file stats every POLL_INTERVAL."""
+
+    def __init__(self):
+        self.directories = []
+        self.seen = {}
+
+    def _scan(self):
+        found = {}
+        for directory in self.directories:
+            for path in directory.iterdir():
+                if path.is_file():
+                    found[path] = cache.stat_signature(path)
+        return found
+
+    def add(self, directory):
+        self.directories.append(Path(directory))
+        self.seen = self._scan()
+
+    def read(self, timeout=None):
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            found = self._scan()
+            changed = {path for path, signature in found.items() if self.seen.get(path) != signature}
+            self.seen = found
+            if changed:
+                return changed
+            if deadline is not None and monotonic() >= deadline:
+                return set()
+            sleep(POLL_INTERVAL if deadline is None else max(0, min(POLL_INTERVAL, deadline - monotonic())))
+
+    def close(self):
+        pass
+
+
+def watcher():
+    """An Inotify, or a Poller where inotify isn't available."""
+    try:
+        return Inotify()
+    except (OSError, AttributeError):
+        return Poller()
+
+
+def stage_versions():
+    """{variant: [[stage, version], ...]} for every variant's full stage list."""
+    return {name: pipeline.stage_versions(variant["stages"], None, pipeline.variant_options(name))
+            for name, variant in pipeline.VARIANTS.items()}
+
+
+def first_changed(old, new):
+    """Name of the first stage whose version differs, or None."""
+    for i, (stage, version) in enumerate(new):
+        if i >= len(old) or old[i] != [stage, version]:
+            return stage
+    return None
+
+
+def reload_stages():
+    """Re-import the stage code; returns an error message if it doesn't load."""
+    linecache.checkcache()
+    try:
+        for name in STAGE_MODULES:
+            importlib.reload(sys.modules[f"sitebuild.{name}"])
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def page_owners(path):
+    """
+    [(variant, page)] for a page file, in VARIANTS order. Variants without
+    page stages (landing) only take part in site-wide steps, so they own
+    nothing here.
+    """
+    owners = []
+    for name, variant in pipeline.VARIANTS.items():
+        if not variant["stages"]:
+            continue
+        directory = pipeline.REPO_ROOT / variant["dir"]
+        if path.parent == directory.resolve() and path.name in pipeline.variant_pages(name):
+            owners.append((name, path.name))
+    return owners
+
+
+def linking_pages(path):
+    """Pages that link the stylesheet at `path`."""
+    pages = []
+    for name, variant in pipeline.VARIANTS.items():
+        directory = (pipeline.REPO_ROOT / variant["dir"]).resolve()
+        if path.parent != directory:
+            continue
+        for page in pipeline.variant_pages(name):
+            filepath = directory / page
+            if filepath.exists() and f'href="{path.name}"' in filepath.read_text(encoding='utf-8'):
+                pages.append(pipeline.display_path(filepath))
+    return pages
+
+
+class Session:
+    """One watch run: what was built, what the watcher wrote, and the manifest."""
+
+    def __init__(self, names, options, manifest):
+        self.names = names
+        self.options = options
+        self.manifest = manifest
+        self.versions = stage_versions()
+        self.ours = {}    # path -> stat signature of the watcher's last write
+
+    def directories(self):
+        dirs = {(pipeline.REPO_ROOT / pipeline.VARIANTS[name]["dir"]).resolve() for name in self.names}
+        dirs.update({SITEBUILD_DIR, Path(pipeline.transforms.PARTIALS_DIR).resolve()})
+        return sorted(d for d in dirs if d.is_dir())
+
+    def _ours(self, path):
+        try:
+            return self.ours.get(path) == cache.stat_signature(path)
+        except OSError:
+            return False
+
+    def _written(self, paths):
+        for path in paths:
+            self.ours[Path(path).resolve()] = cache.stat_signature(path)
+
+    def handle(self, paths):
+        """
+        Re-run what `paths` affect. Returns (pages run, pages rewritten), or
+        None if nothing relevant changed.
+        """
+        paths = {Path(path).resolve() for path in paths}
+        paths = {path for path in paths if path.suffix in WATCHED_SUFFIXES
+                 and not path.name.startswith(".") and path.exists() and not self._ours(path)}
+        if not paths:
+            return None
+
+        registry.scan.cache_clear()
+        registry.sitemap_pages.cache_clear()
+        targets = {}
+        edited = []
+        code_dirs = (SITEBUILD_DIR, Path(pipeline.transforms.PARTIALS_DIR).resolve())
+        if any(path.parent in code_dirs for path in paths):
+            error = reload_stages()
+            if error:
+                print(f"❌ couldn't reload the stages ({error}); fix it and save again")
+                return None
+            versions = stage_versions()
+            for name in self.names:
+                stage = first_changed(self.versions.get(name, []), versions[name])
+                if stage:
+                    print(f"🔁 {name}: {stage} changed, re-running it and later stages on every page")
+                    for page in pipeline.variant_pages(name):
+                        targets[(name, page)] = stage
+            self.versions = versions
+
+        for path in paths:
+            if path.suffix == ".html":
+                for name, page in page_owners(path):
+                    if name in self.names:
+                        targets[(name, page)] = pipeline.VARIANTS[name]["stages"][0]
+                        edited.append((name, page))
+            elif path.suffix == ".css":
+                pages = linking_pages(path)
+                print(f"🎨 {pipeline.display_path(path)} changed; linked by "
+                      f"{', '.join(pages) if pages else 'no page'} (no stage reads it)")
+
+        written, unchanged = pipeline.rerun_pages(targets, self.options, self.manifest)
+        checked = len(written) + unchanged
+        self._written(written)
+        if getattr(self.options, "generate", False):
+            sources = {name for name, _ in edited
+                       if any(pipeline.VARIANTS[n].get("source") == name for n in self.names)}
+            for source in sources:
+                pages = [page for name, page in edited if name == source]
+                generated = pipeline.generate_variants(self.names, self.options, self.manifest, pages)
+                self._written(generated)
+                written += generated
+                checked += len(pages)
+        if self.manifest is not None and not getattr(self.options, "dry_run", False):
+            cache.save_manifest(self.options.cache, self.manifest)
+        return checked, len(written)
+
+
+def run(names, options=None, manifest=None):
+    """Watch the variants in `names` until interrupted."""
+    session = Session(names, options, manifest)
+    source = watcher()
+    for directory in session.directories():
+        source.add(directory)
+    kind = "inotify" if isinstance(source, Inotify) else f"polling every {POLL_INTERVAL}s"
+    print(f"\n👀 Watching {len(session.directories())} directories ({kind}); Ctrl-C to stop")
+    try:
+        while True:
+            changes = source.read()
+            start = perf_counter()
+            while True:
+                more = source.read(DEBOUNCE)
+                if not more:
+                    break
+                changes |= more
+            start_handling = perf_counter()
+            counts = session.handle(changes)
+            if counts is not None:
+                done = perf_counter()
+                print(f"⚡ {counts[0]} pages run, {counts[1]} rewritten in "
+                      f"{(done - start_handling) * 1000:.0f} ms ({(done - start) * 1000:.0f} ms after the change)")
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+    finally:
+        source.close()
@@ -0,0 +1,107 @@
+"""
+Vendor the self-hosted Inter font the inter_font stage points pages at.
+
+Each variant directory gets one variable `fonts/Inter.woff2` covering the
+union of the weight ranges its pages declare, cut down to Google Fonts'
+"latin" subset. The file is fetched from the Google Fonts CSS API once,
+at build time, so browsers never contact Google to render text.
+
+Characters outside the subset still render, in the fallback font; pages
+using any are reported so the subset can be widened.
+"""
+
+import re
+import urllib.request
+from pathlib import Path
+
+from sitebuild.transforms import INTER_FILE, INTER_MARK, inter_weights
+
+CSS_API = "https://fonts.googleapis.com/css2?family=Inter:wght@{weights}&display=swap"
+SUBSET = "latin"
+
+# The CSS API picks the font format from the user agent; this one gets woff2
+USER_AGENT = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0 Safari/537.36")
+
+_FACE = re.compile(r'/\*\s*([-\w]+)\s*\*/\s*@font-face\s*\{([^}]*)\}')
+_SRC = re.compile(r'url\(([^)]+\.woff2)\)')
+_RANGE = re.compile(r'unicode-range\s*:\s*([^;]+)')
+_PAGE_RANGE = re.compile(re.escape(INTER_MARK) + r'\s*@font-face\s*\{[^}]*font-weight:\s*(\d+)\s+(\d+)')
+_TAG = re.compile(r'<script\b.*?</script\s*>|<style\b.*?</style\s*>|<[^>]*>', re.IGNORECASE | re.DOTALL)
+
+
+def weight_range(directory, pages):
+    """
+    (low, high) weights the Inter faces of `pages` declare, or their Google
+    Fonts imports ask for where inter_font hasn't replaced them yet; None
+    if no page uses Inter.
+    """
+    low = high = None
+    for page in pages:
+        filepath = Path(directory) / page
+        if not filepath.exists():
+            continue
+        content = filepath.read_text(encoding='utf-8')
+        m = _PAGE_RANGE.search(content)
+        weights = [int(m.group(1)), int(m.group(2))] if m else inter_weights(content)
+        if weights:
+            a, b = min(weights), max(weights)
+            low = a if low is None else min(low, a)
+            high = b if high is None else max(high, b)
+    return None if low is None else (low, high)
+
+
+def _get(url):
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def subset_source(css):
+    """(woff2 url, unicode-range) of the SUBSET face in a CSS API response."""
+    for subset, body in _FACE.findall(css):
+        src = _SRC.search(body)
+        if subset == SUBSET and src:
+            unicode_range = _RANGE.search(body)
+            return src.group(1).strip("'\""), unicode_range.group(1).strip() if unicode_range else ""
+    raise ValueError(f"no {SUBSET} woff2 face in the Google Fonts response")
+
+
+def parse_range(unicode_range):
+    """[(first, last)] code points of a CSS unicode-range."""
+    spans = []
+    for part in unicode_range.split(","):
+        part = part.strip()[2:]
+        first, _, last = part.partition("-")
+        spans.append((int(first, 16), int(last or first, 16)))
+    return spans
+
+
+def uncovered(directory, pages, spans):
+    """{page: characters in its text that `spans` doesn't cover}."""
+    missing = {}
+    for page in pages:
+        filepath = Path(directory) / page
+        if not filepath.exists():
+            continue
+        text = _TAG.sub(" ", filepath.read_text(encoding='utf-8'))
+        chars = {c for c in text if c.isprintable() and not c.isspace()
+                 and not any(a <= ord(c) <= b for a, b in spans)}
+        if chars:
+            missing[page] = chars
+    return missing
+
+
+def vendor(directory, weights):
+    """
+    Write the Inter variable font for `weights` (low, high) to `directory`.
+    Returns (target, unicode-range of the subset). Raises OSError if Google
+    Fonts can't be reached.
+    """
+    low, high = weights
+    css = _get(CSS_API.format(weights=low if low == high else f"{low}..{high}")).decode('utf-8')
+    url, unicode_range = subset_source(css)
+    target = Path(directory) / INTER_FILE
+    target.parent.mkdir(exist_ok=True)
+    target.write_bytes(_get(url))
+    return target, unicode_range
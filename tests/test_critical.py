@@ -0,0 +1,60 @@
+from sitebuild import critical
+
+# Rules for below-the-fold elements, enough to clear critical.MIN_DEFERRED
+BELOW = "\n".join(f".section-{i} {{ margin: {i}px; padding: {i}px; border: 1px solid #{i:03d}; }}"
+                  for i in range(60))
+
+CSS = f"""
+@font-face {{ font-family: Bamboy; src: url(fonts/Bamboy.woff2); }}
+.title {{ color: red; animation: pop 1s; }}
+.footer {{ color: gray; animation: fade 1s; }}
+@keyframes pop {{ from {{ opacity: 0; }} }}
+@keyframes fade {{ from {{ opacity: 0; }} }}
+@media (max-width: 600px) {{
+    .hero > .title {{ font-size: 2rem; }}
+    .footer {{ font-size: 1rem; }}
+}}
+.menu.open {{ display: block; }}
+.title {{ color: blue; }}
+{BELOW}
+"""
+
+PAGE = f"""<html><head><style>{CSS}</style></head><body>
+<div class="hero"><nav class="menu"></nav><h1 class="title">Hi</h1></div>
+{"".join(f'<section class="section-{i}"></section>' for i in range(60))}
+<footer class="footer"></footer>
+<script>document.querySelector('.menu').classList.toggle('open')</script>
+</body></html>
+"""
+
+
+def test_above_the_fold_rules_stay_in_order():
+    extraction = critical.extract(PAGE)
+    kept = extraction.critical
+    # The later .title rule still overrides the earlier one
+    assert kept.index(".title { color: red;") < kept.index(".title { color: blue; }")
+    assert ".footer" not in kept and ".section-" not in kept
+    assert ".menu.open" in kept
+
+
+def test_media_font_face_and_keyframes():
+    kept = critical.extract(PAGE).critical
+    assert "@font-face" in kept
+    assert "@media (max-width: 600px) {\n    .hero > .title { font-size: 2rem; }\n}" in kept
+    assert "@keyframes pop" in kept and "@keyframes fade" not in kept
+
+
+def test_deferred_sheet_keeps_every_rule_in_order():
+    extraction = critical.extract(PAGE)
+    deferred = critical.deferred_css(extraction)
+    assert "@font-face" not in deferred
+    order = [".title{color:red", ".footer{", "@keyframes pop", "@media", ".menu.open", ".title{color:blue",
+             ".section-59"]
+    positions = [deferred.index(rule) for rule in order]
+    assert positions == sorted(positions)
+
+
+def test_deferred_link_follows_the_inline_style():
+    extraction = critical.extract(PAGE)
+    out = critical.rewrite_page(PAGE, extraction, "index.12345678.css")
+    assert out.index("</style>") < out.index('href="index.12345678.css" media="print"') < out.index("<body>")
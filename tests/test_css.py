@@ -0,0 +1,59 @@
+import pytest
+
+from sitebuild.css import StyleSheet
+
+STYLE = """<style>
+.cta { color: #fff; padding: 1rem; }
+@media (max-width: 600px) {
+    .cta { color: #fff }
+    @supports (display: grid) {
+        .cta, .badge { display: grid; color: #fff; }
+    }
+}
+.other { color: #fff; }
+</style>"""
+
+# A brace in a comment takes the parser off its one-regex fast path
+COMMENTED = STYLE.replace("<style>", "<style>\n/* { not a rule } */")
+
+
+@pytest.fixture(params=[STYLE, COMMENTED], ids=["fast", "commented"])
+def page(request):
+    return f"<html><head>{request.param}</head><body class=\"cta\"></body></html>"
+
+
+def test_set_property_reaches_nested_rules(page):
+    sheet = StyleSheet(page)
+    assert sheet.set_property(".cta", "color", "#222222") == 3
+    out = sheet.render()
+    assert ".cta { color: #222222; padding: 1rem; }" in out
+    assert ".cta { color: #222222;}" in out
+    assert ".cta, .badge { display: grid; color: #222222; }" in out
+    assert ".other { color: #fff; }" in out
+    assert out.replace("#222222;", "#fff;").replace("#fff;}", "#fff }") == page
+
+
+def test_add_property_only_where_missing(page):
+    sheet = StyleSheet(page)
+    assert sheet.add_property(".badge", "display", "block") == 0
+    assert sheet.add_property(".badge", "font-weight", "700") == 1
+    assert ".cta, .badge { display: grid; color: #fff;  font-weight: 700;}" in sheet.render()
+
+
+def test_replace_declaration_in_media(page):
+    sheet = StyleSheet(page)
+    assert sheet.replace_declaration(".badge", "display", "display", "flex") == 1
+    assert sheet.replace_declaration(None, "padding", "margin", "0") == 1
+    out = sheet.render()
+    assert ".cta, .badge { display: flex; color: #fff; }" in out
+    assert ".cta { color: #fff; margin: 0; }" in out
+
+
+def test_cached_spans_follow_each_page():
+    # The same <style> text at different offsets parses once but edits in place on both
+    short = f"<head>{STYLE}</head>"
+    long = f"<head><title>{'x' * 50}</title>{STYLE}</head>"
+    for content in (short, long, short):
+        sheet = StyleSheet(content)
+        sheet.set_property(".other", "color", "red")
+        assert sheet.render() == content.replace(".other { color: #fff; }", ".other { color: red; }")
@@ -0,0 +1,39 @@
+import math
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from sitebuild import dosimetry
+
+
+def _night(levels):
+    """A finished Meter with one LAeq per minute."""
+    meter = dosimetry.Meter()
+    for minute, level in enumerate(levels):
+        meter.add(minute * 60, 60.0, 10.0 ** (level / 10.0) * 60.0, None)
+    return meter.finish()
+
+
+def test_early_loud_minute_is_averaged_over_a_full_window():
+    # One 101 dB minute at the start of a 70 dB night is ~89 dB over 15 minutes
+    summary = dosimetry.report(_night([101.0] + [70.0] * 59))
+    expected = 10.0 * math.log10((10.0 ** 10.1 + 14 * 10.0 ** 7.0) / 15)
+    assert summary["laeq_15min_max"] == round(expected, 1)
+    assert summary["minutes_over_limit"] == 0
+    assert summary["certified"]
+
+
+def test_loud_quarter_hour_fails():
+    summary = dosimetry.report(_night([70.0] * 20 + [101.0] * 15 + [70.0] * 20))
+    assert summary["laeq_15min_max"] == 101.0
+    # Windows ending 14..20 minutes into the loud stretch are still over 100 dB
+    assert summary["minutes_over_limit"] == 7
+    assert not summary["certified"]
+
+
+def test_short_loud_recording_fails():
+    # Two minutes at 115 dB exceed 100 dB LAeq,15min whatever came before
+    summary = dosimetry.report(_night([115.0, 115.0]))
+    assert summary["minutes_over_limit"] == 2
+    assert not summary["certified"]
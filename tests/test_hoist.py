@@ -0,0 +1,49 @@
+from sitebuild import hoist
+
+# Enough shared CSS to clear hoist.MIN_BYTES
+FILLER = "\n".join(f"    .f{i} {{ margin: {i}px; padding: {i}px; border: 1px solid #{i:03d}; }}" for i in range(40))
+SHARED = "    .btn { color: blue; }"
+
+
+def _page(before="", after="", body='<a class="btn">Go</a>'):
+    return (f"<html><head>\n    <style>\n{before}{FILLER}\n{SHARED}\n{after}    </style>\n"
+            f"</head><body>{body}</body></html>\n")
+
+
+def _hoisted(pages):
+    _, text, _, changed = hoist.hoist(pages)
+    return text or "", changed
+
+
+def test_shared_rules_move_and_page_rules_stay():
+    pages = {"a.html": _page(), "b.html": _page(after="    .only-b { color: red; }\n")}
+    text, changed = _hoisted(pages)
+    assert ".btn { color: blue; }" in text and ".f39" in text
+    assert ".only-b" not in text
+    assert '<link rel="stylesheet" href="site.' in changed["a.html"]
+    assert "<style>" not in changed["a.html"]
+    assert ".only-b { color: red; }" in changed["b.html"]
+
+
+def test_rule_overriding_an_earlier_inline_rule_stays():
+    # Hoisted ahead of .btn { color: red }, the shared rule would lose to it
+    pages = {"a.html": _page(), "b.html": _page(before="    .btn { color: red; }\n")}
+    text, changed = _hoisted(pages)
+    assert ".f39" in text and ".btn" not in text
+    assert changed["b.html"].index("color: red") < changed["b.html"].index("color: blue")
+
+
+def test_earlier_rule_on_other_elements_or_properties_does_not_block():
+    pages = {"a.html": _page(), "b.html": _page(before="    .note { color: red; }\n    .btn { font-weight: 700; }\n",
+                                                 body='<a class="btn">Go</a><p class="note">Hi</p>')}
+    text, _ = _hoisted(pages)
+    assert ".btn { color: blue; }" in text
+
+
+def test_class_a_script_adds_can_still_compete():
+    # .active isn't in the markup, but the script can add it to the .btn it finds
+    script = "<script>document.querySelector('.btn').classList.add('active')</script>"
+    pages = {"a.html": _page(), "b.html": _page(before="    .active { color: red; }\n",
+                                                 body=f'<a class="btn">Go</a>{script}')}
+    text, _ = _hoisted(pages)
+    assert ".btn" not in text
@@ -0,0 +1,18 @@
+from sitebuild import minify
+
+
+def test_quoted_gt_does_not_end_a_tag():
+    handler = 'if (a > b) {\n    x()\n}\n// c\ny()'
+    page = f'<div>\n  <button onclick="{handler}">\n    Go\n  </button>\n</div>\n'
+    # The handler is an attribute value, copied as written rather than minified as text
+    assert minify.html(page) == f'<div><button onclick="{handler}"> Go </button></div>'
+
+
+def test_single_quoted_gt_in_script_tag():
+    page = "<script data-when='a > b'>\n  // setup\n  run()\n</script>"
+    assert minify.html(page) == "<script data-when='a > b'>run()</script>"
+
+
+def test_comments_and_block_whitespace_go():
+    page = "<ul>\n  <!-- items -->\n  <li><b>a</b> <i>b</i></li>\n</ul>"
+    assert minify.html(page) == "<ul><li><b>a</b> <i>b</i></li></ul>"
@@ -0,0 +1,17 @@
+import pytest
+
+from sitebuild import pipeline
+
+
+@pytest.mark.parametrize("name", [name for name, variant in pipeline.VARIANTS.items() if variant["stages"]])
+def test_plain_build_leaves_committed_pages_alone(name):
+    # Stage changes ship with the pages they rewrite, so building HEAD writes nothing
+    directory = pipeline.REPO_ROOT / pipeline.VARIANTS[name]["dir"]
+    stages = pipeline.VARIANTS[name]["stages"]
+    options = pipeline.variant_options(name)
+    rewritten = []
+    for page in pipeline.variant_pages(name):
+        content = (directory / page).read_text(encoding='utf-8')
+        if pipeline.transform(content, stages, page, options) != content:
+            rewritten.append(page)
+    assert rewritten == []
@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from sitebuild.replace import MultiReplace
+
+
+def _sequential(pairs, text):
+    for old, new in pairs:
+        text = text.replace(old, new)
+    return text
+
+
+@pytest.mark.parametrize("pairs", [
+    # Chained: a later rule rewrites an earlier rule's output
+    [("#00ff00", "#22cc22"), ("#22cc22", "var(--primary)")],
+    # Overlapping: one pattern contains, prefixes or suffixes another
+    [("Hearing Guide", "Safe Sound Guide"), ("Guide", "Handbook")],
+    [("Guide", "Handbook"), ("Hearing Guide", "Safe Sound Guide")],
+    [("abc", "X"), ("cde", "Y")],
+    [("aa", "b"), ("ab", "c"), ("b", "aa")],
+    # The same pattern twice: only the first rule ever sees it
+    [("x", "y"), ("x", "z")],
+])
+def test_matches_sequential_replace(pairs):
+    text = "#00ff00 #22cc22 Hearing Guide, Guide; abcde cde abc aaab bab xx"
+    table = MultiReplace(pairs)
+    assert table(text) == _sequential(pairs, text)
+
+
+def test_independent_rules_share_a_pass():
+    table = MultiReplace([("red", "#f00"), ("blue", "#00f"), ("green", "#0f0")])
+    assert len(table.passes) == 1
+    assert table.subn("red, blue and red") == ("#f00, #00f and #f00", 3)
+
+
+def test_chained_rules_get_their_own_pass():
+    assert len(MultiReplace([("a", "b"), ("b", "c")]).passes) == 2
+
+
+def test_random_tables_match_sequential_replace():
+    rng = random.Random(7)
+    for _ in range(500):
+        pairs = [("".join(rng.choices("ab", k=rng.randint(1, 3))),
+                  "".join(rng.choices("abc", k=rng.randint(0, 3))))
+                 for _ in range(rng.randint(1, 4))]
+        text = "".join(rng.choices("abc", k=20))
+        assert MultiReplace(pairs)(text) == _sequential(pairs, text), (pairs, text)
@@ -0,0 +1,26 @@
+from http.server import ThreadingHTTPServer
+
+from sitebuild import serve
+
+
+def test_accepted_codings():
+    assert serve._accepted("gzip, deflate, br") == {"gzip", "deflate", "br"}
+    assert serve._accepted("br;q=0.5, gzip;q=1.0") == {"br", "gzip"}
+    assert serve._accepted(None) == set()
+
+
+def test_refused_codings_are_dropped():
+    for refusal in ("q=0", "q=0.0", "q=0.000", " q = 0 "):
+        assert serve._accepted(f"br;{refusal}, gzip") == {"gzip"}
+    assert serve._accepted("br;q=0.001") == {"br"}
+
+
+def test_server_leaves_the_stdlib_class_alone(tmp_path):
+    default = ThreadingHTTPServer.request_queue_size
+    server = serve.make_server(tmp_path, port=0, quiet=True)
+    try:
+        assert server.request_queue_size == 256
+        assert server.daemon_threads
+        assert ThreadingHTTPServer.request_queue_size == default
+    finally:
+        server.server_close()
@@ -0,0 +1,23 @@
+import argparse
+
+from sitebuild import pipeline, watch
+
+
+def _session():
+    options = argparse.Namespace(dry_run=True, generate=False, diff=False, cache=None)
+    return watch.Session(list(pipeline.VARIANTS), options, None)
+
+
+def test_landing_pages_have_no_owner():
+    # landing has no page stages; its pages are only touched by site-wide steps
+    assert pipeline.VARIANTS["landing"]["stages"] == []
+    assert watch.page_owners((pipeline.REPO_ROOT / "artists.html").resolve()) == []
+
+
+def test_saving_a_landing_page_keeps_watching():
+    assert _session().handle([pipeline.REPO_ROOT / "artists.html"]) == (0, 0)
+
+
+def test_saving_a_guide_page_reruns_its_stages():
+    page = (pipeline.REPO_ROOT / "decibel-guide.html").resolve()
+    assert watch.page_owners(page) == [("root", "decibel-guide.html")]